@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Cancellation benchmark
+Teachers who give up: runs a backend against the fake provider (streaming
+at a realistic token rate) and sends chat requests from several clients
+at once. Some clients close the connection part way through (tab closed,
+or the request aborted and retried) and some send a short X-Deadline-Ms.
+Reports how the requests ended, how many provider streams the backend
+closed early and the tokens the provider never generated (counted by the
+fake provider), next to the backend's own `cancellations` estimate.
+
+Usage: python benchmarks/bench_cancellation.py [--backend backend] [--requests 40] [--abandon 0.4] [--deadline 0.2]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.harness import percentile, start_backend, start_fake_provider, stop
+
+DEADLINE_MS = 1500
+MESSAGES = ["What is a food chain?", "Explain evaporation with an activity", "How do plants make food?",
+            "Give me a group activity on fractions", "Why does the moon change shape?"]
+
+
+def send(url, index, behaviour, rng):
+    """One client: waits for the answer, leaves after a while, or sends a deadline"""
+    data = {'message': f"{rng.choice(MESSAGES)} (class {index})", 'class_level': '6'}
+    start = time.perf_counter()
+    try:
+        if behaviour == 'abandon':
+            requests.post(f"{url}/api/chat", data=data, timeout=rng.uniform(0.6, 2.0))
+            return behaviour, 'finished anyway', time.perf_counter() - start
+        headers = {'X-Deadline-Ms': str(DEADLINE_MS)} if behaviour == 'deadline' else {}
+        response = requests.post(f"{url}/api/chat", data=data, headers=headers, timeout=120)
+        return behaviour, str(response.status_code), time.perf_counter() - start
+    except requests.exceptions.ReadTimeout:
+        return behaviour, 'left', time.perf_counter() - start
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_cancel_')
+    provider, provider_url = start_fake_provider(latency=args.latency, seed=1, stream_tps=args.stream_tps,
+                                                 extra_args=['--completion-tokens', str(args.completion_tokens)])
+    backend, url = start_backend(args.backend, workdir, provider_url)
+    rng = random.Random(0)
+    behaviours = [rng.choices(['wait', 'abandon', 'deadline'], [1 - args.abandon - args.deadline, args.abandon,
+                                                               args.deadline])[0] for _ in range(args.requests)]
+    try:
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(lambda item: send(url, item[0], item[1], random.Random(item[0])),
+                                    enumerate(behaviours)))
+        time.sleep(1.0)  # Let the backend notice the last disconnects
+        provider_stats = requests.get(f"{provider_url}/stats").json()
+        cancellations = requests.get(f"{url}/api/status").json()['cancellations']
+    finally:
+        stop(backend)
+        stop(provider)
+
+    print(f"\n🛑 {args.requests} requests to {args.backend} ({args.concurrency} at a time), "
+          f"{args.completion_tokens}-token answers at {args.stream_tps:g} tokens/s")
+    for (behaviour, outcome), count in sorted(Counter((b, o) for b, o, _ in results).items()):
+        seconds = [s * 1000 for b, o, s in results if (b, o) == (behaviour, outcome)]
+        print(f"  {behaviour:<9} {outcome:<16} {count:>4}  p50 {percentile(seconds, 50):>6.0f} ms")
+    print(f"  provider: {provider_stats['streamed']} streamed, {provider_stats['streams_closed_early']} closed early, "
+          f"{provider_stats['unsent_tokens']} tokens never generated")
+    print(f"  backend:  {cancellations}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Provider work saved by stopping abandoned chat requests")
+    parser.add_argument('--backend', default='backend', choices=['backend', 'backend_groq'])
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--abandon', type=float, default=0.4, help="share of clients that leave before the answer")
+    parser.add_argument('--deadline', type=float, default=0.2, help=f"share of clients sending X-Deadline-Ms: {DEADLINE_MS}")
+    parser.add_argument('--latency', default='0.3', help="fake provider time to first token")
+    parser.add_argument('--stream-tps', type=float, default=60)
+    parser.add_argument('--completion-tokens', type=int, default=150)
+    run(parser.parse_args())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+End-to-end /api/chat benchmark
+Runs backend.py and backend_groq.py as real processes against the fake
+provider (with a configurable latency distribution) and drives /api/chat
+with synthetic PDFs of different sizes and page densities. For every
+backend/profile pair it reports throughput, p50/p95/p99 latency, the
+per-stage breakdown from the Server-Timing header and the backend's peak
+RSS, and writes everything to a JSON file that later runs can be compared
+against.
+
+Usage:
+    python benchmarks/bench_chat_pipeline.py --output baseline.json
+    python benchmarks/bench_chat_pipeline.py --output after.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import requests
+
+from benchmarks.harness import (peak_rss_mb, percentile, start_backend, start_fake_provider, stop,
+                                upload_file)
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from server_timing import parse_server_timing
+
+# PDF profiles: size (image payload), page count and text density
+PROFILES = {
+    "no-pdf": None,
+    "text": {"size_mb": 0, "pages": 10, "text_lines": 10},
+    "dense": {"size_mb": 0, "pages": 30, "text_lines": 60},
+    "scanned": {"size_mb": 40, "pages": 40, "text_lines": 5},
+}
+
+MESSAGES = [
+    "Explain this page in simple words",
+    "Make a quick quiz on this page",
+    "Create a worksheet about this topic",
+    "Translate photosynthesis into Hindi",
+]
+
+
+def run_profile(base_url, profile_name, file_ref, pages, args, rng):
+    """Send args.requests chat messages with args.concurrency clients"""
+    lock = threading.Lock()
+    jobs = [(rng.choice(MESSAGES), rng.randint(1, pages)) for _ in range(args.requests)]
+    samples = []
+
+    def one_request(job):
+        message, page = job
+        data = {'message': message, 'current_page': page, 'total_pages': pages, 'current_pdf_index': 0,
+                'class_level': '6', 'student_language': 'hindi'}
+        if file_ref:
+            data['file_ref_0'] = file_ref
+        start = time.perf_counter()
+        try:
+            response = requests.post(f"{base_url}/api/chat", data=data, timeout=120)
+            status = response.status_code
+            stages = parse_server_timing(response.headers.get('Server-Timing'))
+        except requests.RequestException:
+            status, stages = None, {}
+        with lock:
+            samples.append({"latency_ms": (time.perf_counter() - start) * 1000, "status": status, "stages": stages})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(one_request, jobs))
+    elapsed = time.perf_counter() - start
+    return summarize(profile_name, samples, elapsed)
+
+
+def summarize(profile_name, samples, elapsed):
+    ok = [sample for sample in samples if sample['status'] == 200]
+    latencies = [sample['latency_ms'] for sample in ok]
+    stage_names = []
+    for sample in ok:
+        stage_names += [name for name in sample['stages'] if name not in stage_names]
+    stages = {}
+    for name in stage_names:
+        values = [sample['stages'].get(name, 0.0) for sample in ok]
+        stages[name] = {"mean": statistics.mean(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+    return {
+        "profile": profile_name,
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+                       "p99": percentile(latencies, 99), "mean": statistics.mean(latencies) if latencies else None},
+        "stages_ms": stages,
+    }
+
+
+def print_result(backend, result):
+    latency = result['latency_ms']
+    if latency['p50'] is None:
+        print(f"  {backend:<13} {result['profile']:<8} all {result['requests']} requests failed")
+        return
+    stages = '  '.join(f"{name} {values['p50']:.0f}" for name, values in result['stages_ms'].items() if name != 'total')
+    print(f"  {backend:<13} {result['profile']:<8} {result['throughput_rps']:>5.1f} req/s  "
+          f"p50 {latency['p50']:>6.0f}  p95 {latency['p95']:>6.0f}  p99 {latency['p99']:>6.0f} ms  "
+          f"err {result['errors']}  rss {result['peak_rss_mb']:.0f}MB  | {stages}")
+
+
+def compare(results, baseline_path, threshold):
+    """Print deltas against a previous run; returns False if any p95 regressed past the threshold"""
+    with open(baseline_path) as f:
+        baseline = {(r['backend'], r['profile']): r for r in json.load(f)['results']}
+    print(f"\n📊 Compared with {baseline_path} (regression threshold {threshold:.0%} on p95)")
+    passed = True
+    for result in results:
+        before = baseline.get((result['backend'], result['profile']))
+        if not before or before['latency_ms']['p95'] is None or result['latency_ms']['p95'] is None:
+            continue
+        deltas = []
+        for key in ('p50', 'p95', 'p99'):
+            change = result['latency_ms'][key] / before['latency_ms'][key] - 1
+            deltas.append(f"{key} {change:+.1%}")
+        rss_change = result['peak_rss_mb'] - before['peak_rss_mb']
+        regressed = result['latency_ms']['p95'] > before['latency_ms']['p95'] * (1 + threshold)
+        passed = passed and not regressed
+        print(f"  {'❌' if regressed else '✅'} {result['backend']:<13} {result['profile']:<8} "
+              f"{'  '.join(deltas)}  throughput {result['throughput_rps'] / before['throughput_rps'] - 1:+.1%}  "
+              f"rss {rss_change:+.0f}MB")
+    return passed
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    pdf_dir = tempfile.mkdtemp(prefix='bench_pdfs_')
+    pdfs = {}
+    for name in args.profiles:
+        spec = PROFILES[name]
+        if spec:
+            path = os.path.join(pdf_dir, f"{name}.pdf")
+            write_synthetic_pdf(path, spec['size_mb'], spec['pages'], seed=args.seed, text_lines=spec['text_lines'])
+            pdfs[name] = path
+
+    provider, provider_url = start_fake_provider(args.latency, args.seed)
+    results = []
+    print(f"\n🧪 {args.requests} requests x {args.concurrency} clients per profile, provider latency {args.latency}\n")
+    try:
+        for backend in args.backends:
+            workdir = tempfile.mkdtemp(prefix=f'bench_{backend}_')
+            process, base_url = start_backend(backend, workdir, provider_url)
+            try:
+                for name in args.profiles:
+                    file_ref = upload_file(base_url, pdfs[name]) if name in pdfs else None
+                    pages = PROFILES[name]['pages'] if PROFILES[name] else 1
+                    result = run_profile(base_url, name, file_ref, pages, args, rng)
+                    # VmHWM only grows, so this is the peak up to and including this profile
+                    result.update(backend=backend, peak_rss_mb=peak_rss_mb(process.pid))
+                    results.append(result)
+                    print_result(backend, result)
+            finally:
+                stop(process)
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        stop(provider)
+        shutil.rmtree(pdf_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End-to-end /api/chat benchmark")
+    parser.add_argument('--backends', nargs='+', default=['backend', 'backend_groq'], choices=['backend', 'backend_groq'])
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--requests', type=int, default=40, help="chat requests per profile")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', default='lognormal:0.3,0.5',
+                        help='provider latency: seconds or "fixed:s", "uniform:a,b", "normal:mean,sd", "lognormal:median,sigma", "exp:mean"')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.15, help="allowed p95 slowdown before --compare fails")
+    run(parser.parse_args())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Chat transport benchmark
+Per-message cost of the two ways a tab can send chat messages: a multipart
+POST to /api/chat (a new connection each time, as the page sends it, and
+with keep-alive) and the chat socket (one WebSocket for the session, see
+chat_socket.py). Runs a backend against the fake provider, sends the same
+questions about an uploaded PDF through each transport and reports latency,
+the time until the first text appears, the transport overhead (client
+latency minus the server's own Server-Timing total) and the bytes sent per
+message. The response cache is off, so every message reaches the provider.
+
+Needs flask-sock in the backend and websocket-client here:
+pip install flask-sock websocket-client
+
+Usage: python benchmarks/bench_chat_transport.py [--backend backend] [--messages 40] [--latency 0] [--stream-tps 0]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.harness import percentile, start_backend, start_fake_provider, stop, upload_file
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+MESSAGES = ["Explain this page in simple words", "Give me a group activity for this page",
+            "What questions can I ask about this page?", "Summarize this page"]
+SETTINGS = {'teacher_language': 'english', 'student_language': 'hindi', 'class_level': '6', 'class_strength': '30',
+            'total_pages': '8', 'current_pdf_index': '0'}
+WEBSOCKET_FRAME_BYTES = 8  # Header of a masked client frame of this size
+
+
+def server_total(server_timing):
+    match = re.search(r'total;dur=([\d.]+)', server_timing or '')
+    return float(match.group(1)) if match else 0.0
+
+
+def form_fields(index, file_ref, mode):
+    return {'message': f"{MESSAGES[index % len(MESSAGES)]} ({mode} {index})", 'current_page': str(index % 8 + 1),
+            'file_ref_0': file_ref, **SETTINGS}
+
+
+def run_post(url, file_ref, count, keep_alive):
+    """[(latency ms, first text ms, overhead ms, bytes sent)] for POSTs of a multipart form"""
+    session = requests.Session() if keep_alive else None
+    results = []
+    for index in range(count):
+        fields = form_fields(index, file_ref, 'keep-alive' if keep_alive else 'post')
+        request = requests.Request('POST', f"{url}/api/chat", files={key: (None, value) for key, value in fields.items()})
+        client = session or requests.Session()  # A new session is a new connection
+        prepared = client.prepare_request(request)
+        sent = len(prepared.body) + sum(len(key) + len(value) + 4 for key, value in prepared.headers.items()) + 40
+        start = time.perf_counter()
+        response = client.send(prepared, timeout=120)
+        latency = (time.perf_counter() - start) * 1000
+        if not session:
+            client.close()
+        response.raise_for_status()
+        results.append((latency, latency, latency - server_total(response.headers.get('Server-Timing')), sent))
+    return results
+
+
+def run_socket(url, file_ref, count):
+    """Same as run_post over one chat socket (the page event is sent once, as the viewer does on navigation)"""
+    import websocket
+    ws = websocket.create_connection(url.replace('http', 'ws', 1) + '/api/chat/socket')
+    results = []
+    try:
+        assert json.loads(ws.recv())['type'] == 'ready'
+        ws.send(json.dumps({'type': 'page', 'file_ref_0': file_ref, **SETTINGS}))
+        for index in range(count):
+            fields = form_fields(index, file_ref, 'socket')
+            message = {'type': 'chat', 'id': str(index), 'message': fields['message'],
+                       'current_page': fields['current_page']}  # The rest is known from the page event
+            data = json.dumps(message)
+            start = time.perf_counter()
+            first = None
+            ws.send(data)
+            while True:
+                event = json.loads(ws.recv())
+                if event['type'] == 'partial' and first is None:
+                    first = (time.perf_counter() - start) * 1000
+                elif event['type'] == 'response':
+                    break
+            latency = (time.perf_counter() - start) * 1000
+            if event['status'] != 200:
+                raise RuntimeError(event['response'])
+            results.append((latency, first or latency, latency - server_total(event['response'].get('server_timing')),
+                            len(data) + WEBSOCKET_FRAME_BYTES))
+    finally:
+        ws.close()
+    return results
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_transport_')
+    pdf_path = os.path.join(workdir, 'textbook.pdf')
+    write_synthetic_pdf(pdf_path, 2, 8, text_lines=20)
+    provider, provider_url = start_fake_provider(latency=args.latency, seed=1, stream_tps=args.stream_tps)
+    backend, url = start_backend(args.backend, workdir, provider_url)
+    try:
+        file_ref = upload_file(url, pdf_path)
+        run_post(url, file_ref, 8, keep_alive=True)  # Index and describe the pages, so every mode sends the same prompts
+        modes = [('POST, new connection', lambda: run_post(url, file_ref, args.messages, keep_alive=False)),
+                 ('POST, keep-alive', lambda: run_post(url, file_ref, args.messages, keep_alive=True)),
+                 ('chat socket', lambda: run_socket(url, file_ref, args.messages))]
+        print(f"\n🔌 {args.messages} chat messages per transport to {args.backend}, provider latency {args.latency}s, "
+              f"{args.stream_tps or 'instant'} tokens/s")
+        print(f"  {'transport':<22} {'p50 ms':>8} {'p95 ms':>8} {'first text':>11} {'overhead':>9} {'bytes/msg':>10}")
+        for name, mode in modes:
+            results = mode()
+            latencies, first, overhead, sent = zip(*results)
+            print(f"  {name:<22} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+                  f"{percentile(first, 50):>11.1f} {percentile(overhead, 50):>9.1f} {sum(sent) / len(sent):>10.0f}")
+        print(f"  socket sessions: {requests.get(f'{url}/api/status').json().get('chat_socket')}")
+    finally:
+        stop(backend)
+        stop(provider)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-message overhead of POST /api/chat vs the chat socket")
+    parser.add_argument('--backend', default='backend', choices=['backend', 'backend_groq'])
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--latency', default='0', help="fake provider time to first token")
+    parser.add_argument('--stream-tps', type=float, default=0, help="fake provider tokens/s (0 = whole answer at once)")
+    run(parser.parse_args())
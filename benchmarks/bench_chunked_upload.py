@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Chunked upload benchmark
+Uploads a large synthetic textbook to a real backend process through the
+resumable /api/uploads protocol. The first pass "drops" a share of chunks
+and corrupts a few (to exercise the checksum check), then the client asks
+the server which chunks are missing and resumes. Afterwards a chat message
+referencing the file makes the backend render a page from the middle of it
+(against the fake provider). Reports throughput and the backend's peak RSS.
+
+Usage: python benchmarks/bench_chunked_upload.py [--size-mb 300] [--backend backend]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.harness import peak_rss_mb, start_backend, stop
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from fake_provider import create_fake_provider
+
+
+def read_chunk(path, index, chunk_size):
+    with open(path, 'rb') as f:
+        f.seek(index * chunk_size)
+        return f.read(chunk_size)
+
+
+def send_chunk(session, base_url, upload, path, index, corrupt=False):
+    data = read_chunk(path, index, upload['chunk_size'])
+    checksum = hashlib.sha256(data).hexdigest()
+    if corrupt:
+        data = bytes([data[0] ^ 0xFF]) + data[1:]
+    response = session.put(f"{base_url}/api/uploads/{upload['upload_id']}/chunks/{index}", data=data,
+                           headers={'X-Chunk-SHA256': checksum, 'Content-Type': 'application/octet-stream'})
+    return response.status_code
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_upload_')
+    pdf_path = os.path.join(workdir, 'textbook.pdf')
+    print(f"📄 Writing {args.size_mb}MB synthetic PDF ({args.pages} pages)...")
+    size = write_synthetic_pdf(pdf_path, args.size_mb, args.pages)
+
+    provider = make_server('127.0.0.1', 0, create_fake_provider(latency=0.05), threaded=True)
+    threading.Thread(target=provider.serve_forever, daemon=True).start()
+    process, base_url = start_backend(args.backend, workdir, f"http://127.0.0.1:{provider.server_port}")
+    rng = random.Random(1)
+
+    try:
+        http = requests.Session()
+        start = time.perf_counter()
+        upload = http.post(f"{base_url}/api/uploads", json={'filename': 'textbook.pdf', 'size': size}).json()
+        total = upload['total_chunks']
+
+        # First pass: some chunks are lost on the way, a few arrive corrupted
+        plan = [(i, rng.random() < args.corrupt_rate) for i in range(total) if rng.random() >= args.drop_rate]
+        with ThreadPoolExecutor(args.parallel) as pool:
+            statuses = list(pool.map(lambda item: send_chunk(http, base_url, upload, pdf_path, *item), plan))
+        rejected = sum(1 for status in statuses if status == 422)
+
+        # Resume: ask the server what is still missing
+        missing = http.get(f"{base_url}/api/uploads/{upload['upload_id']}").json()['missing']
+        with ThreadPoolExecutor(args.parallel) as pool:
+            statuses = list(pool.map(lambda i: send_chunk(http, base_url, upload, pdf_path, i), missing))
+        assert all(status == 200 for status in statuses), statuses
+
+        result = http.post(f"{base_url}/api/uploads/{upload['upload_id']}/complete").json()
+        elapsed = time.perf_counter() - start
+        assert 'file_ref' in result, result
+
+        # Render a page from the middle of the document through the chat endpoint
+        chat_start = time.perf_counter()
+        chat = http.post(f"{base_url}/api/chat", data={
+            'message': 'Explain this page', 'file_ref_0': result['file_ref'],
+            'current_page': args.pages // 2, 'total_pages': args.pages, 'current_pdf_index': 0})
+        chat_elapsed = time.perf_counter() - chat_start
+
+        print(f"\n📦 Chunked upload of {size / (1024 * 1024):.0f}MB in {total} chunks of {upload['chunk_size'] // (1024 * 1024)}MB")
+        print(f"   first pass: {len(plan)} sent, {rejected} rejected by checksum, {total - len(plan)} dropped")
+        print(f"   resumed:    {len(missing)} chunks")
+        print(f"   total:      {elapsed:.2f}s ({size / (1024 * 1024) / elapsed:.0f} MB/s), "
+              f"sha256 {result['sha256'][:12]}…, {result['page_count']} pages")
+        print(f"💬 Chat on page {args.pages // 2}: HTTP {chat.status_code} in {chat_elapsed:.2f}s")
+        print(f"🧠 Backend peak RSS: {peak_rss_mb(process.pid):.0f}MB")
+    finally:
+        stop(process)
+        provider.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description="Benchmark resumable chunked uploads")
+    parser.add_argument('--backend', default='backend', choices=['backend', 'backend_groq'])
+    parser.add_argument('--size-mb', type=int, default=300)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--parallel', type=int, default=4, help="concurrent chunk uploads")
+    parser.add_argument('--drop-rate', type=float, default=0.2, help="share of chunks lost in the first pass")
+    parser.add_argument('--corrupt-rate', type=float, default=0.05, help="share of chunks sent corrupted")
+    run(parser.parse_args())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Document pool benchmark
+Renders random pages of a large synthetic PDF the way the backend does,
+opening the document on every call (as before) and borrowing it from
+DocumentPool (from the file and from a memory map), and reports per-call
+latency:
+- page:  the page pixmap sent with a chat message (200 DPI)
+- tile:  one 512px viewer tile at zoom 1 (the pixmap render_tile makes,
+         without the WebP encoding, which costs the same either way)
+Two layouts are tried: the generator's classic xref table, and the same
+file re-saved with object streams and a compressed xref stream, as most
+real textbooks are.
+
+Usage: python benchmarks/bench_doc_pool.py [--size-mb 100] [--pages 500] [--calls 200]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF for PDF processing
+
+from benchmarks.harness import percentile
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from doc_pool import DocumentPool
+from page_render import TILE_SIZE
+
+CHAT_DPI = 200
+
+
+def render_page(doc, page_no):
+    page = doc[page_no - 1]
+    return page.get_pixmap(matrix=fitz.Matrix(CHAT_DPI / 72, CHAT_DPI / 72))
+
+
+def render_tile_pixmap(doc, page_no):
+    page = doc[page_no - 1]
+    clip = fitz.Rect(0, 0, TILE_SIZE, TILE_SIZE) & page.rect
+    return page.get_pixmap(matrix=fitz.Matrix(1, 1), clip=clip, alpha=False)
+
+
+def measure(path, pages, workload, strategy):
+    """Per-call seconds for `pages` renders with one strategy"""
+    pool = DocumentPool(use_mmap=strategy == 'pool+mmap') if strategy != 'open' else None
+    render = render_page if workload == 'page' else render_tile_pixmap
+    timings = []
+    for page_no in pages:
+        start = time.perf_counter()
+        if pool:
+            with pool.document(path) as doc:
+                render(doc, page_no)
+        else:
+            with fitz.open(path) as doc:
+                render(doc, page_no)
+        timings.append(time.perf_counter() - start)
+    if pool:
+        pool.clear()
+    return timings
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_doc_pool_')
+    try:
+        classic = os.path.join(workdir, 'classic.pdf')
+        write_synthetic_pdf(classic, args.size_mb, args.pages, text_lines=20)
+        objstm = os.path.join(workdir, 'objstm.pdf')
+        with fitz.open(classic) as doc:
+            doc.save(objstm, garbage=1, deflate=True, use_objstms=1)
+
+        rng = random.Random(0)
+        pages = [rng.randint(1, args.pages) for _ in range(args.calls)]
+        print(f"\n📄 {args.pages} pages, {args.calls} random page renders per run")
+        print(f"  {'layout':<8} {'workload':<8} {'strategy':<10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+        for layout, path in (('classic', classic), ('objstm', objstm)):
+            for workload in ('page', 'tile'):
+                for strategy in ('open', 'pool', 'pool+mmap'):
+                    measure(path, pages[:5], workload, strategy)  # Warm the OS page cache
+                    timings = measure(path, pages, workload, strategy)
+                    print(f"  {layout:<8} {workload:<8} {strategy:<10} {percentile(timings, 50) * 1000:>8.2f} "
+                          f"{percentile(timings, 95) * 1000:>8.2f} {statistics.mean(timings) * 1000:>8.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="fitz.open per call vs DocumentPool")
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--calls', type=int, default=200)
+    run(parser.parse_args())
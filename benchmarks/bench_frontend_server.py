@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Frontend server benchmark
+Compares the original single-threaded TCPServer with the threaded,
+cache-aware server from start_frontend.py. Concurrent clients load the app
+(index.html, script.js, styles.css) several times like returning visitors:
+the first visit downloads everything, later visits revalidate with
+If-None-Match and skip fingerprinted assets they already cached. One slow
+client holds a connection open for the whole run, which stalls the
+single-threaded server.
+
+Usage: python benchmarks/bench_frontend_server.py [--clients 20] [--visits 5] [--slow-seconds 2]
+"""
+
+import argparse
+import functools
+import gzip
+import http.client
+import os
+import re
+import socket
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import start_frontend
+
+
+class QuietLegacyHandler(start_frontend.MyHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_legacy():
+    server = socketserver.TCPServer(('127.0.0.1', 0), functools.partial(QuietLegacyHandler, directory=REPO_DIR))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_new():
+    server = start_frontend.make_server(0, production=True, directory=REPO_DIR, host='127.0.0.1')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def slow_client(port, seconds, stop):
+    """Open a connection and dribble the request out over `seconds`"""
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n")
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not stop.is_set():
+            sock.sendall(b"X-Slow: 1\r\n")
+            time.sleep(0.2)
+        sock.sendall(b"\r\n")
+        sock.recv(65536)
+
+
+def visitor(port, visits):
+    """A returning visitor: caches by ETag and keeps fingerprinted assets without asking"""
+    cache = {}  # path -> etag
+    immutable = set()
+    latencies = []
+    transferred = 0
+    for _ in range(visits):
+        start = time.perf_counter()
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        paths = ['/']
+        while paths:
+            path = paths.pop(0)
+            if path in immutable:
+                continue
+            headers = {'Accept-Encoding': 'gzip, br'}
+            if path in cache:
+                headers['If-None-Match'] = cache[path]
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            transferred += len(body)
+            if response.getheader('ETag'):
+                cache[path] = response.getheader('ETag')
+            if 'immutable' in (response.getheader('Cache-Control') or ''):
+                immutable.add(path)
+            if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            if path == '/' and response.status == 200:
+                html = body
+                if response.getheader('Content-Encoding') == 'gzip':
+                    html = gzip.decompress(body)
+                paths += ['/' + ref for ref in re.findall(r'(?:src|href)="((?:script|styles)[^"]*)"', html.decode())]
+            elif path == '/':
+                paths += [p for p in cache if p != '/']
+        connection.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies, transferred
+
+
+def run(name, server, args):
+    port = server.server_address[1]
+    stop = threading.Event()
+    slow = threading.Thread(target=slow_client, args=(port, args.slow_seconds, stop), daemon=True)
+    slow.start()
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        results = list(pool.map(lambda _: visitor(port, args.visits), range(args.clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    server.shutdown()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    transferred = sum(result[1] for result in results)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<22} {elapsed:>7.2f}s  page load p50 {statistics.median(latencies) * 1000:>7.1f}ms  "
+          f"p95 {p95 * 1000:>7.1f}ms  {transferred / 1024:>8.0f}KB transferred")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the frontend static server")
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--visits', type=int, default=5, help="page loads per client")
+    parser.add_argument('--slow-seconds', type=float, default=2.0, help="how long the slow client holds its connection")
+    args = parser.parse_args()
+
+    print(f"\n🌐 {args.clients} clients x {args.visits} visits, one slow client holding a connection for {args.slow_seconds}s\n")
+    run("TCPServer (original)", start_legacy(), args)
+    run("Threaded + caching", start_new(), args)
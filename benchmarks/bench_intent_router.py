@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Intent router benchmark
+Compares the old approach (looping re.search over a list of pattern
+strings) with IntentRouter's word trie as the number of trigger patterns
+grows. The router's cost per message should stay flat.
+
+Usage: python benchmarks/bench_intent_router.py [--messages 2000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import IntentRouter, build_default_router
+
+PATTERN_COUNTS = [12, 100, 1000, 5000]
+
+MESSAGES = [
+    "How can I teach fractions to my Class 6 students using the examples on this page?",
+    "Generate an image of the water cycle with clouds, rain and a river",
+    "Can you make a quick quiz on the parts of a plant for my class?",
+    "Translate this paragraph into Hindi so my students can follow along",
+    "What group activities would work for 40 students with only a blackboard?",
+    "Create a worksheet about multiplication tables for homework",
+]
+
+
+def synthetic_triggers(count, rng):
+    """Two-word trigger phrases like 'verb12 (a|an) noun7' that never occur in real messages"""
+    return [(f"verb{rng.randrange(count)}", f"noun{i}") for i in range(count)]
+
+
+def time_per_message(classify, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            classify(message)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000, help="messages classified per measurement")
+    args = parser.parse_args()
+    rng = random.Random(42)
+    repeat = max(1, args.messages // len(MESSAGES))
+
+    print(f"{'patterns':>9} | {'trie phrases':>12} | {'re.search loop (µs/msg)':>24} | {'intent router (µs/msg)':>23}")
+    print("-" * 79)
+    for count in PATTERN_COUNTS:
+        triggers = synthetic_triggers(count, rng)
+
+        legacy_patterns = [rf"{verb}\s+an?\s+{noun}" for verb, noun in triggers]
+
+        def legacy_classify(message):
+            message_lower = message.lower()
+            for pattern in legacy_patterns:
+                if re.search(pattern, message_lower):
+                    return True
+            return False
+
+        router = build_default_router()
+        router.add_intent('synthetic', [f"{verb} (a|an) {noun}" for verb, noun in triggers])
+
+        legacy = time_per_message(legacy_classify, MESSAGES, max(1, repeat // 20))
+        routed = time_per_message(router.classify, MESSAGES, repeat)
+        print(f"{count:>9} | {router.pattern_count:>12} | {legacy:>24.1f} | {routed:>23.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Model cascade benchmark
+Runs a backend against the fake provider twice, once with every request on
+the provider's default model and once with MODEL_CASCADE=1, and sends the
+same mixed workload both times: one-word translations, short questions,
+questions about a PDF page, quizzes and multi-day unit plans across class
+levels. The fake provider answers faster for smaller models
+(--model-latency) and returns a share of one-line non-answers
+(--weak-rate), so escalation gets exercised. Reported per tier: requests,
+escalations, p50/p95 latency and the per-request cost distribution (from
+the `usage` the backend returns, at model_router.MODEL_INFO prices).
+
+Usage: python benchmarks/bench_model_cascade.py [--backend backend] [--requests 60] [--weak-rate 0.1]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.harness import percentile, start_backend, start_fake_provider, stop, upload_file
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+# Roughly what small models gain over large ones on the real APIs (median seconds, lognormal sigma)
+MODEL_LATENCY = ("gpt-4.1-nano=lognormal:0.3,0.3;gpt-4.1-mini=lognormal:0.6,0.3;gpt-4.1=lognormal:1.2,0.3;"
+                 "llama-3.1-8b-instant=lognormal:0.15,0.3;meta-llama/llama-4-scout-17b-16e-instruct=lognormal:0.3,0.3;"
+                 "meta-llama/llama-4-maverick-17b-128e-instruct=lognormal:0.5,0.3")
+
+# (message, needs the PDF page, class levels it is asked for)
+WORKLOAD = [
+    ("Translate photosynthesis into Hindi", False, ('4', '6')),
+    ("How do you say evaporation in Tamil", False, ('5', '7')),
+    ("What is a food chain?", False, ('4', '6', '8')),
+    ("Give me a fun way to start today's class", False, ('3', '6')),
+    ("Explain this page in simple words", True, ('6', '8', '10')),
+    ("Create a quick quiz on this page", True, ('6', '9')),
+    ("Why do the students get this step wrong? Explain in detail with common misconceptions", True, ('9', '11')),
+    ("Design a 5-day unit plan on fractions with activities, assessments and a rubric for a mixed-ability class",
+     False, ('5', '8', '11')),
+]
+
+
+def run_mode(args, mode, pdf_path, workdir):
+    """Send the workload to one backend run; returns per-request samples"""
+    provider, provider_url = start_fake_provider(
+        latency='0.5', seed=1, extra_args=['--model-latency', MODEL_LATENCY, '--weak-rate', str(args.weak_rate)])
+    env = {'MODEL_CASCADE': '1' if mode == 'cascade' else '0'}
+    backend, url = start_backend(args.backend, workdir, provider_url, env)
+    samples = []
+    try:
+        file_ref = upload_file(url, pdf_path)
+        rng = random.Random(0)
+        for _ in range(args.requests):
+            message, with_page, levels = rng.choice(WORKLOAD)
+            data = {'message': message, 'class_level': rng.choice(levels), 'current_page': 1, 'student_language': 'hindi'}
+            if with_page:
+                data['file_ref_0'] = file_ref
+            start = time.perf_counter()
+            response = requests.post(f"{url}/api/chat", data=data, timeout=120)
+            seconds = time.perf_counter() - start
+            body = response.json()
+            if response.status_code != 200:
+                print(f"  ⚠️ {mode}: {body.get('error')}")
+                continue
+            usage = body.get('usage') or {}
+            samples.append({"tier": usage.get('tier', '?'), "model": usage.get('model', '?'), "seconds": seconds,
+                            "cost": usage.get('cost_usd') or 0.0, "escalated": bool(usage.get('escalated_from'))})
+    finally:
+        stop(backend)
+        stop(provider)
+    return samples
+
+
+def report(mode, samples):
+    by_tier = defaultdict(list)
+    for sample in samples:
+        by_tier[sample['tier']].append(sample)
+    rows = sorted(by_tier.items()) + [('all', samples)]
+    for tier, group in rows:
+        latencies = [sample['seconds'] * 1000 for sample in group]
+        costs = [sample['cost'] * 1000 for sample in group]  # USD per 1000 requests at this request's cost
+        escalated = sum(sample['escalated'] for sample in group)
+        model = group[0]['model'] if tier != 'all' else ''
+        print(f"  {mode:<8} {tier:<9} {model[:28]:<28} {len(group):>5} {escalated:>5} {percentile(latencies, 50):>8.0f} "
+              f"{percentile(latencies, 95):>8.0f} {statistics.mean(costs):>9.3f} {percentile(costs, 95):>9.3f} "
+              f"{sum(sample['cost'] for sample in group):>9.4f}")
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_cascade_')
+    pdf_path = os.path.join(workdir, 'textbook.pdf')
+    write_synthetic_pdf(pdf_path, 0, 3, text_lines=30)
+    print(f"\n🧭 {args.requests} mixed requests to {args.backend}, weak-answer rate {args.weak_rate:.0%}")
+    print(f"  {'mode':<8} {'tier':<9} {'model':<28} {'reqs':>5} {'esc':>5} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'$/1k avg':>9} {'$/1k p95':>9} {'total $':>9}")
+    for mode in ('single', 'cascade'):
+        report(mode, run_mode(args, mode, pdf_path, workdir))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Latency and cost per model tier, single model vs cascade")
+    parser.add_argument('--backend', default='backend', choices=['backend', 'backend_groq'])
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--weak-rate', type=float, default=0.1, help="share of fake answers that fail the quality check")
+    run(parser.parse_args())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Page DPI benchmark
+Renders a corpus of mixed page types the way a chat message's page image
+is made, at the old fixed 200 DPI and with plan_page_render's adaptive DPI
+(and tiles for oversized pages), and reports per page type:
+- render time (pixmap + PNG encoding, all tiles)
+- pixels sent and the largest single pixmap (what one render holds in memory)
+- payload bytes (PNG) and the number of images
+Page types: a textbook page (10pt), a dense page (7.5pt), a sparse title
+page, a scanned page (150 DPI image, no text layer), an A3 poster (9pt), a
+16:9 slide and an A0 poster. Vision models scale large images down anyway (OpenAI: 768px on
+the short side), so extra pixels cost time and bytes but add no detail.
+
+Usage: python benchmarks/bench_page_dpi.py [--runs 3]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF for PDF processing
+
+from page_render import RenderPlan, page_font_size, plan_page_render
+
+SAMPLE_WORDS = ("plants make food from sunlight water and carbon dioxide in their leaves "
+                "the green pigment chlorophyll absorbs light energy and releases oxygen").split()
+FIXED_DPI = 200
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(SAMPLE_WORDS) for _ in range(count))
+
+
+def _text_page(doc, rng, width, height, font_size, title=None, fill=1.0):
+    page = doc.new_page(width=width, height=height)
+    top = 54
+    if title:
+        page.insert_text((54, top + 24), title, fontsize=24)
+        top += 48
+    box = fitz.Rect(54, top, width - 54, top + (height - top - 54) * fill)
+    words = int(box.width * box.height / font_size ** 2 * 0.2)
+    while page.insert_textbox(box, _words(rng, words), fontsize=font_size) < 0:  # Nothing is drawn if it overflows
+        words = int(words * 0.9)
+    return page
+
+
+def build_corpus(rng):
+    """One document holding a page of each type; returns (doc, [(name, page number), ...])"""
+    doc = fitz.open()
+    pages = []
+    _text_page(doc, rng, 595, 842, 10, title="Chapter 3: Nutrition in Plants")
+    pages.append('textbook A4 10pt')
+    _text_page(doc, rng, 612, 792, 7.5)
+    pages.append('dense letter 7.5pt')
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((120, 380), "Science", fontsize=40)
+    page.insert_text((150, 440), "Class 7 Textbook", fontsize=24)
+    pages.append('title page')
+    # A scan: a 10pt text page as a 150 DPI grayscale image, without a text layer
+    source = fitz.open()
+    scan = _text_page(source, rng, 595, 842, 10).get_pixmap(matrix=fitz.Matrix(150 / 72, 150 / 72), colorspace=fitz.csGRAY)
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, pixmap=scan)
+    pages.append('scanned page')
+    page = _text_page(doc, rng, 842, 1191, 9, title="The Water Cycle", fill=0.5)
+    page.draw_circle((421, 950), 150)
+    pages.append('A3 poster 9pt')
+    _text_page(doc, rng, 960, 540, 18, title="Photosynthesis", fill=0.6)
+    pages.append('16:9 slide 18pt')
+    _text_page(doc, rng, 2384, 3370, 12, title="Periodic Table of Elements", fill=0.4)
+    pages.append('A0 poster 12pt')
+    return doc, list(enumerate(pages))
+
+
+def render(page, plan):
+    """(seconds, pixels, largest pixmap pixels, payload bytes) for one plan"""
+    start = time.perf_counter()
+    pixels = largest = payload = 0
+    for tile in plan.tiles:
+        pix = page.get_pixmap(matrix=fitz.Matrix(plan.dpi / 72, plan.dpi / 72), clip=tile)
+        payload += len(pix.tobytes('png'))
+        pixels += pix.width * pix.height
+        largest = max(largest, pix.width * pix.height)
+    return time.perf_counter() - start, pixels, largest, payload
+
+
+def run(args):
+    doc, pages = build_corpus(random.Random(0))
+    print(f"\n📐 Page image per page type, fixed {FIXED_DPI} DPI vs adaptive (median of {args.runs} runs)")
+    print(f"  {'page':<20} {'mode':<9} {'DPI':>6} {'images':>6} {'ms':>8} {'MPixels':>8} {'max MPx':>8} {'payload KB':>11}")
+    totals = {'fixed': [0, 0, 0], 'adaptive': [0, 0, 0]}
+    for number, name in pages:
+        page = doc[number]
+        plans = {
+            'fixed': RenderPlan(FIXED_DPI, [page.rect]),
+            'adaptive': plan_page_render(page.rect, page_font_size(page)),
+        }
+        for mode, plan in plans.items():
+            runs = [render(page, plan) for _ in range(args.runs)]
+            seconds = statistics.median(r[0] for r in runs)
+            _, pixels, largest, payload = runs[0]
+            totals[mode][0] += seconds
+            totals[mode][1] += pixels
+            totals[mode][2] += payload
+            print(f"  {name:<20} {mode:<9} {plan.dpi:>6.0f} {len(plan.tiles):>6} {seconds * 1000:>8.1f} "
+                  f"{pixels / 1e6:>8.2f} {largest / 1e6:>8.2f} {payload / 1024:>11.0f}")
+    for mode, (seconds, pixels, payload) in totals.items():
+        print(f"  {'all pages':<20} {mode:<9} {'':>6} {'':>6} {seconds * 1000:>8.1f} {pixels / 1e6:>8.2f} "
+              f"{'':>8} {payload / 1024:>11.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fixed 200 DPI vs adaptive DPI for chat page images")
+    parser.add_argument('--runs', type=int, default=3)
+    run(parser.parse_args())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Page image benchmark
+Compares the way a chat message's page image is built, from the rendered
+200 DPI pixmap to the data URL placed in the request:
+- legacy:  pix.tobytes("png") -> PIL Image.open -> image.save(PNG) ->
+           base64.b64encode().decode() -> f-string data URL (the old path)
+- png:     page_render.page_image, PNG encoded by MuPDF, base64 written into
+           one preallocated buffer
+- jpeg:    the same with MuPDF's JPEG encoder (PAGE_IMAGE_FORMAT=jpeg)
+Each strategy runs in its own process so peak RSS is not shared. Per page it
+reports CPU time and the peak of Python allocations (tracemalloc) for the
+encoding step only (rendering the pixmap is the same for all), plus the
+process's peak RSS and the payload size. Two documents are tried: text-only
+pages and pages with an incompressible scanned image.
+
+Usage: python benchmarks/bench_page_image.py [--pages 10] [--scan-mb 20]
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+CHAT_DPI = 200
+STRATEGIES = ('legacy', 'png', 'jpeg')
+
+
+def legacy_data_url(pix):
+    """The page image path before page_render.page_image"""
+    from PIL import Image
+    image = Image.open(BytesIO(pix.tobytes("png")))
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    return f"data:image/png;base64,{image_base64}"
+
+
+def worker(strategy, path):
+    """Encode every page with one strategy and print the measurements as JSON"""
+    import fitz  # PyMuPDF for PDF processing
+    from PIL import Image  # noqa: F401 - imported up front so the import is not measured
+    from page_render import page_image
+
+    encode = legacy_data_url if strategy == 'legacy' else lambda pix: page_image(pix, strategy).data_url
+    cpu, wall, traced, sizes = [], [], [], []
+    tracemalloc.start()
+    with fitz.open(path) as doc:
+        for page in doc:
+            pix = page.get_pixmap(matrix=fitz.Matrix(CHAT_DPI / 72, CHAT_DPI / 72))
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            url = encode(pix)
+            cpu.append(time.process_time() - cpu_start)
+            wall.append(time.perf_counter() - wall_start)
+            traced.append(tracemalloc.get_traced_memory()[1] - base)
+            sizes.append(len(url))
+            del url, pix
+    print(json.dumps({
+        'cpu_ms': statistics.mean(cpu) * 1000,
+        'wall_ms': statistics.mean(wall) * 1000,
+        'traced_peak_mb': max(traced) / 1024 / 1024,
+        'rss_peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'payload_kb': statistics.mean(sizes) / 1024,
+    }))
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_page_image_')
+    try:
+        documents = (('text', 0), ('scan', args.scan_mb))
+        print(f"\n🖼️  {args.pages} pages at {CHAT_DPI} DPI, mean per page (peaks: worst page / whole process)")
+        print(f"  {'pages':<6} {'strategy':<8} {'CPU ms':>8} {'wall ms':>8} {'py peak MB':>11} "
+              f"{'RSS peak MB':>12} {'payload KB':>11}")
+        for name, size_mb in documents:
+            path = os.path.join(workdir, f"{name}.pdf")
+            write_synthetic_pdf(path, size_mb, args.pages, text_lines=40)
+            for strategy in STRATEGIES:
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', strategy, path],
+                                        check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"  {name:<6} {strategy:<8} {result['cpu_ms']:>8.1f} {result['wall_ms']:>8.1f} "
+                      f"{result['traced_peak_mb']:>11.1f} {result['rss_peak_mb']:>12.1f} {result['payload_kb']:>11.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Page image encoding: PIL round-trip vs straight from the pixmap")
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--scan-mb', type=int, default=20, help="size of the scanned-image document")
+    parser.add_argument('--worker', nargs=2, metavar=('STRATEGY', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(*args.worker)
+    else:
+        run(args)
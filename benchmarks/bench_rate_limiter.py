@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Rate limiter benchmark
+Fires a burst of concurrent chat completions at the fake provider (which
+enforces RPM/TPM like OpenAI/Groq) with and without ProviderRateLimiter,
+and reports how many requests were rejected with 429.
+
+Usage: python benchmarks/bench_rate_limiter.py [--requests 40] [--rpm 120] [--tpm 30000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+from werkzeug.serving import make_server
+
+from fake_provider import create_fake_provider
+from rate_limiter import ProviderRateLimiter, estimate_request_tokens
+
+MAX_TOKENS = 300
+PROMPT = "Explain photosynthesis to a Class 6 student with one classroom activity. " * 25
+
+
+def start_provider(rpm, tpm, latency):
+    app = create_fake_provider(rpm, tpm, latency)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, app.config['FAKE_PROVIDER_STATS']
+
+
+def run_burst(base_url, total, concurrency, limiter=None):
+    client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+    messages = [{"role": "system", "content": "You are a teacher."}, {"role": "user", "content": PROMPT}]
+    results = {"ok": 0, "rate_limited": 0}
+    lock = threading.Lock()
+
+    def one_request(_):
+        reservation = None
+        if limiter:
+            reservation = limiter.acquire(estimate_request_tokens(messages), MAX_TOKENS, timeout=120)
+        try:
+            raw = client.chat.completions.with_raw_response.create(
+                model="gpt-4.1-mini", messages=messages, max_tokens=MAX_TOKENS)
+            if limiter:
+                limiter.record_usage(reservation, raw.parse().usage.prompt_tokens)
+                limiter.update_from_headers(raw.headers, reservation)
+            outcome = "ok"
+        except Exception as e:
+            if limiter:
+                limiter.record_error(e, reservation)
+            outcome = "rate_limited" if getattr(e, 'status_code', None) == 429 else "error"
+        with lock:
+            results[outcome] = results.get(outcome, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total)))
+    results["seconds"] = round(time.perf_counter() - start, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rpm', type=int, default=120)
+    parser.add_argument('--tpm', type=int, default=30000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    for label, use_limiter in [("without limiter", False), ("with limiter", True)]:
+        # Fresh provider per run so both start with a full budget
+        server, provider_stats = start_provider(args.rpm, args.tpm, args.latency)
+        base_url = f"http://127.0.0.1:{server.server_port}/v1"
+        limiter = ProviderRateLimiter("bench") if use_limiter else None
+        results = run_burst(base_url, args.requests, args.concurrency, limiter)
+        server.shutdown()
+        print(f"{label:>16}: {results}  provider saw {provider_stats}")
+        if limiter:
+            print(f"{'':>16}  limiter stats: {limiter.snapshot()}")
+
+
+if __name__ == '__main__':
+    main()
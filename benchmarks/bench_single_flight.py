@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Single flight benchmark
+A workshop burst: many teachers open the same page and click the same
+suggested prompt at the same moment. Runs a backend against the fake
+provider with the response cache off (RESPONSE_CACHE_TTL=0), once with
+SINGLE_FLIGHT=0 and once with coalescing on, fires the identical requests
+together, and reports latency, how many completions reached the provider
+and the backend's `in_flight` counters.
+
+Usage: python benchmarks/bench_single_flight.py [--backend backend] [--teachers 30] [--latency 1.0]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.harness import percentile, start_backend, start_fake_provider, stop, upload_file
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+MESSAGE = "Explain this page in simple words"
+
+
+def run_mode(args, single_flight, pdf_path):
+    workdir = tempfile.mkdtemp(prefix='bench_single_flight_')  # Fresh document index: no stored page description
+    provider, provider_url = start_fake_provider(latency=args.latency, seed=1)
+    env = {'SHARED_CACHE': 'memory', 'SINGLE_FLIGHT': '1' if single_flight else '0'}
+    backend, url = start_backend(args.backend, workdir, provider_url, env)
+    try:
+        file_ref = upload_file(url, pdf_path)
+        data = {'message': MESSAGE, 'class_level': '6', 'current_page': 2, 'file_ref_0': file_ref}
+        barrier = threading.Barrier(args.teachers)
+        latencies, errors = [], []
+
+        def teacher():
+            barrier.wait()
+            start = time.perf_counter()
+            response = requests.post(f"{url}/api/chat", data=data, timeout=300)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors.append(response.json().get('error'))
+
+        threads = [threading.Thread(target=teacher) for _ in range(args.teachers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        completions = requests.get(f"{provider_url}/stats").json()['accepted']
+        in_flight = requests.get(f"{url}/api/status").json().get('in_flight', {})
+    finally:
+        stop(backend)
+        stop(provider)
+    return latencies, errors, wall, completions, in_flight
+
+
+def run(args):
+    pdf_path = os.path.join(tempfile.mkdtemp(prefix='bench_single_flight_'), 'workshop.pdf')
+    write_synthetic_pdf(pdf_path, 8, 4, text_lines=30)  # Scanned-looking pages, so rendering costs something
+    print(f"\n🤝 {args.teachers} identical requests at once to {args.backend}, provider latency {args.latency}s")
+    print(f"  {'mode':<14} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'wall s':>7} {'provider':>9} {'errors':>7}  in_flight")
+    for single_flight in (False, True):
+        latencies, errors, wall, completions, in_flight = run_mode(args, single_flight, pdf_path)
+        mode = 'single flight' if single_flight else 'independent'
+        print(f"  {mode:<14} {percentile(latencies, 50):>8.0f} {percentile(latencies, 95):>8.0f} "
+              f"{max(latencies):>8.0f} {wall:>7.2f} {completions:>9} {len(errors):>7}  {in_flight}")
+        for error in sorted(set(errors)):
+            print(f"    ⚠️ {error}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Identical concurrent chat requests with and without single flight")
+    parser.add_argument('--backend', default='backend', choices=['backend', 'backend_groq'])
+    parser.add_argument('--teachers', type=int, default=30)
+    parser.add_argument('--latency', default='1.0', help="fake provider latency (seconds or a distribution)")
+    run(parser.parse_args())
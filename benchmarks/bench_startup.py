@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Worker cold-start benchmark
+Measures what a freshly scaled-up backend worker costs before it is useful:
+- imports:     `python -X importtime -c "import <backend>"`, summed per
+               top-level package, so the heaviest dependencies stand out
+- ready:       process spawn until GET /api/test first answers 200
+- first chat:  the first /api/chat with a one-page PDF, sent right after
+               that and again on a fresh worker left idle for --idle
+               seconds, which shows what deferred imports cost and how much
+               of it the background warm-up hides
+The fake provider answers instantly, so AI latency is not part of the numbers.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 12] [--idle 2]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import requests
+
+from benchmarks.harness import (backend_command, backend_env, free_port, peak_rss_mb, start_fake_provider,
+                                stop)
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def import_breakdown(module, workdir, env):
+    """(total seconds, {top-level package: seconds}) from -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=120)
+    packages = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+        if name.strip() == module:
+            total = int(cumulative_us) / 1e6
+    return total, packages
+
+
+def cold_start(module, workdir, env, pdf_path, idle=0.0):
+    """Seconds from spawn to the first 200 on /api/test and for the first chat message, plus RSS"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(backend_command(module, port), cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{module} exited during startup")
+            try:
+                if requests.get(f"{base_url}/api/test", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                time.sleep(0.005)
+        ready = time.perf_counter() - start
+        rss_ready = peak_rss_mb(process.pid)
+        time.sleep(idle)
+
+        data = {'message': 'How do I teach this page?', 'current_page': 1, 'total_pages': 1, 'current_pdf_index': 0}
+        chat_start = time.perf_counter()
+        with open(pdf_path, 'rb') as f:
+            response = requests.post(f"{base_url}/api/chat", data=data,
+                                     files={'file_0': ('lesson.pdf', f, 'application/pdf')}, timeout=120)
+        first_chat = time.perf_counter() - chat_start
+        if response.status_code != 200:
+            raise RuntimeError(f"first chat failed: {response.status_code} {response.text[:200]}")
+        return ready, first_chat, rss_ready, peak_rss_mb(process.pid)
+    finally:
+        stop(process)
+
+
+def run(args):
+    provider, provider_url = start_fake_provider(latency='0')
+    try:
+        for module in args.backends:
+            workdir = tempfile.mkdtemp(prefix='bench_startup_')
+            try:
+                env = backend_env(provider_url)
+                pdf_path = os.path.join(workdir, 'lesson.pdf')
+                write_synthetic_pdf(pdf_path, 0, 1, text_lines=20)
+
+                imports = [import_breakdown(module, workdir, env) for _ in range(args.runs)]
+                totals = [total for total, _ in imports]
+                print(f"\n🚀 {module}: import {statistics.median(totals) * 1000:.0f}ms (median of {args.runs})")
+                packages = defaultdict(list)
+                for _, breakdown in imports:
+                    for name, seconds in breakdown.items():
+                        packages[name].append(seconds)
+                heaviest = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+                for name, seconds in heaviest:
+                    print(f"   {name:<24} {statistics.median(seconds) * 1000:>7.1f}ms")
+
+                runs = [cold_start(module, workdir, env, pdf_path) for _ in range(args.runs)]
+                idle_runs = [cold_start(module, workdir, env, pdf_path, args.idle) for _ in range(args.runs)]
+                print(f"   {'ready ms':>10} {'first chat ms':>14} {f'after {args.idle:g}s idle':>16} "
+                      f"{'RSS ready MB':>13} {'RSS after MB':>13}")
+                print(f"   {statistics.median(r[0] for r in runs) * 1000:>10.0f} "
+                      f"{statistics.median(r[1] for r in runs) * 1000:>14.0f} "
+                      f"{statistics.median(r[1] for r in idle_runs) * 1000:>16.0f} "
+                      f"{statistics.median(r[2] for r in runs):>13.1f} {statistics.median(r[3] for r in runs):>13.1f}")
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        stop(provider)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backend worker cold start")
+    parser.add_argument('--backends', nargs='+', default=['backend', 'backend_groq'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12)
+    parser.add_argument('--idle', type=float, default=2.0, help="seconds between ready and the second first chat")
+    run(parser.parse_args())
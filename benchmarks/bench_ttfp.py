@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-page benchmark
+Uploads a large synthetic PDF to a real backend and measures how long a
+viewer needs before it can draw page 1, and how many bytes it transfers:
+- full:   download the whole PDF, then render page 1 (no range support)
+- range:  fetch 64KB chunks on demand the way pdf.js does with range
+          requests (tail + xref, then only the objects page 1 uses), plus
+          the time to render page 1 (measured locally, since MuPDF would
+          try to repair a file that only holds those chunks)
+- tiles:  the indexed thumbnail plus the page-1 tiles at zoom 1
+          (/api/docs/<id>/pages/1)
+Each is run cold and again as a revisit with the validators from the first
+response (304s) to show what conditional requests save.
+
+Usage: python benchmarks/bench_ttfp.py [--size-mb 300] [--pages 200] [--runs 5]
+"""
+
+import argparse
+import math
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import fitz  # PyMuPDF for PDF processing
+import requests
+
+from benchmarks.harness import start_backend, start_fake_provider, stop, upload_file
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+CHUNK = 65536  # pdf.js rangeChunkSize
+REF_PATTERN = re.compile(rb'(\d+) 0 R')
+
+
+class RangeReader:
+    """Reads a remote file in CHUNK-aligned ranges, fetching each chunk once"""
+
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
+        self.chunks = {}
+        self.requests = 0
+        self.size = None
+        self.bytes = 0
+
+    def _fetch(self, first, last):
+        start, end = first * CHUNK, (last + 1) * CHUNK - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+        response = self.session.get(self.url, headers={'Range': f"bytes={start}-{end}"})
+        assert response.status_code == 206, f"expected 206, got {response.status_code}"
+        self.requests += 1
+        self.bytes += len(response.content)
+        self.size = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+        for index in range(first, last + 1):
+            self.chunks[index] = response.content[(index - first) * CHUNK:(index - first + 1) * CHUNK]
+
+    def read(self, offset, length):
+        first, last = offset // CHUNK, (offset + length - 1) // CHUNK
+        if self.size is not None:
+            last = min(last, (self.size - 1) // CHUNK)
+        missing = [index for index in range(first, last + 1) if index not in self.chunks]
+        if missing:
+            # Contiguous missing chunks go in one request, like pdf.js does
+            self._fetch(missing[0], missing[-1])
+        data = b''.join(self.chunks[index] for index in range(first, last + 1))
+        skip = offset - first * CHUNK
+        return data[skip:skip + length]
+
+
+def load_first_page_ranges(reader):
+    """Walk trailer -> catalog -> page tree -> page 1 (classic xref tables only)"""
+    reader.read(0, 1)  # Learns the file size
+    tail = reader.read(max(0, reader.size - 1024), 1024)
+    xref_offset = int(re.search(rb'startxref\s+(\d+)', tail).group(1))
+    header = reader.read(xref_offset, 64)
+    match = re.match(rb'xref\s+0\s+(\d+)\s+', header)
+    if not match:
+        raise RuntimeError("only PDFs with classic xref tables are supported")
+    count = int(match.group(1))
+    table = reader.read(xref_offset + match.end(), count * 20)
+    offsets = {number: int(table[number * 20:number * 20 + 10]) for number in range(1, count)}
+    trailer = reader.read(xref_offset + match.end() + count * 20, 256)
+    root = int(re.search(rb'/Root\s+(\d+) 0 R', trailer).group(1))
+
+    def read_object(number):
+        offset = offsets[number]
+        data = reader.read(offset, 4096)
+        length = re.search(rb'/Length\s+(\d+)', data)
+        if length and b'stream' in data:
+            stream_start = data.index(b'stream') + len(b'stream\n')
+            return reader.read(offset, stream_start + int(length.group(1)) + 32)
+        while b'endobj' not in data:
+            data = reader.read(offset, len(data) * 2)
+        return data
+
+    catalog = read_object(root)
+    node = int(re.search(rb'/Pages\s+(\d+) 0 R', catalog).group(1))
+    while True:
+        obj = read_object(node)
+        kids = re.search(rb'/Kids\s*\[\s*(\d+) 0 R', obj)
+        if not kids:
+            break
+        node = int(kids.group(1))
+    # Everything the first page refers to (fonts, images, content), but not its parents
+    seen, pending = {node}, [node]
+    while pending:
+        obj = read_object(pending.pop())
+        obj = re.sub(rb'/Parent\s+\d+ 0 R', b'', obj.split(b'stream', 1)[0])
+        for ref in REF_PATTERN.findall(obj):
+            if int(ref) not in seen:
+                seen.add(int(ref))
+                pending.append(int(ref))
+
+
+def render_first_page(path):
+    """Seconds to open a PDF and render page 1"""
+    start = time.perf_counter()
+    with fitz.open(path) as doc:
+        doc[0].get_pixmap()
+    return time.perf_counter() - start
+
+
+def time_full(session, url, workdir, etag=None):
+    start = time.perf_counter()
+    headers = {'If-None-Match': etag} if etag else {}
+    response = session.get(url, headers=headers, stream=True)
+    received = 0
+    if response.status_code == 200:
+        path = os.path.join(workdir, 'full.pdf')
+        with open(path, 'wb') as f:
+            for block in response.iter_content(1024 * 1024):
+                f.write(block)
+                received += len(block)
+        render_first_page(path)
+    return time.perf_counter() - start, received, 1, response.headers.get('ETag'), response.status_code
+
+
+def time_range(session, url, render_seconds, etag=None):
+    start = time.perf_counter()
+    if etag:
+        # A cached copy only needs one revalidation before pdf.js reuses it
+        response = session.head(url, headers={'If-None-Match': etag})
+        return time.perf_counter() - start + render_seconds, 0, 1, etag, response.status_code
+    reader = RangeReader(session, url)
+    load_first_page_ranges(reader)
+    elapsed = time.perf_counter() - start + render_seconds
+    return elapsed, reader.bytes, reader.requests, session.head(url).headers.get('ETag'), 206
+
+
+def time_tiles(session, base_url, doc_id, page_info, etags=None):
+    page_url = f"{base_url}/api/docs/{doc_id}/pages/1"
+    columns, rows = (math.ceil(page_info[key] / 512) for key in ('width', 'height'))
+    urls = [page_url] + [f"{page_url}?zoom=1&x={x}&y={y}" for y in range(rows) for x in range(columns)]
+    start = time.perf_counter()
+    received, tags, statuses = 0, [], set()
+    for index, url in enumerate(urls):
+        headers = {'If-None-Match': etags[index]} if etags else {}
+        response = session.get(url, headers=headers)
+        received += len(response.content)
+        tags.append(response.headers.get('ETag'))
+        statuses.add(response.status_code)
+    return time.perf_counter() - start, received, len(urls), tags, statuses.pop() if len(statuses) == 1 else statuses
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_ttfp_')
+    pdf_path = os.path.join(workdir, 'textbook.pdf')
+    size = write_synthetic_pdf(pdf_path, args.size_mb, args.pages, text_lines=20)
+    print(f"\n📄 {args.pages}-page synthetic PDF, {size / (1024 * 1024):.0f}MB")
+
+    provider, provider_url = start_fake_provider()
+    backend, base_url = start_backend(args.backend, workdir, provider_url)
+    try:
+        file_ref = upload_file(base_url, pdf_path)
+        doc_id = file_ref.split('_', 1)[0]
+        deadline = time.time() + 300
+        while time.time() < deadline:
+            document = requests.get(f"{base_url}/api/docs/{doc_id}").json()
+            if document.get('status') == 'ready':
+                break
+            time.sleep(0.2)
+        url = f"{base_url}/uploads/{file_ref}"
+        render_seconds = statistics.median(render_first_page(pdf_path) for _ in range(3))
+        head = requests.head(url)
+        print(f"   Accept-Ranges: {head.headers.get('Accept-Ranges')}  ETag: {head.headers.get('ETag')}  "
+              f"Cache-Control: {head.headers.get('Cache-Control')}\n")
+
+        strategies = {
+            'full': lambda session, etag: time_full(session, url, workdir, etag),
+            'range': lambda session, etag: time_range(session, url, render_seconds, etag),
+        }
+        if document.get('status') == 'ready':
+            strategies['tiles'] = lambda session, etag: time_tiles(session, base_url, doc_id, document['pages'][0], etag)
+
+        print(f"  {'strategy':<8} {'cold ms':>9} {'MB':>8} {'reqs':>5}   {'revisit ms':>10} {'MB':>7}  status")
+        for name, measure in strategies.items():
+            cold, warm = [], []
+            for _ in range(args.runs):
+                with requests.Session() as session:
+                    cold.append(measure(session, None))
+                    warm.append(measure(session, cold[-1][3]))
+            print(f"  {name:<8} {statistics.median(r[0] for r in cold) * 1000:>9.0f} {cold[-1][1] / 1048576:>8.2f} "
+                  f"{cold[-1][2]:>5}   {statistics.median(r[0] for r in warm) * 1000:>10.1f} "
+                  f"{warm[-1][1] / 1048576:>7.2f}  {warm[-1][4]}")
+    finally:
+        stop(backend)
+        stop(provider)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time-to-first-page for a large PDF")
+    parser.add_argument('--backend', default='backend', choices=['backend', 'backend_groq'])
+    parser.add_argument('--size-mb', type=int, default=300)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=5)
+    run(parser.parse_args())
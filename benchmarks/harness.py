@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness
+Shared helpers for benchmarks that run the real backends as separate
+processes (in a throwaway working directory) against the fake provider.
+"""
+
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid):
+    """Peak resident set size of a process (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values, p):
+    """p-th percentile (0-100) by nearest rank"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(p / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def wait_until_up(url, process, name):
+    for _ in range(150):
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited during startup")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{name} did not start")
+
+
+def start_fake_provider(latency='0.2', seed=None, rpm=100000, tpm=100000000, extra_args=(), stream_tps=0):
+    """Run fake_provider.py in its own process; returns (process, base_url)
+
+    Streamed completions are sent at once after `latency` unless `stream_tps`
+    is set, so streamed and plain chat requests take the same time.
+    """
+    port = free_port()
+    command = [sys.executable, os.path.join(REPO_DIR, 'fake_provider.py'), '--port', str(port),
+               '--latency', str(latency), '--rpm', str(rpm), '--tpm', str(tpm), '--stream-tps', str(stream_tps),
+               *extra_args]
+    if seed is not None:
+        command += ['--seed', str(seed)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    wait_until_up(f"{base_url}/stats", process, 'fake provider')
+    return process, base_url
+
+
+def backend_env(provider_url, extra_env=None):
+    """Environment that points both backends at the fake provider
+
+    The response cache is off, so repeated messages reach the provider;
+    benchmarks of the cache itself turn it back on with RESPONSE_CACHE_TTL.
+    """
+    return dict(os.environ, PYTHONPATH=REPO_DIR,
+                OPENAI_API_KEY='fake-key', OPENAI_BASE_URL=f"{provider_url}/v1",
+                GROQ_API_KEY='fake-key', GROQ_BASE_URL=provider_url, **{'RESPONSE_CACHE_TTL': '0', **(extra_env or {})})
+
+
+def backend_command(module, port):
+    return [sys.executable, '-c', f"import {module}; {module}.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+
+
+def start_backend(module, workdir, provider_url, extra_env=None):
+    """Run backend.py / backend_groq.py from `workdir` against the provider; returns (process, base_url)"""
+    port = free_port()
+    process = subprocess.Popen(backend_command(module, port), cwd=workdir, env=backend_env(provider_url, extra_env),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    wait_until_up(f"{base_url}/api/test", process, module)
+    return process, base_url
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def upload_file(base_url, path):
+    """Upload a PDF through the chunked upload API and return its file_ref"""
+    size = os.path.getsize(path)
+    upload = requests.post(f"{base_url}/api/uploads", json={'filename': os.path.basename(path), 'size': size}).json()
+    with open(path, 'rb') as f:
+        for index in upload['missing']:
+            f.seek(index * upload['chunk_size'])
+            data = f.read(upload['chunk_size'])
+            response = requests.put(f"{base_url}/api/uploads/{upload['upload_id']}/chunks/{index}", data=data,
+                                    headers={'X-Chunk-SHA256': hashlib.sha256(data).hexdigest()})
+            response.raise_for_status()
+    return requests.post(f"{base_url}/api/uploads/{upload['upload_id']}/complete").json()['file_ref']
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Synthetic PDF generator
+Writes a textbook-sized PDF (hundreds of MB) straight to disk, one page at a
+time, so generating it needs no more memory than a single page. Each page
+carries `text_lines` lines of text (page density) and an uncompressed noise
+image sized so the file reaches size_mb, which keeps it incompressible like a
+scanned textbook. size_mb=0 gives a text-only PDF.
+
+Usage: python benchmarks/synthetic_pdf.py out.pdf [--size-mb 300] [--pages 200] [--text-lines 1]
+"""
+
+import argparse
+import os
+import random
+
+
+SAMPLE_WORDS = ("plants make food from sunlight water and carbon dioxide in their leaves "
+                "the green pigment chlorophyll absorbs light energy and releases oxygen").split()
+
+
+def write_synthetic_pdf(path, size_mb=300, pages=200, seed=0, text_lines=1):
+    """Write a PDF of roughly size_mb spread over `pages` pages; returns the byte size"""
+    rng = random.Random(seed)
+    image_bytes = size_mb * 1024 * 1024 // pages
+    width = 1024 if image_bytes else 1
+    height = max(1, image_bytes // (width * 3))
+    image_bytes = width * height * 3
+    text_lines = max(1, min(text_lines, 60))
+
+    # Object numbers: 1 catalog, 2 page tree, then (page, content, image) per page
+    offsets = {}
+    page_ids = [3 + i * 3 for i in range(pages)]
+
+    with open(path, 'wb') as f:
+        def start_object(number):
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode())
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        start_object(1)
+        f.write(b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        start_object(2)
+        kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+        f.write(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>\nendobj\n".encode())
+
+        for i, page_id in enumerate(page_ids):
+            content_id, image_id = page_id + 1, page_id + 2
+            start_object(page_id)
+            f.write((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                     f"/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> "
+                     f"/XObject << /Im1 {image_id} 0 R >> >> /Contents {content_id} 0 R >>\nendobj\n").encode())
+            lines = [f"Synthetic textbook page {i + 1}"]
+            lines += [' '.join(rng.choice(SAMPLE_WORDS) for _ in range(12)) for _ in range(text_lines - 1)]
+            text = ' '.join(f"({line}) Tj 0 -12 Td" for line in lines)
+            content = (f"q 468 0 0 560 72 100 cm /Im1 Do Q\n"
+                       f"BT /F1 10 Tf 72 760 Td {text} ET\n").encode()
+            start_object(content_id)
+            f.write(f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream\nendobj\n")
+            start_object(image_id)
+            f.write((f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                     f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Length {image_bytes} >>\nstream\n").encode())
+            f.write(rng.randbytes(image_bytes))
+            f.write(b"\nendstream\nendobj\n")
+
+        xref_offset = f.tell()
+        count = 3 + pages * 3
+        f.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+        for number in range(1, count):
+            f.write(f"{offsets[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+    return os.path.getsize(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a large synthetic PDF for upload tests")
+    parser.add_argument('path')
+    parser.add_argument('--size-mb', type=int, default=300)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--text-lines', type=int, default=1, help="lines of text per page (up to 60)")
+    args = parser.parse_args()
+    size = write_synthetic_pdf(args.path, args.size_mb, args.pages, text_lines=args.text_lines)
+    print(f"📄 Wrote {args.path}: {args.pages} pages, {size / (1024 * 1024):.1f}MB")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Request Cancellation
+Stops work nobody will read. A chat request carries a CancelToken that
+fires when the teacher's connection closes (the tab was closed, or the
+request was aborted and retried) or when the deadline the client sent in
+X-Deadline-Ms has passed. The backend checks it between stages (render,
+image generation, completion) and while reading a streamed completion, and
+closes the provider stream as soon as it fires, so the provider stops
+generating tokens.
+
+Disconnects are seen by peeking at the request's socket, which the
+Werkzeug and Gunicorn servers expose in the WSGI environ; behind servers
+that don't, only the deadline applies. CancellationStats estimates what
+each cancellation saved from the average completed call.
+"""
+
+import select
+import socket
+import threading
+import time
+
+DEADLINE_HEADER = 'X-Deadline-Ms'
+PROBE_INTERVAL = 0.2  # Seconds between socket checks for one request
+AVERAGE_WEIGHT = 0.2  # Weight of the newest call in the running averages
+
+SOCKET_KEYS = ('werkzeug.socket', 'gunicorn.socket')
+
+
+class RequestCancelled(Exception):
+    """The client disconnected ('disconnected') or the request's deadline passed ('deadline')"""
+
+    def __init__(self, reason):
+        super().__init__(f"Request cancelled ({reason})")
+        self.reason = reason
+
+
+def parse_deadline(value):
+    """Monotonic deadline from an X-Deadline-Ms value (milliseconds from now), or None; ValueError if invalid"""
+    if value is None or not str(value).strip():
+        return None
+    milliseconds = float(value)
+    if not milliseconds > 0:
+        raise ValueError(f"{DEADLINE_HEADER} must be a positive number of milliseconds")
+    return time.monotonic() + milliseconds / 1000
+
+
+def connection_probe(environ):
+    """Callable returning True once the client has closed the connection, or None if the server hides the socket"""
+    sock = next((environ[key] for key in SOCKET_KEYS if environ.get(key) is not None), None)
+    if sock is None:
+        return None
+
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            # A closed connection reads as end of file; readable data is a pipelined request
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except (ConnectionError, OSError):
+            return True
+        except ValueError:  # TLS sockets don't allow peeking
+            return False
+
+    return disconnected
+
+
+class CancelToken:
+    """Cancellation state of one request"""
+
+    def __init__(self, deadline=None, disconnected=None):
+        self.deadline = deadline
+        self._disconnected = disconnected
+        self._probed_at = 0.0
+        self.reason = None
+
+    @property
+    def active(self):
+        """Whether anything can cancel this request"""
+        return self.deadline is not None or self._disconnected is not None
+
+    def cancelled(self):
+        """'disconnected', 'deadline' or None"""
+        if self.reason:
+            return self.reason
+        now = time.monotonic()
+        if self.deadline is not None and now >= self.deadline:
+            self.reason = 'deadline'
+        elif self._disconnected and now - self._probed_at >= PROBE_INTERVAL:
+            self._probed_at = now
+            if self._disconnected():
+                self.reason = 'disconnected'
+        return self.reason
+
+    def remaining(self, limit=None):
+        """Seconds left before the deadline, capped at `limit` (None when neither is set)"""
+        if self.deadline is None:
+            return limit
+        left = max(0.0, self.deadline - time.monotonic())
+        return left if limit is None else min(limit, left)
+
+    def check(self):
+        if self.cancelled():
+            raise RequestCancelled(self.reason)
+
+
+class CancelGroup:
+    """Token for work shared by several requests (single flight): cancelled only once all of them are"""
+
+    def __init__(self, token):
+        self._lock = threading.Lock()
+        self._tokens = [token]
+        self.reason = None
+
+    def add(self, token):
+        with self._lock:
+            self._tokens.append(token)
+
+    @property
+    def active(self):
+        with self._lock:
+            return all(token.active for token in self._tokens)
+
+    def cancelled(self):
+        with self._lock:
+            tokens = list(self._tokens)
+        reasons = [token.cancelled() for token in tokens]
+        if all(reasons):
+            self.reason = reasons[-1]
+        return self.reason if all(reasons) else None
+
+    def remaining(self, limit=None):
+        with self._lock:
+            tokens = list(self._tokens)
+        left = [token.remaining(limit) for token in tokens]
+        return None if None in left else max(left)
+
+    def check(self):
+        if self.cancelled():
+            raise RequestCancelled(self.reason)
+
+
+class CancellationStats:
+    """Cancelled requests and the provider work they avoided, for /api/status"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._averages = {}  # work -> [seconds, tokens] of completed calls
+        self.stats = {"disconnected": 0, "deadline": 0, "completions_stopped": 0, "completions_skipped": 0,
+                      "images_skipped": 0, "tokens_saved": 0, "seconds_saved": 0.0}
+
+    def observe(self, work, seconds, tokens=0):
+        """Record a completed call ('completion' or 'image') for the savings estimates"""
+        with self._lock:
+            average = self._averages.get(work)
+            if average is None:
+                self._averages[work] = [seconds, tokens]
+            else:
+                average[0] += AVERAGE_WEIGHT * (seconds - average[0])
+                average[1] += AVERAGE_WEIGHT * (tokens - average[1])
+
+    def request_cancelled(self, reason):
+        with self._lock:
+            self.stats[reason] = self.stats.get(reason, 0) + 1
+
+    def skipped(self, work, tokens=0):
+        """A call that was never started: saves its average duration and tokens, plus `tokens` (its prompt)"""
+        with self._lock:
+            seconds, average_tokens = self._averages.get(work, (0.0, 0))
+            self.stats[f"{work}s_skipped"] = self.stats.get(f"{work}s_skipped", 0) + 1
+            self.stats["tokens_saved"] += int(tokens + average_tokens)
+            self.stats["seconds_saved"] += seconds
+
+    def stopped(self, work, elapsed, tokens_received):
+        """A call closed part way: saves what an average call would still have taken and generated"""
+        with self._lock:
+            seconds, average_tokens = self._averages.get(work, (0.0, 0))
+            self.stats[f"{work}s_stopped"] = self.stats.get(f"{work}s_stopped", 0) + 1
+            self.stats["tokens_saved"] += int(max(0, average_tokens - tokens_received))
+            self.stats["seconds_saved"] += max(0.0, seconds - elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()}
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Chat Socket
+One WebSocket per browser tab for chat, next to the multipart POST to
+/api/chat (optional: `pip install flask-sock`). A message on the socket is a
+small JSON object instead of a new connection and a re-encoded form; the
+answer's text is pushed while it is generated, a generated image as soon as
+it is ready, and page changes reach the server as they happen so the page
+the teacher is looking at is rendered before they ask about it.
+
+Client -> server (JSON text frames):
+  {"type": "page", "file_ref_0": ..., "current_pdf_index": 0, "current_page": 3, "total_pages": 12, ...}
+      Kept for the session: settings, open documents and the page in view
+  {"type": "chat", "id": "m1", "message": "...", "deadline_ms": 20000, ...}
+      A chat message; other fields (region, page_image, ...) apply to it only
+  {"type": "cancel", "id": "m1"}
+Server -> client:
+  {"type": "ready"}
+  {"type": "partial", "id": "m1", "text": "..."}   ({"reset": true}: start the text again)
+  {"type": "image", "id": "m1", "generated_image": {...}}
+  {"type": "response", "id": "m1", "status": 200, "response": {...}}   (what /api/chat returns)
+  {"type": "error", "error": "..."}
+
+Messages of a session are answered one at a time, in order.
+"""
+
+import json
+import logging
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cancellation import CancelToken, parse_deadline
+from page_descriptions import DESCRIPTION_MARKER
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = '/api/chat/socket'
+MAX_MESSAGE_BYTES = 64 * 1024  # Socket messages only carry text; PDFs go through /api/uploads
+PARTIAL_INTERVAL = 0.05  # Seconds between partial text frames (tokens arriving meanwhile are sent together)
+# Same origins the CORS setup allows (browsers don't apply CORS to WebSockets); no Origin = not a browser
+ALLOWED_ORIGIN = re.compile(r'^https?://(localhost|127\.0\.0\.1)(:\d+)?$')
+
+
+def allowed_origin(origin):
+    return origin is None or bool(ALLOWED_ORIGIN.match(origin))
+
+
+def form_fields(event):
+    """Form-style string fields from a socket message (as the POST form would carry them)"""
+    fields = {}
+    for key, value in event.items():
+        if key in ('type', 'id', 'deadline_ms') or (key.startswith('file_') and not key.startswith('file_ref_')):
+            continue  # PDFs are referenced by file_ref_N, never sent over the socket
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        if isinstance(value, (str, int, float)):
+            fields[key] = str(value)
+    return fields
+
+
+class PartialAnswer:
+    """Text of an answer as it streams in, without the page description the model appends after the answer
+
+    take() returns the visible text not sent yet (holding back what might be
+    the start of the description marker); due() does so at most every
+    PARTIAL_INTERVAL, so a fast stream doesn't become a frame per token.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.sent = 0
+        self.sent_at = 0.0
+
+    def add(self, piece):
+        self.text += piece
+
+    def due(self):
+        """Visible text not sent yet, once PARTIAL_INTERVAL has passed since the last frame ('' otherwise)"""
+        now = time.monotonic()
+        if now - self.sent_at < PARTIAL_INTERVAL:
+            return ''
+        self.sent_at = now
+        return self.take()
+
+    def take(self):
+        visible = self.text.partition(DESCRIPTION_MARKER)[0]
+        if DESCRIPTION_MARKER not in self.text:
+            for length in range(min(len(DESCRIPTION_MARKER) - 1, len(visible)), 0, -1):
+                if visible.endswith(DESCRIPTION_MARKER[:length]):
+                    visible = visible[:-length]
+                    break
+        new, self.sent = visible[self.sent:], max(self.sent, len(visible))
+        return new
+
+    def reset(self):
+        self.text = ''
+        self.sent = 0
+
+
+class SocketStats:
+    """Chat socket sessions and what went over them, for /api/status"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"open": 0, "sessions": 0, "messages": 0, "partials": 0, "images_pushed": 0, "page_events": 0,
+                      "pages_prefetched": 0, "rejected": 0}
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+class ChatSession:
+    """One chat socket: reads messages until the client goes, answering chats on a worker thread
+
+    answer(form, cancel, events) returns (response, status) for a chat
+    message; prefetch(form) prepares the page in view (run for the latest
+    page only, one at a time).
+    """
+
+    def __init__(self, ws, answer, prefetch=None, stats=None):
+        self.ws = ws
+        self.answer = answer
+        self.prefetch = prefetch
+        self.stats = stats or SocketStats()
+        self.context = {}
+        self.closed = False
+        self.cancelled = set()
+        self._send_lock = threading.Lock()
+        self._page_version = 0
+        self._chats = ThreadPoolExecutor(1, thread_name_prefix='chat-socket')
+        self._prefetches = ThreadPoolExecutor(1, thread_name_prefix='page-prefetch')
+        try:  # Frames go out at once instead of waiting for the previous one to be acknowledged
+            ws.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass
+
+    def send(self, kind, **payload):
+        if self.closed:
+            return
+        try:
+            with self._send_lock:
+                self.ws.send(json.dumps({"type": kind, **payload}))
+        except Exception as e:  # The connection went away while answering
+            logger.info(f"🔌 Chat socket closed while sending ({str(e)})")
+            self.closed = True
+
+    def run(self):
+        self.stats.count("open")
+        self.stats.count("sessions")
+        self.send('ready')
+        try:
+            while not self.closed:
+                data = self.ws.receive()
+                if data is None:
+                    continue
+                if isinstance(data, bytes) or len(data) > MAX_MESSAGE_BYTES:
+                    self.send('error', error=f"Messages must be JSON text under {MAX_MESSAGE_BYTES // 1024}KB")
+                    continue
+                try:
+                    event = json.loads(data)
+                    kind = event.get('type')
+                except (ValueError, AttributeError):
+                    self.send('error', error="Invalid message (JSON object expected)")
+                    continue
+                if kind == 'page':
+                    self._page(event)
+                elif kind == 'chat':
+                    self.stats.count("messages")
+                    self._chats.submit(self._chat, event)
+                elif kind == 'cancel':
+                    self.cancelled.add(event.get('id'))
+                else:
+                    self.send('error', error=f"Unknown message type: {kind}")
+        except Exception as e:  # ConnectionClosed from the socket library, or a broken connection
+            logger.info(f"🔌 Chat socket closed ({type(e).__name__})")
+        finally:
+            self.closed = True
+            self._chats.shutdown(wait=False)
+            self._prefetches.shutdown(wait=False)
+            self.stats.count("open", -1)
+
+    def _page(self, event):
+        self.stats.count("page_events")
+        self.context.update(form_fields(event))
+        if self.prefetch:
+            self._page_version += 1
+            self._prefetches.submit(self._prefetch, self._page_version, dict(self.context))
+
+    def _prefetch(self, version, form):
+        if self.closed or version != self._page_version:
+            return  # The teacher has already moved on
+        try:
+            if self.prefetch(form):
+                self.stats.count("pages_prefetched")
+        except Exception as e:
+            logger.warning(f"⚠️ Page prefetch failed: {str(e)}")
+
+    def _chat(self, event):
+        message_id = event.get('id')
+        if self.closed or message_id in self.cancelled:
+            return
+        partial = PartialAnswer()
+
+        def events(kind, payload):
+            if kind == 'partial':
+                if payload.get('reset'):
+                    partial.reset()
+                    self.send('partial', id=message_id, reset=True)
+                else:
+                    partial.add(payload['text'])
+                    text = partial.due()
+                    if text:
+                        self.stats.count("partials")
+                        self.send('partial', id=message_id, text=text)
+            elif kind == 'image':
+                self.stats.count("images_pushed")
+                self.send('image', id=message_id, **payload)
+
+        try:
+            cancel = CancelToken(parse_deadline(event.get('deadline_ms')),
+                                 lambda: self.closed or message_id in self.cancelled)
+        except ValueError:
+            self.send('response', id=message_id, status=400, response={"error": "Invalid deadline_ms"})
+            return
+        try:
+            response, status = self.answer({**self.context, **form_fields(event)}, cancel, events)
+        except Exception as e:
+            logger.error(f"Chat socket error: {str(e)}")
+            response, status = {"error": f"Server error: {str(e)}"}, 500
+        self.send('response', id=message_id, status=status, response=response)
+        self.cancelled.discard(message_id)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Resumable Chunked Uploads
+Large textbooks (50-300MB) are sent as fixed-size chunks, each with its own
+SHA-256, and written at their offset into a preallocated file. A dropped
+connection only costs the chunk in flight: the client asks which chunks the
+server already has and sends the rest. Session state lives next to the
+partial file, so uploads also survive a backend restart.
+
+Protocol (routes are defined in the backends):
+    POST /api/uploads                        {"filename", "size"} -> session
+    PUT  /api/uploads/<id>/chunks/<index>    raw bytes, X-Chunk-SHA256 (or X-Chunk-CRC32) header
+    GET  /api/uploads/<id>                   session with received chunks
+    POST /api/uploads/<id>/complete          -> {"file_ref", "sha256", ...}
+"""
+
+from werkzeug.utils import secure_filename
+from upload_stream import PdfPageProbe, stored_name
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB
+READ_SIZE = 64 * 1024  # Bytes read from the request / disk at a time
+SESSION_TTL = 24 * 60 * 60  # Unfinished uploads are dropped after a day
+COMPLETE_LEASE = 10 * 60  # Seconds a complete() call holds an upload before another one may retry it
+
+
+class UploadError(Exception):
+    """Upload protocol error carrying the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class ChunkedUploadStore:
+    """Tracks chunked upload sessions and assembles the finished files"""
+
+    def __init__(self, folder, max_size, chunk_size=DEFAULT_CHUNK_SIZE, session_ttl=SESSION_TTL):
+        self.folder = folder
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    # Hidden names keep sessions out of cleanup_files(), so uploads can resume after a restart
+    def _session_path(self, upload_id):
+        return os.path.join(self.folder, f".chunked_{upload_id}.json")
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.folder, f".chunked_{upload_id}.part")
+
+    def _load(self, upload_id):
+        if not upload_id or secure_filename(upload_id) != upload_id:
+            raise UploadError("Invalid upload id", 404)
+        try:
+            with open(self._session_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Upload not found or expired", 404)
+
+    def _save(self, session):
+        path = self._session_path(session['upload_id'])
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        os.replace(path + '.tmp', path)
+
+    def _public(self, session):
+        received = set(session['received'])
+        return {
+            "upload_id": session['upload_id'],
+            "filename": session['filename'],
+            "size": session['size'],
+            "chunk_size": session['chunk_size'],
+            "total_chunks": session['total_chunks'],
+            "received": sorted(received),
+            "missing": [i for i in range(session['total_chunks']) if i not in received],
+        }
+
+    def _chunk_length(self, session, index):
+        start = index * session['chunk_size']
+        return min(session['chunk_size'], session['size'] - start)
+
+    def create(self, filename, size):
+        """Start an upload session and preallocate its file"""
+        if not filename or not filename.lower().endswith('.pdf'):
+            raise UploadError("File type not allowed. Only PDF files are supported.")
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError("File size is required")
+        if size <= 0:
+            raise UploadError("File is empty")
+        if size > self.max_size:
+            raise UploadError(f"File {filename} is too large. Maximum size is {self.max_size // (1024 * 1024)}MB.", 413)
+
+        self.purge_expired()
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "total_chunks": (size + self.chunk_size - 1) // self.chunk_size,
+            "received": [],
+            "chunk_sha256": {},
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        with open(self._part_path(upload_id), 'wb') as f:
+            f.truncate(size)  # Sparse preallocation; chunks are written at their offsets
+        with self._lock:
+            self._save(session)
+        logger.info(f"📦 Started chunked upload {upload_id[:8]} for {filename} ({size} bytes, {session['total_chunks']} chunks)")
+        return self._public(session)
+
+    def status(self, upload_id):
+        with self._lock:
+            return self._public(self._load(upload_id))
+
+    def _completing(self, session):
+        return session.get('completing_at', 0) > time.time() - COMPLETE_LEASE
+
+    def write_chunk(self, upload_id, index, stream, content_length, expected_sha256=None, expected_crc32=None):
+        """Stream one chunk from `stream` to its offset, verifying length and checksum
+
+        Clients without SHA-256 (browsers on plain-http LAN origins have no
+        crypto.subtle) send a CRC32 instead; chunks with neither are only
+        checked for length.
+        """
+        with self._lock:
+            session = self._load(upload_id)
+        if self._completing(session):
+            raise UploadError("Upload is being completed", 409)
+        if index < 0 or index >= session['total_chunks']:
+            raise UploadError(f"Chunk index {index} out of range")
+        expected_length = self._chunk_length(session, index)
+        if content_length != expected_length:
+            raise UploadError(f"Chunk {index} must be {expected_length} bytes, got {content_length}",
+                              413 if (content_length or 0) > expected_length else 400)
+
+        digest = hashlib.sha256()
+        crc = 0
+        written = 0
+        try:
+            with open(self._part_path(upload_id), 'r+b') as f:
+                f.seek(index * session['chunk_size'])
+                while written < expected_length:
+                    data = stream.read(min(READ_SIZE, expected_length - written))
+                    if not data:
+                        break
+                    digest.update(data)
+                    crc = zlib.crc32(data, crc)
+                    f.write(data)
+                    written += len(data)
+            if written != expected_length:
+                raise UploadError(f"Chunk {index} was cut off after {written} bytes")
+            if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+                raise UploadError(f"Checksum mismatch for chunk {index}", 422)
+            if expected_crc32 and not expected_sha256 and f"{crc:08x}" != expected_crc32.lower().zfill(8):
+                raise UploadError(f"Checksum mismatch for chunk {index}", 422)
+        except Exception:
+            if written:  # A resent chunk may have overwritten good bytes: it has to be sent again
+                self._forget_chunks(upload_id, [index])
+            raise
+
+        with self._lock:
+            session = self._load(upload_id)
+            if self._completing(session):
+                raise UploadError("Upload is being completed", 409)
+            if index not in session['received']:
+                session['received'].append(index)
+            session['chunk_sha256'][str(index)] = digest.hexdigest()
+            session['updated_at'] = time.time()
+            self._save(session)
+            return self._public(session)
+
+    def _forget_chunks(self, upload_id, indexes, release=False):
+        """Mark chunks as missing again (and end a complete() claim with `release`)"""
+        with self._lock:
+            try:
+                session = self._load(upload_id)
+            except UploadError:
+                return
+            session['received'] = [i for i in session['received'] if i not in indexes]
+            for index in indexes:
+                session['chunk_sha256'].pop(str(index), None)
+            if release:
+                session.pop('completing_at', None)
+            self._save(session)
+
+    def complete(self, upload_id):
+        """Verify every chunk arrived, hash the file and move it to its stored name
+
+        The upload is claimed under the lock and hashed outside it, so other
+        uploads' chunks and status calls don't wait for a whole-file pass.
+        """
+        with self._lock:
+            session = self._load(upload_id)
+            missing = self._public(session)['missing']
+            if missing:
+                raise UploadError(f"Upload incomplete: {len(missing)} chunk(s) missing", 409)
+            if self._completing(session):
+                raise UploadError("Upload is already being completed", 409)
+            session['completing_at'] = time.time()
+            self._save(session)
+
+        # One sequential pass for the whole-file hash, the page count and each chunk's hash (constant memory)
+        part_path = self._part_path(upload_id)
+        digest = hashlib.sha256()
+        probe = PdfPageProbe()
+        changed = []
+        try:
+            with open(part_path, 'rb') as f:
+                is_pdf = f.read(5).startswith(b'%PDF')
+                f.seek(0)
+                for index in range(session['total_chunks']):
+                    chunk_digest = hashlib.sha256()
+                    remaining = self._chunk_length(session, index)
+                    while remaining > 0:
+                        data = f.read(min(READ_SIZE, remaining))
+                        if not data:
+                            break
+                        remaining -= len(data)
+                        chunk_digest.update(data)
+                        digest.update(data)
+                        probe.feed(data)
+                    expected = session['chunk_sha256'].get(str(index))
+                    if remaining or (expected and chunk_digest.hexdigest() != expected):
+                        changed.append(index)
+            probe.finish()
+        except OSError:
+            self._forget_chunks(upload_id, [], release=True)  # Let the client retry complete()
+            raise
+        if changed:
+            self._forget_chunks(upload_id, changed, release=True)
+            raise UploadError(f"{len(changed)} chunk(s) changed after they were received; send them again", 409)
+
+        with self._lock:
+            if not is_pdf:
+                self._discard(upload_id)
+                raise UploadError("Uploaded file is not a PDF")
+
+            saved_as = stored_name(digest.hexdigest(), session['filename'])
+            path = os.path.join(self.folder, saved_as)
+            reused = os.path.exists(path)
+            if reused:
+                os.remove(part_path)
+            else:
+                os.replace(part_path, path)
+            os.remove(self._session_path(upload_id))
+
+        logger.info(f"📦 Completed chunked upload {upload_id[:8]} -> {saved_as}" + (" (already stored)" if reused else ""))
+        return {
+            "file_ref": saved_as,
+            "filename": session['filename'],
+            "size": session['size'],
+            "sha256": digest.hexdigest(),
+            "page_count": probe.page_count,
+            "reused": reused,
+        }
+
+    def _discard(self, upload_id):
+        for path in (self._part_path(upload_id), self._session_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def purge_expired(self):
+        """Delete sessions that haven't received a chunk within session_ttl"""
+        cutoff = time.time() - self.session_ttl
+        for name in os.listdir(self.folder):
+            if not (name.startswith('.chunked_') and name.endswith('.json')):
+                continue
+            upload_id = name[len('.chunked_'):-len('.json')]
+            try:
+                with open(os.path.join(self.folder, name), 'r', encoding='utf-8') as f:
+                    updated_at = json.load(f).get('updated_at', 0)
+            except Exception:
+                updated_at = 0
+            if updated_at < cutoff:
+                self._discard(upload_id)
+                logger.info(f"🗑️ Dropped expired chunked upload {upload_id[:8]}")
+
+    def resolve(self, file_ref):
+        """Path of a completed upload referenced by the client, or None"""
+        if not file_ref or file_ref.startswith('.') or secure_filename(file_ref) != file_ref:
+            return None
+        path = os.path.join(self.folder, file_ref)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Document Index
+Per-document preprocessing done once, when a PDF is uploaded: page count,
+page sizes, extracted text, small-text font size, text/image coverage
+ratios, embedded image boxes and a small WebP thumbnail for every page, stored in a SQLite sidecar keyed
+by the document's content hash. Page descriptions written by the vision
+model during chat (page_descriptions.py) and pre-generated summaries,
+vocabulary lists and quizzes (page_artifacts.py) are kept alongside. Later requests look these up instead of
+reopening the PDF, and the index survives restarts (cleanup_files only wipes
+uploads/ and temp_images/), so re-uploading a known PDF costs nothing.
+Worker processes share the file: a document is indexed by the worker
+holding its lease, which is renewed while it works and can be taken over
+once it expires (e.g. after that worker was killed).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from page_render import pixmap_to_webp, small_font_size
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTH = 160  # Pixels; enough for a page strip in the UI
+MAX_AGE_DAYS = 30  # Documents not used for this long are dropped at startup
+LEASE_SECONDS = 120  # A worker's claim on indexing a document; renewed after every page
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    filename TEXT,
+    size INTEGER,
+    page_count INTEGER,
+    pages_indexed INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    doc_id TEXT NOT NULL,
+    page_no INTEGER NOT NULL,
+    width REAL,
+    height REAL,
+    rotation INTEGER,
+    text TEXT,
+    text_chars INTEGER,
+    font_size REAL,
+    text_coverage REAL,
+    image_coverage REAL,
+    image_boxes TEXT,
+    thumbnail BLOB,
+    PRIMARY KEY (doc_id, page_no)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS page_descriptions (
+    doc_id TEXT NOT NULL,
+    page_no INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (doc_id, page_no)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS page_artifacts (
+    doc_id TEXT NOT NULL,
+    page_no INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    text TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (doc_id, page_no, kind, variant)
+) WITHOUT ROWID;
+"""
+
+
+DOC_ID_PATTERN = re.compile(r'[0-9a-f]{16}')
+
+
+def doc_id_for(sha256):
+    """Short document id: the same 16-hex prefix used in stored upload names"""
+    return sha256[:16]
+
+
+def is_doc_id(value):
+    return bool(DOC_ID_PATTERN.fullmatch(value or ''))
+
+
+def _area(box, page_rect):
+    """Area of a bounding box clipped to the page"""
+    import fitz  # PyMuPDF for PDF processing
+    clipped = fitz.Rect(box) & page_rect
+    return 0.0 if clipped.is_empty else clipped.width * clipped.height
+
+
+def extract_page(page, thumbnail_width=THUMBNAIL_WIDTH):
+    """Everything the index stores about one page"""
+    import fitz  # PyMuPDF for PDF processing
+    rect = page.rect
+    page_area = (rect.width * rect.height) or 1.0
+    text_blocks = []
+    text_area = 0.0
+    spans = []
+    # Same extraction as get_text("blocks"), plus the span font sizes
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_BLOCKS)['blocks']:
+        if block['type'] != 0:
+            continue
+        lines = []
+        for line in block['lines']:
+            lines.append(''.join(span['text'] for span in line['spans']))
+            spans.extend((span['size'], len(span['text'].strip())) for span in line['spans'])
+        text = '\n'.join(lines).strip()
+        if text:
+            text_blocks.append(text)
+            text_area += _area(block['bbox'], rect)
+    image_boxes = [[round(v, 1) for v in info['bbox']] for info in page.get_image_info()]
+    image_area = sum(_area(box, rect) for box in image_boxes)
+    text = '\n'.join(text_blocks)
+
+    zoom = thumbnail_width / (rect.width or thumbnail_width)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return {
+        "width": rect.width,
+        "height": rect.height,
+        "rotation": page.rotation,
+        "text": text,
+        "text_chars": len(text),
+        "font_size": small_font_size(spans),
+        "text_coverage": min(1.0, text_area / page_area),
+        "image_coverage": min(1.0, image_area / page_area),
+        "image_boxes": image_boxes,
+        "thumbnail": pixmap_to_webp(pix),
+    }
+
+
+class DocumentIndex:
+    """SQLite-backed per-page metadata for uploaded PDFs, built in the background"""
+
+    DB_FILE = 'index.sqlite3'
+
+    def __init__(self, folder, thumbnail_width=THUMBNAIL_WIDTH, max_age_days=MAX_AGE_DAYS):
+        self.folder = folder
+        self.thumbnail_width = thumbnail_width
+        os.makedirs(folder, exist_ok=True)
+        self.db_path = os.path.join(folder, self.DB_FILE)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._token = uuid.uuid4().hex[:8]
+        # One worker: indexing is CPU-bound and must not starve chat requests
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='doc-index')
+
+        db = self._db()
+        db.executescript(SCHEMA)
+        # Indexes from before font sizes / leases were kept
+        for table, column, kind in (('pages', 'font_size', 'REAL'), ('documents', 'owner', 'TEXT'),
+                                    ('documents', 'lease_until', 'REAL')):
+            if column not in [row['name'] for row in db.execute(f"PRAGMA table_info({table})")]:
+                try:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    pass  # Another worker added it first
+        # Indexing interrupted by a restart is redone when the document is next seen; other workers' is left alone
+        db.execute("UPDATE documents SET status = 'pending' WHERE status = 'processing' "
+                   "AND (lease_until IS NULL OR lease_until < ?)", (time.time(),))
+        self.prune(max_age_days)
+
+    @property
+    def owner(self):
+        """This worker process's name on the leases it holds (differs after a fork)"""
+        return f"{os.getpid()}:{self._token}"
+
+    def _db(self):
+        """Per-thread connection (WAL lets readers proceed while the worker writes), reopened after a fork"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def index_document(self, sha256, path, filename=None):
+        """Make sure a document is indexed; work happens on the background worker
+
+        Returns the document's current row (status 'ready' if it was indexed before).
+        """
+        doc_id = doc_id_for(sha256)
+        now = time.time()
+        db = self._db()
+        row = db.execute("SELECT status FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row and row['status'] == 'ready':
+            db.execute("UPDATE documents SET last_used = ? WHERE doc_id = ?", (now, doc_id))
+            return self.document(doc_id)
+        with self._lock:
+            if doc_id in self._pending:
+                return self.document(doc_id)
+            self._pending.add(doc_id)
+        # Claim the document unless it is ready or another worker's lease on it still runs
+        claimed = db.execute("""INSERT INTO documents (doc_id, sha256, filename, size, status, created_at, last_used,
+                                owner, lease_until) VALUES (?, ?, ?, ?, 'pending', ?, ?, ?, ?)
+                                ON CONFLICT(doc_id) DO UPDATE SET status = 'pending', last_used = excluded.last_used,
+                                owner = excluded.owner, lease_until = excluded.lease_until
+                                WHERE documents.status != 'ready' AND (documents.lease_until IS NULL
+                                                                      OR documents.lease_until < excluded.last_used)""",
+                             (doc_id, sha256, filename, os.path.getsize(path), now, now, self.owner,
+                              now + LEASE_SECONDS)).rowcount
+        if claimed:
+            self._executor.submit(self._build, doc_id, path)
+        else:
+            with self._lock:
+                self._pending.discard(doc_id)
+            db.execute("UPDATE documents SET last_used = ? WHERE doc_id = ?", (now, doc_id))
+        return self.document(doc_id)
+
+    def _renew(self, db, doc_id):
+        """Extend this worker's lease on a document; False if another worker has taken it over"""
+        return db.execute("UPDATE documents SET lease_until = ? WHERE doc_id = ? AND owner = ?",
+                          (time.time() + LEASE_SECONDS, doc_id, self.owner)).rowcount > 0
+
+    def _build(self, doc_id, path):
+        import fitz  # PyMuPDF for PDF processing
+        db = self._db()
+        started = time.time()
+        try:
+            if not self._renew(db, doc_id):
+                logger.info(f"🗂️ Document {doc_id} is being indexed by another worker")
+                return
+            with fitz.open(path) as doc:
+                db.execute("UPDATE documents SET status = 'processing', page_count = ?, pages_indexed = 0 WHERE doc_id = ?",
+                           (doc.page_count, doc_id))
+                for page_no in range(doc.page_count):
+                    if not self._renew(db, doc_id):
+                        logger.warning(f"⚠️ Lost the lease on document {doc_id}, another worker finishes it")
+                        return
+                    page = extract_page(doc[page_no], self.thumbnail_width)
+                    db.execute("""INSERT OR REPLACE INTO pages (doc_id, page_no, width, height, rotation, text, text_chars,
+                                  font_size, text_coverage, image_coverage, image_boxes, thumbnail)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                               (doc_id, page_no + 1, page['width'], page['height'], page['rotation'], page['text'],
+                                page['text_chars'], page['font_size'], page['text_coverage'], page['image_coverage'],
+                                json.dumps(page['image_boxes']), page['thumbnail']))
+                    db.execute("UPDATE documents SET pages_indexed = ? WHERE doc_id = ?", (page_no + 1, doc_id))
+                db.execute("UPDATE documents SET status = 'ready', error = NULL, owner = NULL, lease_until = NULL "
+                           "WHERE doc_id = ?", (doc_id,))
+                logger.info(f"🗂️ Indexed document {doc_id} ({doc.page_count} pages) in {time.time() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"❌ Indexing document {doc_id} failed: {str(e)}")
+            db.execute("UPDATE documents SET status = 'failed', error = ?, owner = NULL, lease_until = NULL "
+                       "WHERE doc_id = ? AND owner = ?", (str(e), doc_id, self.owner))
+        finally:
+            with self._lock:
+                self._pending.discard(doc_id)
+
+    def document(self, doc_id):
+        """Document row as a dict, or None"""
+        row = self._db().execute(
+            "SELECT doc_id, sha256, filename, size, page_count, pages_indexed, status, error, created_at, last_used "
+            "FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return dict(row) if row else None
+
+    def page(self, doc_id, page_no):
+        """Indexed metadata for one page (1-based, without the thumbnail), or None"""
+        row = self._db().execute(
+            "SELECT page_no, width, height, rotation, text, text_chars, font_size, text_coverage, image_coverage, "
+            "image_boxes FROM pages WHERE doc_id = ? AND page_no = ?", (doc_id, page_no)).fetchone()
+        if not row:
+            return None
+        page = dict(row)
+        page['image_boxes'] = json.loads(page['image_boxes'] or '[]')
+        return page
+
+    def pages(self, doc_id):
+        """Per-page summary (no text or thumbnails) for every indexed page"""
+        rows = self._db().execute(
+            "SELECT page_no, width, height, rotation, text_chars, text_coverage, image_coverage, image_boxes "
+            "FROM pages WHERE doc_id = ? ORDER BY page_no", (doc_id,)).fetchall()
+        pages = [dict(row) for row in rows]
+        for page in pages:
+            page['image_boxes'] = json.loads(page['image_boxes'] or '[]')
+        return pages
+
+    def page_description(self, doc_id, page_no):
+        """Stored description of a page (1-based) from an earlier vision call, or None"""
+        row = self._db().execute("SELECT description FROM page_descriptions WHERE doc_id = ? AND page_no = ?",
+                                 (doc_id, page_no)).fetchone()
+        return json.loads(row['description']) if row else None
+
+    def save_page_description(self, doc_id, page_no, description, model=None):
+        self._db().execute("INSERT OR REPLACE INTO page_descriptions (doc_id, page_no, description, model, created_at) "
+                           "VALUES (?, ?, ?, ?, ?)",
+                           (doc_id, page_no, json.dumps(description, ensure_ascii=False), model, time.time()))
+
+    def page_artifact(self, doc_id, page_no, kind, variant):
+        """Pre-generated answer (markdown) of one kind for a page, or None"""
+        row = self._db().execute("SELECT text FROM page_artifacts WHERE doc_id = ? AND page_no = ? AND kind = ? AND variant = ?",
+                                 (doc_id, page_no, kind, variant)).fetchone()
+        return row['text'] if row else None
+
+    def save_page_artifact(self, doc_id, page_no, kind, variant, text, model=None):
+        self._db().execute("INSERT OR REPLACE INTO page_artifacts (doc_id, page_no, kind, variant, text, model, created_at) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?)", (doc_id, page_no, kind, variant, text, model, time.time()))
+
+    def thumbnail(self, doc_id, page_no):
+        """WebP thumbnail bytes for a page, or None"""
+        row = self._db().execute("SELECT thumbnail FROM pages WHERE doc_id = ? AND page_no = ?",
+                                 (doc_id, page_no)).fetchone()
+        return row['thumbnail'] if row else None
+
+    def prune(self, max_age_days):
+        """Drop documents that haven't been used for max_age_days"""
+        cutoff = time.time() - max_age_days * 86400
+        db = self._db()
+        stale = [row['doc_id'] for row in db.execute("SELECT doc_id FROM documents WHERE last_used < ?", (cutoff,))]
+        for doc_id in stale:
+            db.execute("DELETE FROM pages WHERE doc_id = ?", (doc_id,))
+            db.execute("DELETE FROM page_descriptions WHERE doc_id = ?", (doc_id,))
+            db.execute("DELETE FROM page_artifacts WHERE doc_id = ?", (doc_id,))
+            db.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        if stale:
+            logger.info(f"🗑️ Dropped {len(stale)} unused document(s) from the index")
+
+    def stats(self):
+        db = self._db()
+        documents = db.execute("SELECT COUNT(*), COALESCE(SUM(pages_indexed), 0) FROM documents").fetchone()
+        return {
+            "documents": documents[0],
+            "pages": documents[1],
+            "page_descriptions": db.execute("SELECT COUNT(*) FROM page_descriptions").fetchone()[0],
+            "page_artifacts": db.execute("SELECT COUNT(*) FROM page_artifacts").fetchone()[0],
+            "pending": len(self._pending),
+            "db_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+        }
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Document Pool
+Keeps PyMuPDF documents open between requests instead of calling
+fitz.open() (which re-reads the xref table and page tree) for every page
+render or tile. Handles are keyed by document id, lent to one thread at a
+time (several handles per document under concurrency), evicted least
+recently used when the pool exceeds its handle count or memory budget,
+and dropped when the file behind them changes or is deleted. Documents can
+optionally be opened from a read-only memory map of the file.
+"""
+
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+import mmap
+import os
+import threading
+from upload_stream import stored_digest
+
+MAX_HANDLES = 16  # Open handles across all documents
+MAX_BYTES = 256 * 1024 * 1024
+# Rough memory MuPDF keeps per xref entry of an open document (entry, parsed object, page tree node)
+XREF_ENTRY_BYTES = 512
+
+
+class _Handle:
+    """One open document and what it was opened from"""
+
+    def __init__(self, key, path, use_mmap):
+        import fitz  # PyMuPDF for PDF processing
+        self.key = key
+        self.signature = file_signature(path)
+        self.stale = False
+        self._map = self._view = None
+        if use_mmap:
+            # Uploads are moved into place with os.replace, never rewritten, so the mapping stays valid
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)  # MuPDF reads the mapping in place, nothing is copied
+            self.doc = fitz.open(stream=self._view, filetype='pdf')
+            self.size = len(self._map)
+        else:
+            self.doc = fitz.open(path)
+            self.size = self.doc.xref_length() * XREF_ENTRY_BYTES
+
+    def close(self):
+        try:
+            self.doc.close()
+        finally:
+            if self._view is not None:
+                self._view.release()
+                self._map.close()
+
+
+def file_signature(path):
+    """Identity of a file's current contents; changes if it is replaced or rewritten"""
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class DocumentPool:
+    """Thread-safe LRU pool of open PDF documents"""
+
+    def __init__(self, max_handles=MAX_HANDLES, max_bytes=MAX_BYTES, use_mmap=False):
+        self.max_handles = max_handles
+        self.max_bytes = max_bytes
+        self.use_mmap = use_mmap
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()  # key -> [handle, ...], least recently used key first
+        self._handles = defaultdict(set)  # key -> every open handle (idle or lent out)
+        self._open = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def document(self, path, key=None):
+        """Borrow an open fitz.Document for path; key defaults to the upload's content hash
+
+        Raises FileNotFoundError (and forgets the document) if the file is gone.
+        """
+        key = key or stored_digest(os.path.basename(path)) or os.path.abspath(path)
+        handle = self._checkout(key, path)
+        try:
+            yield handle.doc
+        finally:
+            self._checkin(handle)
+
+    def _checkout(self, key, path):
+        try:
+            signature = file_signature(path)
+        except FileNotFoundError:
+            self.invalidate(key)
+            raise
+        stale = []
+        handle = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle and handle is None:
+                candidate = idle.pop()
+                if candidate.signature == signature:
+                    handle = candidate
+                else:
+                    stale.append(candidate)
+            if not idle:
+                self._idle.pop(key, None)
+            if handle:
+                self.hits += 1
+            else:
+                self.misses += 1
+            for candidate in stale:
+                self._forget(candidate)
+        for candidate in stale:
+            candidate.close()
+        if handle:
+            return handle
+
+        handle = _Handle(key, path, self.use_mmap)
+        with self._lock:
+            self._handles[key].add(handle)
+            self._open += 1
+            self._bytes += handle.size
+        return handle
+
+    def _checkin(self, handle):
+        evicted = []
+        with self._lock:
+            if handle.stale:
+                self._forget(handle)
+                evicted.append(handle)
+            else:
+                self._idle.setdefault(handle.key, []).append(handle)
+                self._idle.move_to_end(handle.key)
+            # Only idle handles can be closed; lent-out ones are counted and closed later
+            while (self._open > self.max_handles or self._bytes > self.max_bytes) and self._idle:
+                key, idle = next(iter(self._idle.items()))
+                oldest = idle.pop(0)
+                if not idle:
+                    del self._idle[key]
+                self._forget(oldest)
+                evicted.append(oldest)
+        for old in evicted:
+            old.close()
+
+    def _forget(self, handle):
+        """Drop a handle from the books (caller holds the lock and closes it)"""
+        handles = self._handles.get(handle.key)
+        if handles and handle in handles:
+            handles.discard(handle)
+            if not handles:
+                del self._handles[handle.key]
+            self._open -= 1
+            self._bytes -= handle.size
+
+    def invalidate(self, key):
+        """Close a document's idle handles; handles lent out are closed when returned"""
+        with self._lock:
+            idle = self._idle.pop(key, [])
+            for handle in self._handles.get(key, ()):
+                handle.stale = True
+            for handle in idle:
+                self._forget(handle)
+        for handle in idle:
+            handle.close()
+
+    def clear(self):
+        """Invalidate every document (e.g. when the upload folder is wiped)"""
+        with self._lock:
+            keys = list(self._handles)
+        for key in keys:
+            self.invalidate(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._handles),
+                "handles": self._open,
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "bytes": self._bytes,
+                "max_handles": self.max_handles,
+                "max_bytes": self.max_bytes,
+                "mmap": self.use_mmap,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
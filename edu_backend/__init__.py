@@ -0,0 +1,10 @@
+"""
+AI Education Assistant Backend Package
+One Flask app (edu_backend.core) shared by every AI provider, with the
+provider specifics in edu_backend.providers. backend.py and backend_groq.py
+are thin launchers around create_app('openai') / create_app('groq').
+"""
+
+from edu_backend.core import create_app
+
+__all__ = ['create_app']
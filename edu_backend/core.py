@@ -0,0 +1,1305 @@
+#!/usr/bin/env python3
+"""
+Backend Core
+The Flask app shared by every AI provider: uploads, the document index, page
+tiles, notes export and the /api/chat pipeline. Provider specifics (client,
+model, prompt, image generation) live in edu_backend/providers/. PyMuPDF,
+Pillow, markdown and the provider SDKs are imported on first use rather than
+at startup, so a new worker answers requests as soon as Flask is up.
+"""
+
+from flask import Flask, request, jsonify, send_file
+from flask_cors import CORS
+import os
+import time
+import atexit
+import signal
+import sys
+import glob
+import hashlib
+from datetime import datetime
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from io import BytesIO
+import logging
+from dotenv import load_dotenv
+from rate_limiter import CHARS_PER_TOKEN
+from upload_stream import INCOMING_PATTERN, StreamingUploadRequest, finalize_upload, stored_digest
+from chunked_upload import ChunkedUploadStore, UploadError
+from doc_index import DocumentIndex, doc_id_for, is_doc_id
+from doc_pool import DocumentPool
+from page_regions import asks_about_figure, figure_rect, parse_region, region_rect
+from page_descriptions import DESCRIPTION_INSTRUCTION, DESCRIPTION_TOKENS, format_description, split_description, wants_page_image
+import page_artifacts
+from page_artifacts import ARTIFACT_REQUESTS, ArtifactWorker, artifact_kind, artifact_variant
+import page_render
+from page_render import (MAX_PAGE_TILES, PAGE_IMAGE_FORMATS, RenderCache, RENDER_VERSION, TILE_SIZE, encode_pixmap,
+                         encoded_page_image, page_font_size, plan_page_render, quantize_zoom, render_tile, tile_key)
+from shared_cache import open_cache
+from single_flight import SingleFlight
+from cancellation import (DEADLINE_HEADER, CancelToken, CancellationStats, RequestCancelled, connection_probe,
+                          parse_deadline)
+from server_timing import ServerTiming
+from chat_socket import SOCKET_PATH, ChatSession, SocketStats, allowed_origin
+from file_serving import configure_file_serving, send_stored_file
+from notes_export import ExportError, NotesExporter
+from image_cache import wants_new_variation
+from intent_router import classify_intent, intent_prompt
+from model_router import ModelRouter, parse_tiers, request_score, weak_answer
+from token_budget import TokenAccuracy, fit_request, response_tokens, token_counter
+from edu_backend.providers import load_provider
+import asyncio
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+app = Flask(__name__)
+# Enable CORS for all routes with specific configuration
+CORS(app,
+     origins=['http://localhost:5598', 'http://127.0.0.1:5598', 'http://localhost:5599', 'http://127.0.0.1:5599', 'http://localhost:*', 'http://127.0.0.1:*'],
+     methods=['GET', 'POST', 'PUT', 'OPTIONS'],
+     allow_headers=['Content-Type', 'Authorization', 'X-Requested-With', 'X-Chunk-SHA256', 'X-Chunk-CRC32', DEADLINE_HEADER],
+     expose_headers=['Accept-Ranges', 'Content-Range', 'Content-Length', 'ETag'],  # Read by pdf.js range loading
+     supports_credentials=False)
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+TEMP_FOLDER = 'temp_images'
+DOC_INDEX_FOLDER = 'doc_index'  # Per-page metadata keyed by document hash (not wiped by cleanup_files)
+RENDER_CACHE_FOLDER = 'render_cache'  # Rendered viewer tiles (not wiped by cleanup_files)
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_MB', 500)) * 1024 * 1024
+EXPORT_FOLDER = 'exports'  # Notes PDFs keyed by content hash (not wiped by cleanup_files)
+EXPORT_CACHE_MAX_BYTES = 100 * 1024 * 1024
+DOC_POOL_HANDLES = int(os.getenv('DOC_POOL_HANDLES', 16))
+DOC_POOL_MAX_BYTES = int(os.getenv('DOC_POOL_MAX_MB', 256)) * 1024 * 1024
+DOC_POOL_MMAP = os.getenv('DOC_POOL_MMAP', '').lower() in ('1', 'true', 'yes')
+SHARED_CACHE_BACKEND = os.getenv('SHARED_CACHE', 'sqlite')  # sqlite (shared by all workers) or memory
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join('shared_cache', 'cache.sqlite3'))  # Not wiped by cleanup_files
+SHARED_CACHE_MAX_BYTES = int(os.getenv('SHARED_CACHE_MAX_MB', 256)) * 1024 * 1024
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 24 * 3600))  # Seconds an identical question reuses its answer; 0 disables
+SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', '1').lower() in ('1', 'true', 'yes')  # Share identical renders/AI calls in progress
+# Pixels per page image sent with chat messages; the DPI follows from the page size and its small text
+PAGE_PIXEL_BUDGET = int(os.getenv('PAGE_PIXEL_BUDGET', page_render.PAGE_PIXEL_BUDGET))
+PAGE_TEXT_MAX_CHARS = 6000  # Page text sent alongside a cropped page image
+PAGE_IMAGE_FORMAT = os.getenv('PAGE_IMAGE_FORMAT', 'png').lower()  # png (lossless) or jpeg (smaller upload)
+if PAGE_IMAGE_FORMAT not in PAGE_IMAGE_FORMATS:
+    PAGE_IMAGE_FORMAT = 'png'
+ALLOWED_EXTENSIONS = {'pdf'}
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_REQUEST_SIZE = 5 * MAX_FILE_SIZE + 1024 * 1024  # Up to 5 max-size PDFs plus form fields per message
+MAX_CHUNKED_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_MB', 512)) * 1024 * 1024  # Large textbooks via /api/uploads
+RATE_LIMIT_MAX_WAIT = 30  # Seconds a request may wait for provider budget before failing
+RATE_LIMITED_ERROR = "AI service is busy right now (rate limit reached). Please try again in a minute."
+PROMPT_TOO_LARGE_ERROR = "This request is too large for the AI service, even with less page context. Please ask about a smaller part of the page."
+# Pre-generate a summary, vocabulary list and quiz for each page on spare provider quota (off by default)
+PREGENERATE_ARTIFACTS = os.getenv('PREGENERATE_ARTIFACTS', '').lower() in ('1', 'true', 'yes')
+MAX_RESPONSE_TOKENS = 1500  # Requests without an intent-specific answer length (token_budget.INTENT_MAX_TOKENS)
+# Route each request to the provider's fast/standard/strong model by how demanding it is (off: always MODEL)
+MODEL_CASCADE = os.getenv('MODEL_CASCADE', '').lower() in ('1', 'true', 'yes')
+# Retry weak answers (empty, cut off, refusals, too short) on the next tier up
+MODEL_ESCALATION = os.getenv('MODEL_ESCALATION', '1').lower() in ('1', 'true', 'yes')
+# Import the provider SDK and PDF/image libraries in the background once the first request
+# (usually a health check) arrives, so startup isn't slowed down but the first chat message
+# doesn't pay for them either (0 = import on first use only)
+WARM_UP = os.getenv('WARM_UP', '1').lower() in ('1', 'true', 'yes')
+# Chat over one WebSocket per tab, with streamed answers, when flask-sock is installed (0 = POST only)
+CHAT_SOCKET = os.getenv('CHAT_SOCKET', '1').lower() in ('1', 'true', 'yes')
+
+# Create necessary directories
+for folder in [UPLOAD_FOLDER, TEMP_FOLDER]:
+    os.makedirs(folder, exist_ok=True)
+
+# Stream uploads straight into UPLOAD_FOLDER (hashed on the fly) instead of buffering them
+app.request_class = StreamingUploadRequest
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_FILE_SIZE'] = MAX_FILE_SIZE
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_SIZE
+# Optional X-Accel-Redirect / X-Sendfile offload of /uploads and /temp_images to a front proxy
+FILE_OFFLOAD = configure_file_serving(app)
+
+# Resumable chunked uploads for PDFs beyond MAX_FILE_SIZE
+chunked_uploads = ChunkedUploadStore(UPLOAD_FOLDER, MAX_CHUNKED_UPLOAD_SIZE)
+
+# Page count, text, coverage, image boxes and thumbnails, extracted once per document
+doc_index = DocumentIndex(DOC_INDEX_FOLDER)
+
+# WebP page tiles for the viewer, rendered once per document/page/zoom
+render_cache = RenderCache(RENDER_CACHE_FOLDER, RENDER_CACHE_MAX_BYTES)
+
+# Open PDFs kept between page renders and tiles, so each one doesn't re-parse the file
+document_pool = DocumentPool(DOC_POOL_HANDLES, DOC_POOL_MAX_BYTES, use_mmap=DOC_POOL_MMAP)
+
+# Page images and AI responses, computed once per node and shared by every worker process
+shared_cache = open_cache(SHARED_CACHE_BACKEND, SHARED_CACHE_PATH, SHARED_CACHE_MAX_BYTES)
+
+# Identical page renders and AI calls already in progress are shared instead of repeated
+in_flight = SingleFlight(enabled=SINGLE_FLIGHT)
+
+# Chat requests stopped because the teacher left or their deadline passed, and what that saved
+cancellations = CancellationStats()
+
+# Locally counted prompt tokens vs what the provider reports
+token_accuracy = TokenAccuracy()
+
+# Chat socket sessions (see register_chat_socket)
+socket_stats = SocketStats()
+chat_socket_enabled = False
+
+# Set by create_app: the provider module, its model tiers and the "Download Notes" exporter
+provider = None
+model_router = None
+notes_exporter = None
+_warm_up_started = threading.Event()
+
+def create_app(provider_name):
+    """Configure the app for one AI provider (one per process) and return it"""
+    global provider, model_router, notes_exporter, chat_socket_enabled
+    if provider is not None:
+        if provider is not load_provider(provider_name):
+            raise RuntimeError(f"App already configured for {provider.NAME}")
+        return app
+    provider = load_provider(provider_name)
+    provider.register_routes(app)
+    tiers = parse_tiers(provider.MODEL_TIERS if MODEL_CASCADE else f"standard={provider.MODEL}")
+    model_router = ModelRouter(provider.NAME, tiers, escalate=MODEL_ESCALATION,
+                               limiters={provider.MODEL: provider.rate_limiter})
+    logger.info(f"🧭 Models: {', '.join(f'{tier.name}={tier.model}' for tier in tiers)}")
+    # "Download Notes" PDFs, built on a worker and cached by content hash
+    notes_exporter = NotesExporter(RenderCache(EXPORT_FOLDER, EXPORT_CACHE_MAX_BYTES, suffix='.pdf'),
+                                   {'temp_images': TEMP_FOLDER, **provider.image_folders()})
+    chat_socket_enabled = CHAT_SOCKET and register_chat_socket()
+
+    # Register cleanup function to run when the program exits
+    atexit.register(cleanup_files)
+
+    # Register signal handlers for graceful shutdown
+    signal.signal(signal.SIGINT, signal_handler)   # Ctrl+C
+    signal.signal(signal.SIGTERM, signal_handler)  # Termination signal
+    return app
+
+@app.before_request
+def start_warm_up():
+    if WARM_UP and not _warm_up_started.is_set():
+        _warm_up_started.set()
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def warm_up():
+    """Import what the first chat message needs while the worker is idle"""
+    started = time.time()
+    try:
+        import fitz  # noqa: F401
+        import markdown  # noqa: F401
+        from PIL import Image  # noqa: F401
+        provider.get_client()
+        logger.info(f"🔥 Warmed up {provider.NAME} client and PDF libraries in {time.time() - started:.2f}s")
+    except Exception as e:
+        logger.warning(f"⚠️ Warm-up failed (modules load on first use instead): {str(e)}")
+
+def cleanup_files():
+    """Delete all files from uploads and temp directories"""
+    # Open handles would keep the files alive (and block deleting them on Windows)
+    document_pool.clear()
+    try:
+        folders_to_clean = [UPLOAD_FOLDER, TEMP_FOLDER]
+        total_deleted = 0
+
+        print(f"\n{'='*60}")
+        print("🧹 CLEANING UP FILES")
+        print(f"{'='*60}")
+
+        for folder in folders_to_clean:
+            if os.path.exists(folder):
+                # Partial uploads of requests that were killed (see StreamedUpload) are hidden files
+                files = glob.glob(os.path.join(folder, "*")) + glob.glob(os.path.join(folder, INCOMING_PATTERN))
+                if files:
+                    print(f"📁 Cleaning {folder}/ ({len(files)} files)")
+                    for file_path in files:
+                        try:
+                            os.remove(file_path)
+                            filename = os.path.basename(file_path)
+                            print(f"   ✅ Deleted: {filename}")
+                            total_deleted += 1
+                        except Exception as e:
+                            filename = os.path.basename(file_path)
+                            print(f"   ❌ Failed to delete {filename}: {str(e)}")
+                else:
+                    print(f"📁 {folder}/ is already empty")
+
+        print(f"\n🗑️  Successfully deleted {total_deleted} file(s)")
+        print(f"{'='*60}\n")
+
+    except Exception as e:
+        print(f"❌ Error during cleanup: {str(e)}")
+
+def signal_handler(signum, frame):
+    """Handle shutdown signals gracefully"""
+    print(f"\n\n🛑 Received shutdown signal ({signum})")
+    cleanup_files()
+    print(f"👋 {provider.BACKEND_TITLE} stopped gracefully")
+    sys.exit(0)
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def page_images(pdf_path, page_num, clip=None, doc_id=None, pixel_budget=None, max_tiles=MAX_PAGE_TILES):
+    """Images of a PDF page (or of its clip rectangle) for the AI provider: one, or a few tiles for big pages
+
+    The DPI is chosen per page by plan_page_render; tiles are rendered and
+    encoded one at a time, so memory stays within one PAGE_PIXEL_BUDGET
+    pixmap, and every image is kept in the shared cache. Requests for a page
+    that is being rendered right now wait for that render. [] on failure.
+    """
+    area = tuple(round(value, 2) for value in clip) if clip else None
+    pixel_budget = pixel_budget or PAGE_PIXEL_BUDGET
+    images, _ = in_flight.do('render', (stored_digest(os.path.basename(pdf_path)) or os.path.abspath(pdf_path),
+                                        page_num, area, pixel_budget, max_tiles),
+                             lambda: render_page_images(pdf_path, page_num, clip, doc_id, pixel_budget, max_tiles))
+    return list(images)
+
+def render_page_images(pdf_path, page_num, clip=None, doc_id=None, pixel_budget=None, max_tiles=MAX_PAGE_TILES):
+    """Render (or fetch from the shared cache) the images page_images returns"""
+    import fitz  # PyMuPDF for PDF processing
+    indexed = doc_index.page(doc_id, page_num + 1) if doc_id else None
+    try:
+        with document_pool.document(pdf_path) as doc:
+            if page_num < 0 or page_num >= len(doc):
+                page_num = 0  # Default to first page if invalid
+                indexed = None
+
+            page = doc[page_num]
+            if indexed and (indexed['font_size'] or not indexed['text_chars']):
+                font_size = indexed['font_size']
+            else:
+                font_size = page_font_size(page)
+            plan = plan_page_render(clip or page.rect, font_size, detail=clip is not None,
+                                    pixel_budget=pixel_budget or PAGE_PIXEL_BUDGET, max_tiles=max_tiles)
+            images = []
+            for tile in plan.tiles:
+                key = page_image_key(pdf_path, page_num, tile, plan.dpi)
+                image = cached_page_image(key)
+                if not image:
+                    mat = fitz.Matrix(plan.dpi / 72, plan.dpi / 72)  # 72 is default DPI
+                    image = pixmap_to_page_image(page.get_pixmap(matrix=mat, clip=tile), key)
+                if not image:
+                    return []
+                images.append(image)
+            return images
+    except Exception as e:
+        logger.error(f"Error converting PDF page to image: {str(e)}")
+        return []
+
+def page_focus(pdf_path, page_num, region=None):
+    """Rectangle to send instead of the whole page: the teacher's selection, else the page's figures (or None)"""
+    try:
+        with document_pool.document(pdf_path) as doc:
+            page = doc[page_num if 0 <= page_num < len(doc) else 0]
+            return region_rect(page, region) if region else figure_rect(page)
+    except Exception as e:
+        logger.error(f"Error finding page region: {str(e)}")
+        return None
+
+def page_text(pdf_path, page_num, doc_id=None):
+    """Plain text of a page, from the document index when it has the page"""
+    indexed = doc_index.page(doc_id, page_num + 1) if doc_id else None
+    if indexed:
+        return indexed['text'] or ''
+    try:
+        with document_pool.document(pdf_path) as doc:
+            return doc[page_num if 0 <= page_num < len(doc) else 0].get_text()
+    except Exception as e:
+        logger.error(f"Error extracting page text: {str(e)}")
+        return ''
+
+def page_image_key(pdf_path, page_num, rect, dpi):
+    """Shared cache key of one chat image of a page (None for files not stored under their content hash)"""
+    digest = stored_digest(os.path.basename(pdf_path))
+    if not digest:
+        return None
+    area = f"{int(rect.x0)},{int(rect.y0)},{int(rect.x1)},{int(rect.y1)}"
+    return f"{digest}_p{page_num}_{area}_{dpi}dpi.{PAGE_IMAGE_FORMAT}_v{RENDER_VERSION}"
+
+def cached_page_image(key):
+    """Page image rendered earlier by any worker, or None"""
+    entry = shared_cache.get('page_images', key) if key else None
+    if not entry:
+        return None
+    return encoded_page_image(entry.value, entry.meta['mime'], entry.meta['width'], entry.meta['height'])
+
+def pixmap_to_page_image(pix, key=None):
+    """Encode a page pixmap as the data URL sent to the AI provider (no PIL round-trip) and share it"""
+    try:
+        encoded = encode_pixmap(pix, PAGE_IMAGE_FORMAT)
+        mime = PAGE_IMAGE_FORMATS[PAGE_IMAGE_FORMAT]
+        if key:
+            try:
+                shared_cache.put('page_images', key, encoded, {'mime': mime, 'width': pix.width, 'height': pix.height})
+            except Exception as e:
+                logger.warning(f"⚠️ Caching the page image failed: {str(e)}")
+        return encoded_page_image(encoded, mime, pix.width, pix.height)
+    except Exception as e:
+        logger.error(f"Error encoding page image: {str(e)}")
+        return None
+
+def create_context_pdf(pdf_path, current_page, context_pages=2):
+    """Create a smaller PDF with current page and surrounding pages (kept for potential future use)"""
+    import fitz  # PyMuPDF for PDF processing
+    try:
+        new_doc = fitz.open()
+        with document_pool.document(pdf_path) as doc:
+            total_pages = len(doc)
+
+            # Calculate page range (current page ± context_pages)
+            start_page = max(0, current_page - context_pages)
+            end_page = min(total_pages - 1, current_page + context_pages)
+
+            # Create new PDF with selected pages
+            for page_num in range(start_page, end_page + 1):
+                new_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
+
+        # Save to temp file
+        timestamp = int(time.time())
+        temp_pdf_path = os.path.join(TEMP_FOLDER, f"context_{timestamp}.pdf")
+        new_doc.save(temp_pdf_path)
+
+        new_doc.close()
+
+        return temp_pdf_path, start_page, end_page
+    except Exception as e:
+        logger.error(f"Error creating context PDF: {str(e)}")
+        return None, None, None
+
+def build_education_prompt(message, education_context, file_context=None):
+    """Build a comprehensive prompt for the AI with education context"""
+
+    teacher_lang = education_context.get('teacher_language', 'english')
+    student_lang = education_context.get('student_language', 'english')
+    class_level = education_context.get('class_level', '6')
+    class_strength = education_context.get('class_strength', '30')
+    current_page = education_context.get('current_page', 1)
+    total_pages = education_context.get('total_pages', 1)
+
+    # Base system prompt (wording differs per provider)
+    system_prompt = provider.SYSTEM_PROMPT.format(teacher_lang=teacher_lang.title(), student_lang=student_lang.title(),
+                                                  class_level=class_level, class_strength=class_strength)
+
+    # Add file context if available
+    if file_context:
+        file_info = file_context.get('info', {})
+        page_source = "the PDF page content shown in the image"
+        if file_context.get('description'):
+            image_note = "No image is attached: the page was looked at earlier and its description is given with the question"
+            page_source = "the page description"
+        elif file_context.get('focus'):
+            image_note = f"The attached image shows only {file_context['focus']} of the current page; the page's text is given with the question"
+        elif file_context.get('page_text'):
+            image_note = "No image is attached: the page's text is given with the question"
+            page_source = "the page text"
+        else:
+            image_note = "The attached image shows the complete content of the current page (including text, images, diagrams, and formatting)"
+        image_note += tile_note(file_context.get('tiles', 1))
+        if file_info:
+            system_prompt += f"""
+PDF CONTEXT:
+- Currently viewing page {current_page} of {total_pages}
+- Document: {file_info.get('original_name', 'Unknown')}
+- {image_note}
+
+Please reference {page_source} and explain how to use this material effectively in a Class {class_level} classroom with {class_strength} students. Consider all visual elements, text, images, and layout when providing your response.
+"""
+
+    # User message with context
+    user_prompt = f"""Teacher's Question: {message}
+
+Please provide educational guidance considering:
+- Class {class_level} students ({class_strength} in class)
+- Teacher instruction in {teacher_lang.title()}
+- Students learning in {student_lang.title()}
+"""
+
+    if file_context:
+        user_prompt += f"\n- Based on page {current_page} of the uploaded document"
+        if file_context.get('page_text'):
+            user_prompt += f"\n\nText of page {current_page}:\n\"\"\"\n{file_context['page_text']}\n\"\"\"\n"
+        if file_context.get('description'):
+            user_prompt += f"\n\nDescription of page {current_page}:\n\"\"\"\n{file_context['description']}\n\"\"\"\n"
+
+    return system_prompt, user_prompt
+
+def tile_note(tiles):
+    """Line of the system prompt telling the model a page is split into tiles ('' for one image)"""
+    if tiles <= 1:
+        return ''
+    return f"\n- The page is large, so it is split into {tiles} slightly overlapping images, left to right and top to bottom"
+
+def response_cache_key(messages, images=(), max_tokens=MAX_RESPONSE_TOKENS, model=None, image_detail=None):
+    """Shared cache key of an AI answer: the model and everything sent to it"""
+    digest = hashlib.sha256()
+    for part in (model or provider.MODEL, str(max_tokens), messages['system'], messages['user']):
+        digest.update(part.encode('utf-8') + b'\0')
+    if image_detail:
+        digest.update(f"detail={image_detail}".encode('ascii') + b'\0')
+    for image in images:
+        digest.update(image.data_url.encode('ascii'))
+    return digest.hexdigest()
+
+def complete_with_tier(api_messages, prompt_tokens, max_tokens, tier, background=False, cancel=None, on_text=None):
+    """One completion from a tier's model: (content, finish_reason, usage dict), or None if no budget
+
+    With an active `cancel` token the completion is streamed, so it can be
+    closed as soon as the request is cancelled (RequestCancelled); with
+    on_text it is streamed too and each piece of text is passed on as it
+    arrives.
+    """
+    rate_limiter = model_router.rate_limiter(tier)
+    reservation = None
+    deadline = cancel is not None and cancel.active
+    stream = deadline or on_text is not None
+    try:
+        # Wait for enough request/token budget instead of running into 429s
+        if background:
+            reservation = rate_limiter.acquire(prompt_tokens, max_tokens=max_tokens, priority=page_artifacts.PRIORITY,
+                                               timeout=page_artifacts.MAX_WAIT, reserve=page_artifacts.QUOTA_RESERVE)
+        else:
+            wait = cancel.remaining(RATE_LIMIT_MAX_WAIT) if cancel is not None else RATE_LIMIT_MAX_WAIT
+            reservation = rate_limiter.acquire(prompt_tokens, max_tokens=max_tokens, timeout=wait)
+        if cancel is not None:
+            stop_if_cancelled(cancel, ['completion'], prompt_tokens)
+        if not reservation:
+            return None
+
+        started = time.time()
+        raw_response = provider.create_completion(api_messages, max_tokens, tier.model, stream=stream,
+                                                  timeout=cancel.remaining() if deadline else None)
+        rate_limiter.update_from_headers(raw_response.headers, reservation)
+        if stream:
+            content, finish_reason, used = read_completion_stream(raw_response.parse(), cancel, started, on_text)
+        else:
+            response = raw_response.parse()
+            choice = response.choices[0]
+            content, finish_reason, used = choice.message.content or '', choice.finish_reason, response.usage
+        if used:
+            rate_limiter.record_usage(reservation, used.prompt_tokens)
+            token_accuracy.record(tier.model, prompt_tokens, used.prompt_tokens, used.completion_tokens, max_tokens)
+    except Exception as e:
+        rate_limiter.record_error(e, reservation)
+        if cancel is not None and not isinstance(e, RequestCancelled) and cancel.cancelled():
+            raise RequestCancelled(cancel.reason) from e  # e.g. the SDK timing out at the deadline
+        raise
+
+    seconds = time.time() - started
+    usage = {"prompt_tokens": used.prompt_tokens if used else prompt_tokens,
+             "completion_tokens": used.completion_tokens if used else len(content) // CHARS_PER_TOKEN}
+    usage['cost_usd'] = model_router.record(tier, seconds, **usage)
+    if not background:
+        cancellations.observe('completion', seconds, usage['completion_tokens'])
+    return content, finish_reason, usage
+
+def read_completion_stream(stream, cancel, started, on_text=None):
+    """(content, finish_reason, usage) of a streamed completion, closed early once the request is cancelled"""
+    parts, finish_reason, usage = [], None, None
+    try:
+        for chunk in stream:
+            usage = chunk.usage or getattr(getattr(chunk, 'x_groq', None), 'usage', None) or usage
+            if chunk.choices:
+                parts.append(chunk.choices[0].delta.content or '')
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                if on_text and parts[-1]:
+                    on_text(parts[-1])
+            if cancel is not None and cancel.cancelled():
+                received = sum(len(part) for part in parts) // CHARS_PER_TOKEN
+                cancellations.stopped('completion', time.time() - started, received)
+                logger.info(f"🛑 Closed the completion after ~{received} tokens ({cancel.reason})")
+                raise RequestCancelled(cancel.reason)
+    finally:
+        stream.close()  # Closing the connection stops the provider generating
+    return ''.join(parts), finish_reason, usage
+
+def stop_if_cancelled(cancel, pending_work=(), prompt_tokens=0):
+    """Raise RequestCancelled once the request is cancelled, counting the provider calls it skips"""
+    if cancel.cancelled():
+        for work in pending_work:
+            cancellations.skipped(work, prompt_tokens if work == 'completion' else 0)
+        raise RequestCancelled(cancel.reason)
+
+async def call_ai_api(messages, images=(), use_cache=True, describe=False, background=False, score=None, intent=None,
+                      cancel=None, context=(), rerender=None, on_text=None):
+    """Make API call to the configured provider with optional page images as context
+
+    The model tier is picked from the request's score (model_router.py) and a
+    weak answer is retried one tier up. The answer gets the max_tokens its
+    intent needs, and a request over the provider's token budget is fitted
+    to it (token_budget.py): the `context` texts inside messages['user'] are
+    shortened and rerender(scale, messages) sends the page as one smaller
+    image. With describe=True the system prompt asks for a page description
+    after the answer; it is split off into result['page_description'].
+    Background calls only use spare rate-limit budget, give up sooner and are
+    not escalated. A cancelled request (`cancel` token) raises
+    RequestCancelled. on_text(text) receives the answer as it is generated
+    (None when it starts over on the next tier); requests answered from the
+    cache or by another request's call only get the final result.
+    """
+    max_tokens = response_tokens(intent, MAX_RESPONSE_TOKENS) + (DESCRIPTION_TOKENS if describe else 0)
+    tier_index = model_router.choose(score, bool(images))
+    tier = model_router.tiers[tier_index]
+    try:
+        if not provider.get_client():
+            return {"error": f"{provider.NAME} API client not configured"}
+
+        # Count the request locally and make it fit before the provider sees it (a request can't exceed the TPM limit)
+        image_detail = None
+        budget = min(filter(None, (provider.TOKEN_BUDGET, model_router.rate_limiter(tier).token_limit)), default=None)
+        if budget:
+            plan = fit_request(token_counter(provider.TOKEN_ACCOUNTING, tier.model), messages, images, max_tokens,
+                               budget, build_api_messages, context, rerender)
+            if plan.steps:
+                logger.info(f"📏 Fitted the request to {budget} tokens: {', '.join(plan.steps)}")
+            if not plan.fits:
+                logger.warning(f"📏 Request needs {plan.prompt_tokens} prompt tokens + {plan.max_tokens}, over the {budget} budget")
+                return {"error": PROMPT_TOO_LARGE_ERROR}
+            messages, images, max_tokens, image_detail = plan.messages, plan.images, plan.max_tokens, plan.image_detail
+
+        # The same question about the same page is answered once per node
+        request_key = (response_cache_key(messages, images, max_tokens, tier.model, image_detail)
+                       if use_cache else None)
+        cache_key = request_key if RESPONSE_CACHE_TTL > 0 else None
+        cached = shared_cache.get_json('responses', cache_key) if cache_key else None
+        if cached:
+            logger.info("♻️ Reusing a cached AI response")
+            return cached
+
+        # ... and asked once at a time: identical requests arriving meanwhile wait for this answer
+        result, _ = in_flight.do('completion', request_key and (request_key, background),
+                                 lambda shared_cancel=None: complete_ai_request(
+                                     messages, images, max_tokens, tier_index, describe, background, intent, cache_key,
+                                     shared_cancel, image_detail, on_text), cancel=cancel)
+        return dict(result)  # Callers add to their response
+
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"{provider.NAME} API error: {str(e)}")
+        return {"error": f"AI service error: {str(e)}"}
+
+def build_api_messages(messages, images=(), detail=None):
+    """Chat completion messages: the system prompt, then the user prompt with the page images"""
+    api_messages = []
+
+    # Add system message
+    api_messages.append({
+        "role": "system",
+        "content": messages['system']
+    })
+
+    # Add user message with optional images
+    if images:
+        api_messages.append({
+            "role": "user",
+            "content": [
+                {"type": "text", "text": messages['user']},
+                *(provider.image_content(image.data_url, detail) for image in images)
+            ]
+        })
+    else:
+        api_messages.append({
+            "role": "user",
+            "content": messages['user']
+        })
+    return api_messages
+
+def complete_ai_request(messages, images, max_tokens, tier_index, describe, background, intent, cache_key, cancel=None,
+                        image_detail=None, on_text=None):
+    """The provider call(s) behind call_ai_api, escalating weak answers; the result is stored under cache_key"""
+    api_messages = build_api_messages(messages, images, image_detail)
+    answer = None
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "escalated_from": None}
+    while True:
+        tier = model_router.tiers[tier_index]
+        prompt_tokens = token_counter(provider.TOKEN_ACCOUNTING, tier.model).request_tokens(api_messages)
+        try:
+            completion = complete_with_tier(api_messages, prompt_tokens, max_tokens, tier, background, cancel, on_text)
+        except Exception as e:
+            if not answer or isinstance(e, RequestCancelled):
+                raise
+            logger.warning(f"⚠️ Escalation to {tier.name} failed ({str(e)}), keeping the {answer[0].name} answer")
+            break
+        if completion is None:
+            if not answer:
+                return {"error": RATE_LIMITED_ERROR}
+            break
+        content, finish_reason, call_usage = completion
+        for key in ('prompt_tokens', 'completion_tokens'):
+            usage[key] += call_usage[key]
+        usage['cost_usd'] += call_usage['cost_usd'] or 0.0  # Models without known prices count as free
+        text, description = split_description(content) if describe else (content, None)
+        answer = (tier, text, description)
+        weakness = weak_answer(text, finish_reason, intent)
+        next_index = model_router.next_tier(tier_index, bool(images)) if weakness and not background else None
+        if next_index is None:
+            break
+        logger.info(f"⬆️ {tier.name} answer looks weak ({weakness}), asking {model_router.tiers[next_index].name} instead")
+        usage['escalated_from'] = usage['escalated_from'] or tier.name
+        tier_index = next_index
+        if on_text:
+            on_text(None)  # The streamed answer is replaced
+
+    tier, text, description = answer
+    usage.update(tier=tier.name, model=tier.model)
+    result = {
+        "text": text,
+        "html": markdown_html(text),
+        "usage": usage
+    }
+    if description:
+        result['page_description'] = description
+    if cache_key and result['text']:
+        try:
+            shared_cache.put_json('responses', cache_key, result, ttl=RESPONSE_CACHE_TTL)
+        except Exception as e:  # The answer is paid for: return it even if it can't be shared
+            logger.warning(f"⚠️ Caching the answer failed: {str(e)}")
+    return result
+
+def markdown_html(text):
+    import markdown
+    return markdown.markdown(text, extensions=['nl2br', 'codehilite'])
+
+def generate_page_artifact(job):
+    """Pre-generate one page artifact on spare quota; False to try again later"""
+    if doc_index.page_artifact(job.doc_id, job.page_no, job.kind, job.variant):
+        return True
+    document = doc_index.document(job.doc_id)
+    if not document or document['status'] == 'failed' or not os.path.exists(job.path):
+        return True  # Nothing to generate from
+    indexed = doc_index.page(job.doc_id, job.page_no)
+    if not indexed:
+        return document['status'] == 'ready'  # Still being indexed
+
+    request_text = ARTIFACT_REQUESTS[job.kind]
+    education_context = dict(job.education_context, current_page=job.page_no,
+                             total_pages=document['page_count'] or job.page_no)
+    file_context = {
+        'info': {'original_name': document['filename']},
+        'page': job.page_no,
+        'total_pages': education_context['total_pages']
+    }
+    # Text is enough (and cheaper) when the page has some; scans are looked at
+    images = []
+    description = doc_index.page_description(job.doc_id, job.page_no)
+    if description:
+        file_context['description'] = format_description(description)
+    elif indexed['text_chars']:
+        file_context['page_text'] = indexed['text'][:PAGE_TEXT_MAX_CHARS]
+    else:
+        images = page_images(job.path, job.page_no - 1, doc_id=job.doc_id)
+        file_context['tiles'] = len(images)
+    describe = bool(images)
+
+    system_prompt, user_prompt = build_education_prompt(request_text, education_context, file_context)
+    intent = classify_intent(request_text)
+    messages = {
+        'system': system_prompt + (DESCRIPTION_INSTRUCTION if describe else ''),
+        'user': user_prompt + intent_prompt(intent, education_context)
+    }
+    response = asyncio.run(call_ai_api(messages, images, describe=describe, background=True,
+                                       intent=intent.intent if intent else None))
+    if response.get('error') == RATE_LIMITED_ERROR:
+        return False
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    model = response.get('usage', {}).get('model', provider.MODEL)
+    if response.get('page_description'):
+        doc_index.save_page_description(job.doc_id, job.page_no, response['page_description'], model)
+    doc_index.save_page_artifact(job.doc_id, job.page_no, job.kind, job.variant, response['text'], model)
+    logger.info(f"🗃️ Pre-generated the {job.kind} of page {job.page_no} of {job.doc_id}")
+    return True
+
+# Runs only while /api/chat is idle (see track_interactive_start/end)
+artifact_worker = ArtifactWorker(generate_page_artifact)
+
+@app.before_request
+def track_interactive_start():
+    if request.endpoint == 'chat':
+        artifact_worker.interactive_started()
+
+@app.teardown_request
+def track_interactive_end(error=None):
+    if request.endpoint == 'chat':
+        artifact_worker.interactive_finished()
+
+def log_request(message, files_info=None, education_context=None):
+    """Log incoming requests for debugging"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    logger.info(f"\n{'='*60}")
+    logger.info(f"[{timestamp}] NEW AI REQUEST ({provider.NAME.upper()})")
+    logger.info(f"Message: {message}")
+    if files_info:
+        logger.info(f"Files uploaded: {len(files_info)}")
+        for i, file_info in enumerate(files_info):
+            logger.info(f"  File {i}: {file_info}")
+    if education_context:
+        logger.info(f"Education Context:")
+        for key, value in education_context.items():
+            logger.info(f"  {key}: {value}")
+    logger.info(f"{'='*60}\n")
+
+@app.route('/')
+def home():
+    """Simple home page to verify server is running"""
+    api_status = "✅ Connected" if provider.is_configured() else "❌ Not Configured"
+    return provider.home_page(api_status)
+
+@app.route('/api/status')
+def status():
+    """API status endpoint"""
+    return jsonify({
+        "status": "running",
+        "ai_configured": provider.is_configured(),
+        "ai_provider": provider.NAME,
+        "model": provider.MODEL,
+        "rate_limits": provider.rate_limiter.snapshot(),
+        "model_tiers": model_router.snapshot(),
+        "doc_index": doc_index.stats(),
+        "render_cache": render_cache.stats(),
+        "document_pool": document_pool.stats(),
+        "shared_cache": shared_cache.stats(),
+        "in_flight": in_flight.snapshot(),
+        "cancellations": cancellations.snapshot(),
+        "token_budget": {"budget": provider.TOKEN_BUDGET, **token_accuracy.snapshot()},
+        "chat_socket": {"enabled": chat_socket_enabled, **socket_stats.snapshot()},
+        "page_artifacts": {"enabled": PREGENERATE_ARTIFACTS, **artifact_worker.snapshot()},
+        **provider.status_extras(),
+        "timestamp": datetime.now().isoformat(),
+        "endpoints": ["/api/chat", "/api/status", "/api/test"] + ([SOCKET_PATH] if chat_socket_enabled else [])
+    })
+
+@app.route('/api/test')
+def test():
+    """Test endpoint to verify API is working"""
+    return jsonify({
+        "message": f"{provider.BACKEND_TITLE} is running!",
+        "ai_status": "configured" if provider.is_configured() else "not_configured",
+        "ai_provider": provider.NAME,
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/chat', methods=['POST', 'OPTIONS'])
+def chat():
+    """Main chat endpoint that handles messages and generates AI responses"""
+    # Handle preflight requests
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'OK'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', f'Content-Type,Authorization,{DEADLINE_HEADER}')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        return response
+
+    timing = ServerTiming()
+
+    # Reject oversized bodies from Content-Length before reading any of them
+    if request.content_length and request.content_length > MAX_REQUEST_SIZE:
+        return jsonify({"error": f"Request too large. Maximum upload size is {MAX_REQUEST_SIZE // (1024 * 1024)}MB per message."}), 413
+
+    # Stop working once the teacher has gone, or at the deadline the client allows
+    try:
+        cancel = CancelToken(parse_deadline(request.headers.get(DEADLINE_HEADER)), connection_probe(request.environ))
+    except ValueError:
+        return jsonify({"error": f"Invalid {DEADLINE_HEADER} header (milliseconds expected)"}), 400
+
+    response, status = answer_chat(request.form, request.files, cancel, timing)
+    if status != 200:
+        return jsonify(response), status
+
+    # Ensure proper JSON response with correct headers
+    json_response = jsonify(response)
+    json_response.headers['Content-Type'] = 'application/json'
+    json_response.headers['Server-Timing'] = timing.header()
+    json_response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    json_response.headers['Pragma'] = 'no-cache'
+    json_response.headers['Expires'] = '0'
+
+    return json_response
+
+def answer_chat(form, files, cancel, timing, events=None):
+    """(response, status) for a chat message, sent as a POST form or over the chat socket
+
+    `form` holds the message fields and `files` uploaded PDFs (the socket
+    only references uploads by file_ref_N). events(kind, payload), when
+    given, is called with the answer's text as it is generated ('partial',
+    {'text': ...}, or {'reset': True} when a weak answer is asked again) and
+    with a generated image as soon as it is ready ('image').
+    """
+    try:
+        # Check if the AI provider is configured
+        if not provider.is_configured():
+            return {"error": provider.NOT_CONFIGURED_ERROR}, 500
+
+        # Get the message from form data
+        message = form.get('message', '').strip()
+
+        if not message:
+            return {"error": "No message provided"}, 400
+
+        # Part of the page selected in the viewer, as fractions of the page
+        try:
+            region = parse_region(form.get('region', '').strip())
+        except ValueError as e:
+            return {"error": f"Invalid region: {str(e)}"}, 400
+
+        # Extract education context from form data
+        education_context = {
+            'teacher_language': form.get('teacher_language', 'english'),
+            'student_language': form.get('student_language', 'english'),
+            'class_level': form.get('class_level', '6'),
+            'class_strength': form.get('class_strength', '30'),
+            'current_page': int(form.get('current_page', 1)),
+            'total_pages': int(form.get('total_pages', 1)),
+            'current_pdf_index': int(form.get('current_pdf_index', 0))
+        }
+
+        # Process uploaded files
+        uploaded_files = []
+        files_info = []
+        current_pdf_path = None
+        current_file_info = {}
+
+        for key in files:
+            if key.startswith('file_'):
+                file = files[key]
+                if file and file.filename:
+                    if allowed_file(file.filename):
+                        # Already streamed to disk, size-checked and hashed while the form was parsed
+                        upload = finalize_upload(file, UPLOAD_FOLDER)
+                        filepath = upload['path']
+                        doc_index.index_document(upload['sha256'], filepath, file.filename)
+                        uploaded_files.append(filepath)
+                        file_info = {
+                            "original_name": file.filename,
+                            "saved_as": upload['saved_as'],
+                            "size": upload['size'],
+                            "path": filepath,
+                            "sha256": upload['sha256'],
+                            "doc_id": doc_id_for(upload['sha256']),
+                            "page_count": upload['page_count']
+                        }
+                        files_info.append(file_info)
+
+                        # Set current PDF for context (use current_pdf_index if multiple files)
+                        if key == f"file_{education_context['current_pdf_index']}":
+                            current_pdf_path = filepath
+                            current_file_info = file_info
+                            if upload['page_count']:
+                                education_context['total_pages'] = upload['page_count']
+                    else:
+                        return {"error": f"File type not allowed. Only PDF files are supported."}, 400
+
+        # Large PDFs arrive beforehand through /api/uploads and are referenced by name
+        for key in form:
+            if key.startswith('file_ref_'):
+                filepath = chunked_uploads.resolve(form[key])
+                if not filepath:
+                    # Gone after a restart's cleanup_files(); file_ref tells the client which PDF to upload again
+                    return {"error": "Uploaded file not found. Please upload it again.", "file_ref": form[key]}, 404
+                uploaded_files.append(filepath)
+                doc_id, original_name = form[key].split('_', 1)
+                file_info = {
+                    "original_name": original_name,
+                    "saved_as": form[key],
+                    "size": os.path.getsize(filepath),
+                    "path": filepath,
+                    "doc_id": doc_id
+                }
+                files_info.append(file_info)
+                if key == f"file_ref_{education_context['current_pdf_index']}":
+                    current_pdf_path = filepath
+                    current_file_info = file_info
+
+        # The index knows the real page count, so a stale or missing total_pages from the client doesn't matter
+        document = doc_index.document(current_file_info['doc_id']) if current_file_info else None
+        if document and document['page_count']:
+            education_context['total_pages'] = document['page_count']
+
+        # Log the request for debugging
+        log_request(message, files_info, education_context)
+        timing.mark('upload')
+
+        # Classify the request (image, quiz, worksheet, translation, ...) in one pass
+        intent = classify_intent(message)
+        is_image_request = bool(intent and intent.intent == 'image')
+
+        # "Another version" / "regenerate" asks for a fresh image and a fresh answer
+        new_variation = form.get('new_variation', '').lower() == 'true' or wants_new_variation(message)
+
+        # A summary, vocabulary list or quiz of this page may have been generated in the background
+        artifact = None
+        if current_file_info and PREGENERATE_ARTIFACTS:
+            if document:
+                artifact_worker.submit(current_file_info['doc_id'], current_pdf_path, education_context['total_pages'],
+                                       education_context, first_page=education_context['current_page'])
+            kind = artifact_kind(intent, message)
+            if kind and not new_variation:
+                artifact = doc_index.page_artifact(current_file_info['doc_id'], education_context['current_page'],
+                                                   kind, artifact_variant(education_context))
+                if artifact:
+                    logger.info(f"🗃️ Answering with the pre-generated {kind} of page {education_context['current_page']}")
+
+        # Provider calls still ahead of this request, skipped if it is cancelled now
+        pending_work = (['image'] if is_image_request and provider.generate_image else []) + ([] if artifact else ['completion'])
+        stop_if_cancelled(cancel, pending_work)
+
+        # Process PDF context if available
+        file_context = None
+        images = []
+        describe_page = False  # Ask for a description of the page along with the answer
+
+        if current_pdf_path and os.path.exists(current_pdf_path) and not artifact:
+            try:
+                # Convert current page to high-quality image to preserve all content
+                current_page_index = education_context['current_page'] - 1  # Convert to 0-based index
+                doc_id = current_file_info.get('doc_id')
+                # Questions about a selection or a figure get just that part of the page, plus the page text
+                clip = None
+                if region or (asks_about_figure(message) and not is_image_request):
+                    clip = page_focus(current_pdf_path, current_page_index, region)
+                # Follow-ups on a page described earlier go as text; the image is re-sent only when asked for
+                description = None
+                if doc_id and clip is None and not (form.get('page_image', '').lower() == 'true'
+                                                    or wants_page_image(message)):
+                    description = doc_index.page_description(doc_id, education_context['current_page'])
+                if description:
+                    file_context = {
+                        'info': current_file_info,
+                        'page': education_context['current_page'],
+                        'total_pages': education_context['total_pages'],
+                        'description': format_description(description)
+                    }
+                    logger.info(f"📝 Sending the stored description of page {education_context['current_page']} instead of its image")
+                else:
+                    images = page_images(current_pdf_path, current_page_index, clip, doc_id)
+                    describe_page = bool(images and clip is None and doc_id)
+                timing.mark('render')
+                if images:
+                    file_context = {
+                        'info': current_file_info,
+                        'page': education_context['current_page'],
+                        'total_pages': education_context['total_pages'],
+                        'tiles': len(images)
+                    }
+                    if clip:
+                        file_context['focus'] = 'the area selected by the teacher' if region else 'the figures'
+                        file_context['page_text'] = page_text(current_pdf_path, current_page_index, doc_id)[:PAGE_TEXT_MAX_CHARS]
+                        logger.info(f"✂️ Sending {file_context['focus']} of page {education_context['current_page']} with the page text")
+                    sizes = ', '.join(f"{image.width}x{image.height}" for image in images)
+                    logger.info(f"✅ Converted page {education_context['current_page']} to {len(images)} image(s) ({sizes}px) for AI analysis")
+                elif not description:
+                    logger.warning(f"⚠️  Failed to convert page {education_context['current_page']} to image")
+
+            except Exception as e:
+                logger.error(f"Error processing PDF page: {str(e)}")
+
+        # Build prompt with education context
+        system_prompt, user_prompt = build_education_prompt(message, education_context, file_context)
+        if describe_page:
+            system_prompt += DESCRIPTION_INSTRUCTION
+
+        # Prepare messages for AI
+        messages = {
+            'system': system_prompt,
+            'user': user_prompt
+        }
+
+        generated_image = None
+
+        if intent and not is_image_request:
+            logger.info(f"🧭 Detected {intent.intent} request: {intent.argument}")
+            messages['user'] += intent_prompt(intent, education_context)
+
+        timing.mark('prompt')
+
+        # Providers without image generation answer image requests with text only
+        if is_image_request and provider.generate_image:
+            logger.info("🎨 Detected image generation request")
+            image_description = intent.argument or message
+            logger.info(f"🎨 Image description: {image_description}" + (" (new variation requested)" if new_variation else ""))
+            stop_if_cancelled(cancel, pending_work)
+
+            try:
+                image_started = time.time()
+                generated_image = asyncio.run(provider.generate_image(image_description, education_context, new_variation,
+                                                                      cancel))
+                logger.info(f"🎨 Image generation result: {generated_image}")
+                if generated_image and 'error' not in generated_image and not generated_image.get('cached'):
+                    cancellations.observe('image', time.time() - image_started)
+            except Exception as e:
+                logger.error(f"🎨 Image generation exception: {str(e)}")
+                generated_image = {"error": f"Image generation failed: {str(e)}"}
+
+            if generated_image and 'error' not in generated_image:
+                if events:
+                    events('image', {'generated_image': generated_image})  # Shown while the answer is written
+                # Modify the user prompt to include context about the generated image
+                messages['user'] += f"\n\nI have generated an educational image for you based on: '{image_description}'. The image has been created and will be displayed to the user. Please provide educational guidance on how to use this image effectively in your Class {education_context.get('class_level', '6')} classroom with {education_context.get('class_strength', '30')} students."
+            timing.mark('image')
+
+        # Call the AI provider with image context
+        if artifact:
+            response = {"text": artifact, "html": markdown_html(artifact)}
+        else:
+            logger.info(f"🤖 Sending request to {provider.NAME} API...")
+            score = request_score(message, intent.intent if intent else None, bool(images), education_context['class_level'])
+            # What may be given up if the request is over the token budget: page text, then image size
+            context = [file_context[key] for key in ('page_text', 'description') if file_context and file_context.get(key)]
+            rerender = None
+            if images:
+                def rerender(scale, fitted):
+                    smaller = page_images(current_pdf_path, current_page_index, clip, doc_id,
+                                          pixel_budget=int(PAGE_PIXEL_BUDGET * scale), max_tiles=1)
+                    return smaller, dict(fitted, system=fitted['system'].replace(tile_note(len(images)), '', 1))
+            on_text = None
+            if events:
+                def on_text(text):
+                    events('partial', {'reset': True} if text is None else {'text': text})
+            response = asyncio.run(call_ai_api(messages, images, use_cache=not new_variation, describe=describe_page,
+                                               score=score, intent=intent.intent if intent else None, cancel=cancel,
+                                               context=context, rerender=rerender, on_text=on_text))
+        timing.mark('ai')
+
+        if 'error' in response:
+            logger.error(f"AI API Error: {response['error']}")
+            return response, 413 if response['error'] == PROMPT_TOO_LARGE_ERROR else 500
+
+        page_description = response.pop('page_description', None)
+        if page_description:
+            doc_index.save_page_description(current_file_info['doc_id'], education_context['current_page'],
+                                            page_description, response.get('usage', {}).get('model', provider.MODEL))
+            logger.info(f"📝 Stored a description of page {education_context['current_page']} for follow-up questions")
+
+        # Add generated image to response if available
+        if generated_image and 'error' not in generated_image:
+            response['generated_image'] = generated_image
+            logger.info(f"✅ Added generated image to response: {generated_image.get('image_url', 'No URL')}")
+        elif generated_image and 'error' in generated_image:
+            # If image generation failed, mention it in the text response
+            logger.warning(f"⚠️ Image generation failed: {generated_image['error']}")
+            response['text'] += f"\n\n*Note: I attempted to generate an image for you, but encountered an issue: {generated_image['error']}*"
+            response['html'] += f"<p><em>Note: I attempted to generate an image for you, but encountered an issue: {generated_image['error']}</em></p>"
+        elif is_image_request and provider.generate_image:
+            logger.warning("⚠️ Image generation was requested but no result was returned")
+
+        logger.info(f"✅ Received response from {provider.NAME} API")
+        logger.info(f"📤 Final response structure: {list(response.keys())}")
+
+        # Log the complete response for debugging
+        if 'generated_image' in response:
+            logger.info(f"🎨 Response contains generated_image: {response['generated_image']}")
+
+        logger.info(f"📤 Complete response being sent: {response}")
+        return response, 200
+
+    except RequestEntityTooLarge as e:
+        logger.warning(f"⚠️ Upload rejected: {e.description}")
+        return {"error": e.description}, 413
+    except RequestCancelled as e:
+        cancellations.request_cancelled(e.reason)
+        if e.reason == 'deadline':
+            logger.warning("⏱️ Chat request stopped at its deadline")
+            return {"error": "The answer took longer than the request's deadline allowed. Please try again."}, 504
+        logger.info("🛑 Client disconnected, chat request stopped")
+        return {"error": "Client disconnected"}, 499  # Nobody reads it; the status nginx uses for this
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        logger.error(f"ERROR: {error_msg}")
+        return {"error": error_msg}, 500
+
+def register_chat_socket():
+    """Serve chat over a WebSocket at SOCKET_PATH (chat_socket.py); False without flask-sock"""
+    try:
+        from flask_sock import Sock
+    except ImportError:
+        logger.info("🔌 Chat socket off (pip install flask-sock to enable it); clients use POST /api/chat")
+        return False
+
+    @Sock(app).route(SOCKET_PATH)
+    def chat_socket(ws):
+        if not allowed_origin(request.headers.get('Origin')):
+            socket_stats.count("rejected")
+            logger.warning(f"🔌 Chat socket from origin {request.headers.get('Origin')} refused")
+            return
+        ChatSession(ws, answer_socket_chat, prefetch_page, socket_stats).run()
+
+    logger.info(f"🔌 Chat socket at {SOCKET_PATH}")
+    return True
+
+def answer_socket_chat(form, cancel, events):
+    """answer_chat for a chat socket message (paused pre-generation like POST /api/chat)"""
+    timing = ServerTiming()
+    artifact_worker.interactive_started()
+    try:
+        response, status = answer_chat(form, {}, cancel, timing, events)
+    finally:
+        artifact_worker.interactive_finished()
+    if status == 200:
+        response['server_timing'] = timing.header()
+    return response, status
+
+def prefetch_page(form):
+    """Render the page a socket client turned to, so a question about it finds its images ready; True if rendered"""
+    file_ref = form.get(f"file_ref_{form.get('current_pdf_index', 0)}")
+    filepath = chunked_uploads.resolve(file_ref) if file_ref else None
+    if not filepath:
+        return False
+    doc_id = file_ref.split('_', 1)[0]
+    page_no = int(form.get('current_page', 1))
+    if PREGENERATE_ARTIFACTS and doc_index.document(doc_id):
+        artifact_worker.submit(doc_id, filepath, int(form.get('total_pages', page_no)), form, first_page=page_no)
+    if doc_index.page_description(doc_id, page_no):
+        return False  # Questions about it are answered from its description
+    return bool(page_images(filepath, page_no - 1, doc_id=doc_id))
+
+@app.route('/api/uploads', methods=['POST'])
+def start_chunked_upload():
+    """Start a resumable chunked upload for a large PDF"""
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(chunked_uploads.create(data.get('filename'), data.get('size'))), 201
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """Report which chunks have arrived so an interrupted upload can resume"""
+    try:
+        return jsonify(chunked_uploads.status(upload_id))
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    """Write one chunk at its offset after checking its length and X-Chunk-SHA256 / X-Chunk-CRC32"""
+    try:
+        return jsonify(chunked_uploads.write_chunk(upload_id, index, request.stream, request.content_length,
+                                                   request.headers.get('X-Chunk-SHA256'), request.headers.get('X-Chunk-CRC32')))
+    except UploadError as e:
+        logger.warning(f"⚠️ Chunk {index} of upload {upload_id[:8]} rejected: {e.message}")
+        return jsonify({"error": e.message}), e.status
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """Assemble a finished chunked upload and return the file_ref to send with chat messages"""
+    try:
+        upload = chunked_uploads.complete(upload_id)
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status
+    # Index it now so the first chat message about it finds the pages ready
+    document = doc_index.index_document(upload['sha256'], os.path.join(UPLOAD_FOLDER, upload['file_ref']), upload['filename'])
+    upload['doc_id'] = document['doc_id']
+    return jsonify(upload)
+
+@app.route('/api/docs/<doc_id>', methods=['GET'])
+def document_index(doc_id):
+    """Indexed metadata of an uploaded PDF: status, page count and per-page dimensions/coverage"""
+    document = doc_index.document(doc_id)
+    if not document:
+        return jsonify({"error": "Document not found"}), 404
+    document['pages'] = doc_index.pages(doc_id)
+    document['tile_size'] = TILE_SIZE
+    return jsonify(document)
+
+def send_page_image(source, etag):
+    """Page images are derived from a content-addressed document, so they can be cached forever"""
+    response = send_file(source, mimetype='image/webp', etag=etag, conditional=True, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/api/docs/<doc_id>/pages/<int:page_no>', methods=['GET'])
+def document_page_image(doc_id, page_no):
+    """WebP thumbnail of a page, or one TILE_SIZE tile of it at ?zoom=&x=&y="""
+    if not is_doc_id(doc_id):
+        return jsonify({"error": "Document not found"}), 404
+    zoom = request.args.get('zoom', type=float)
+    if zoom is None:
+        etag = f"{doc_id}_p{page_no}_thumb_v{RENDER_VERSION}"
+        if request.if_none_match.contains(etag):
+            return send_page_image(BytesIO(), etag)
+        thumbnail = doc_index.thumbnail(doc_id, page_no)
+        if thumbnail is None:
+            return jsonify({"error": "Page not indexed yet"}), 404
+        return send_page_image(BytesIO(thumbnail), etag)
+
+    zoom = quantize_zoom(zoom)
+    x, y = request.args.get('x', 0, type=int), request.args.get('y', 0, type=int)
+    key = tile_key(doc_id, page_no, zoom, x, y)
+    # Revalidation needs no rendering (or even a cached copy): the tag alone identifies the pixels
+    if request.if_none_match.contains(key):
+        return send_page_image(BytesIO(), key)
+    path = render_cache.get(key)
+    if not path:
+        pdf_paths = glob.glob(os.path.join(UPLOAD_FOLDER, f"{doc_id}_*.pdf"))
+        if not pdf_paths:
+            return jsonify({"error": "Document not found. Please upload it again."}), 404
+        with document_pool.document(pdf_paths[0], key=doc_id) as doc:
+            data = render_tile(doc, page_no, zoom, x, y)
+        if data is None:
+            return jsonify({"error": "Page or tile out of range"}), 404
+        path = render_cache.put(key, data)
+    return send_page_image(path, key)
+
+@app.route('/api/exports', methods=['POST'])
+def start_notes_export():
+    """Start building a PDF of canvas notes; 200 if it is already cached, else 202 and poll"""
+    data = request.get_json(silent=True) or {}
+    try:
+        export = notes_exporter.submit(data.get('items'), data.get('title') or 'AI Education Assistant - Notes')
+    except ExportError as e:
+        return jsonify({"error": e.message}), e.status
+    return jsonify(export), 200 if export['status'] == 'ready' else 202
+
+@app.route('/api/exports/<export_id>', methods=['GET'])
+def notes_export_status(export_id):
+    """Poll a notes export: pending, ready or failed"""
+    export = notes_exporter.status(export_id)
+    if not export:
+        return jsonify({"error": "Export not found"}), 404
+    return jsonify(export)
+
+@app.route('/api/exports/<export_id>/download', methods=['GET'])
+def download_notes_export(export_id):
+    """Download a finished notes PDF"""
+    if not notes_exporter.path(export_id):
+        return jsonify({"error": "Export not ready"}), 404
+    return send_stored_file(EXPORT_FOLDER, f"{export_id}.pdf", etag=export_id, immutable=True,
+                            download_name=f"AI_Education_Notes_{datetime.now().strftime('%Y-%m-%d')}.pdf")
+
+@app.route('/uploads/<filename>')
+def uploaded_file(filename):
+    """Serve uploaded files with range requests, so pdf.js can load large PDFs progressively"""
+    digest = stored_digest(filename)
+    # Stored names start with the content hash: the same name always means the same bytes
+    return send_stored_file(UPLOAD_FOLDER, filename, etag=digest, immutable=bool(digest))
+
+@app.route('/temp_images/<filename>')
+def temp_image_file(filename):
+    """Serve temporarily saved generated images (names carry a random id, so they never change)"""
+    try:
+        return send_stored_file(TEMP_FOLDER, filename, immutable=True)
+    except NotFound:
+        logger.error(f"❌ Temp image not found: {filename}")
+        return jsonify({"error": "Image not found"}), 404
+
+@app.errorhandler(413)
+def too_large(e):
+    """Handle file too large error"""
+    return jsonify({"error": getattr(e, 'description', None) or "File too large. Maximum size is 10MB."}), 413
+
+@app.errorhandler(404)
+def not_found(e):
+    """Handle 404 errors"""
+    return jsonify({"error": "Endpoint not found"}), 404
+
+@app.errorhandler(500)
+def internal_error(e):
+    """Handle 500 errors"""
+    return jsonify({"error": "Internal server error"}), 500
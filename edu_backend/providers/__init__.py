@@ -0,0 +1,22 @@
+"""
+AI Providers
+Each provider is a module with the same small interface (NAME, MODEL,
+MODEL_TIERS, SYSTEM_PROMPT, rate_limiter, TOKEN_BUDGET, is_configured,
+get_client, image_content, create_completion, generate_image, home_page,
+...). Modules are imported by name when an app is created, and their SDKs
+only when the first client is.
+"""
+
+import importlib
+
+PROVIDERS = {
+    'openai': 'edu_backend.providers.openai_provider',
+    'groq': 'edu_backend.providers.groq_provider',
+}
+
+
+def load_provider(name):
+    """Import and return the provider module registered under name"""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown AI provider '{name}' (expected one of: {', '.join(PROVIDERS)})")
+    return importlib.import_module(PROVIDERS[name])
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Groq Provider
+Llama 4 Scout with vision on Groq for answers (no image generation). The
+groq SDK is only imported when the first client is created.
+"""
+
+import logging
+import os
+import threading
+from rate_limiter import ProviderRateLimiter
+
+logger = logging.getLogger(__name__)
+
+NAME = "Groq"
+MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"  # Same model as in groq_api.py
+# Cheapest first; used when MODEL_CASCADE=1 (model_router.py). The fast tier has no vision,
+# so page questions start at the standard tier.
+MODEL_TIERS = os.getenv('GROQ_MODEL_TIERS', "fast=llama-3.1-8b-instant,standard=meta-llama/llama-4-scout-17b-16e-instruct,"
+                                            "strong=meta-llama/llama-4-maverick-17b-128e-instruct")
+BACKEND_TITLE = "AI Education Assistant Backend (Groq)"
+NOT_CONFIGURED_ERROR = "Groq API client not configured."
+
+SYSTEM_PROMPT = """You are an AI Education Assistant helping a teacher plan lessons and create educational content.
+
+EDUCATION CONTEXT:
+- Teacher's Language: {teacher_lang}
+- Student's Language: {student_lang}
+- Class Level: Class {class_level}
+- Number of Students: {class_strength}
+
+GUIDELINES:
+1. Provide practical, classroom-ready advice
+2. Consider the class size ({class_strength} students) in your suggestions
+3. Adapt content for Class {class_level} comprehension level
+4. If teacher and student languages differ, provide bilingual support strategies
+5. Focus on interactive and engaging teaching methods
+6. Provide specific examples and activities
+7. Consider diverse learning styles and abilities
+
+RESPONSE FORMAT:
+- Use clear, actionable language
+- Include specific classroom activities when relevant
+- Suggest assessment methods
+- Provide differentiation strategies for diverse learners
+- Keep responses concise but comprehensive
+"""
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Optional: send requests to another Groq-compatible server (e.g. fake_provider.py at http://localhost:5100)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+if not GROQ_API_KEY:
+    logger.error("❌ GROQ_API_KEY not found in environment variables")
+
+# Paces requests against the budgets Groq reports in x-ratelimit-* headers.
+# GROQ_RPM / GROQ_TPM seed the budgets until the first response arrives.
+rate_limiter = ProviderRateLimiter(
+    "Groq",
+    requests_per_minute=int(os.getenv('GROQ_RPM', 0)) or None,
+    tokens_per_minute=int(os.getenv('GROQ_TPM', 0)) or None,
+)
+
+# Prompt + max_tokens a chat request may use; bigger requests are fitted (token_budget.py)
+TOKEN_BUDGET = int(os.getenv('GROQ_TOKEN_BUDGET', 8000))
+TOKEN_ACCOUNTING = 'llama'  # Llama 4 image tiles; text counted with a close tokenizer
+
+# Groq has no image generation endpoint
+generate_image = None
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def is_configured():
+    return bool(GROQ_API_KEY)
+
+
+def get_client():
+    """Groq client, created (and the SDK imported) on first use; None if not configured"""
+    global _client
+    if _client is None and is_configured():
+        with _client_lock:
+            if _client is None:
+                try:
+                    from groq import Groq
+                    _client = Groq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL)
+                    logger.info("✅ Groq client initialized successfully")
+                except Exception as e:
+                    logger.error(f"❌ Error initializing Groq client: {str(e)}")
+    return _client
+
+
+def image_content(data_url, detail=None):
+    """Message part carrying the rendered PDF page (a prebuilt data URL, not copied again; Groq has no detail setting)"""
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": data_url
+        }
+    }
+
+
+def create_completion(api_messages, max_tokens, model=None, stream=False, timeout=None):
+    """Chat completion with the raw response, so the rate limiter can read its headers
+
+    Streamed completions can be closed part way when the request is
+    cancelled; Groq reports their usage in the last chunk's `x_groq`.
+    """
+    client = get_client()
+    if timeout is not None:  # A deadline leaves no time for the SDK's retries
+        client = client.with_options(timeout=timeout, max_retries=0)
+    return client.chat.completions.with_raw_response.create(
+        model=model or MODEL,
+        messages=api_messages,
+        max_tokens=max_tokens,
+        temperature=0.7,
+        top_p=1,
+        stream=stream,
+        stop=None,
+    )
+
+
+def image_folders():
+    return {}
+
+
+def status_extras():
+    return {}
+
+
+def register_routes(app):
+    pass
+
+
+def home_page(api_status):
+    return f"""
+    <h1>🎓 AI Education Assistant Backend (Groq)</h1>
+    <p>Real backend server with Groq API integration!</p>
+    <h2>API Status: {api_status}</h2>
+
+    <h2>Available Endpoints:</h2>
+    <ul>
+        <li><strong>POST /api/chat</strong> - Main chat endpoint with AI responses</li>
+        <li><strong>GET /api/status</strong> - Server status</li>
+        <li><strong>GET /api/test</strong> - Test endpoint</li>
+    </ul>
+
+    <h2>AI Features:</h2>
+    <ul>
+        <li>✅ Groq Llama 4 Scout with vision capabilities</li>
+        <li>✅ PDF page image conversion (preserves all content including images)</li>
+        <li>✅ Educational content generation</li>
+        <li>✅ Multi-language teaching support</li>
+        <li>✅ Class-specific lesson planning</li>
+        <li>✅ Interactive activity suggestions</li>
+    </ul>
+
+    <h2>How It Works:</h2>
+    <ul>
+        <li>📝 Receives teacher questions with education context</li>
+        <li>📄 Converts PDF pages to high-quality images (preserving all visual content)</li>
+        <li>🤖 Sends context + image to Groq Llama model for comprehensive analysis</li>
+        <li>🎯 Returns classroom-ready teaching suggestions</li>
+    </ul>
+    """
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+OpenAI Provider
+ChatGPT (GPT-4.1 mini with vision) for answers and DALL-E 3 for educational
+images. The openai SDK is only imported when the first client is created.
+"""
+
+from flask import jsonify, send_from_directory
+from werkzeug.exceptions import NotFound
+import logging
+import os
+import re
+import threading
+import uuid
+from edu_backend.core import RATE_LIMIT_MAX_WAIT, TEMP_FOLDER
+from image_cache import ImageCache
+from rate_limiter import ProviderRateLimiter
+
+logger = logging.getLogger(__name__)
+
+NAME = "OpenAI"
+MODEL = "gpt-4.1-mini"  # GPT-4 with vision capabilities for image analysis
+# Cheapest first; used when MODEL_CASCADE=1 (model_router.py)
+MODEL_TIERS = os.getenv('OPENAI_MODEL_TIERS', "fast=gpt-4.1-nano,standard=gpt-4.1-mini,strong=gpt-4.1")
+BACKEND_TITLE = "AI Education Assistant Backend"
+NOT_CONFIGURED_ERROR = "OpenAI API key not configured. Please add your API key to the .env file and restart the server."
+
+IMAGE_CACHE_FOLDER = 'image_cache'  # Persistent DALL-E cache (not wiped by cleanup_files)
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_MB', 200)) * 1024 * 1024
+
+SYSTEM_PROMPT = """You are an AI Education Assistant helping a teacher plan lessons and create educational content for students who are mostly from under developed villages, in India, with limited access to resources, and lower socio-economic backgrounds.
+
+EDUCATION CONTEXT:
+- Teacher's Language: {teacher_lang}
+- Student's Language: {student_lang}
+- Class Level: Class {class_level}
+- Number of Students: {class_strength}
+
+GUIDELINES:
+1. Provide practical, classroom-ready advice
+2. Consider the class size ({class_strength} students) in your suggestions
+3. Adapt content for Class {class_level} comprehension level
+4. If teacher and student languages differ, provide bilingual support strategies, including key vocabulary and phrases in Student's Language
+5. Focus on interactive and engaging teaching methods
+6. Provide specific examples and activities pertaining to the lesson topic and the background of students
+7. Consider diverse learning styles and abilities, pertaining to the environment of the students.
+
+RESPONSE FORMAT:
+- Use clear, actionable language
+- Include specific classroom activities when relevant
+- Suggest assessment methods
+- Provide differentiation strategies for diverse learners
+- Keep responses concise but comprehensive
+- Main focus should be on aligning with the students' backgrounds and needs
+"""
+
+# Load API key from .env file or environment variables
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Optional: send requests to another OpenAI-compatible server (e.g. fake_provider.py at http://localhost:5100/v1)
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+
+if not OPENAI_API_KEY or OPENAI_API_KEY == 'your_openai_api_key_here':
+    logger.warning("⚠️  OPENAI_API_KEY not configured!")
+    logger.warning("Please add your OpenAI API key to the .env file:")
+    logger.warning("1. Open the .env file in this directory")
+    logger.warning("2. Replace 'your_openai_api_key_here' with your actual API key")
+    logger.warning("3. Get your API key from: https://platform.openai.com/api-keys")
+    logger.warning("4. Restart the server after updating the .env file")
+
+# Paces requests against the budgets OpenAI reports in x-ratelimit-* headers.
+# OPENAI_RPM / OPENAI_TPM seed the budgets until the first response arrives.
+rate_limiter = ProviderRateLimiter(
+    "OpenAI",
+    requests_per_minute=int(os.getenv('OPENAI_RPM', 0)) or None,
+    tokens_per_minute=int(os.getenv('OPENAI_TPM', 0)) or None,
+)
+
+# Prompt + max_tokens a chat request may use; bigger requests are fitted (token_budget.py)
+TOKEN_BUDGET = int(os.getenv('OPENAI_TOKEN_BUDGET', 16000))
+TOKEN_ACCOUNTING = 'openai'  # o200k text tokens, 512px tiles or 32px patches per image
+
+# Cache of generated images keyed by normalized description + class level
+image_cache = ImageCache(IMAGE_CACHE_FOLDER, IMAGE_CACHE_MAX_BYTES)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def is_configured():
+    return bool(OPENAI_API_KEY and OPENAI_API_KEY != 'your_openai_api_key_here')
+
+
+def get_client():
+    """OpenAI client, created (and the SDK imported) on first use; None if not configured"""
+    global _client
+    if _client is None and is_configured():
+        with _client_lock:
+            if _client is None:
+                try:
+                    from openai import OpenAI
+                    _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+                    logger.info("✅ OpenAI client initialized successfully")
+                except Exception as e:
+                    logger.error(f"❌ Error initializing OpenAI client: {str(e)}")
+    return _client
+
+
+def image_content(data_url, detail=None):
+    """Message part carrying the rendered PDF page (a prebuilt data URL, not copied again)"""
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": data_url,
+            "detail": detail or "high"  # High detail to capture all content including text and images
+        }
+    }
+
+
+def create_completion(api_messages, max_tokens, model=None, stream=False, timeout=None):
+    """Chat completion with the raw response, so the rate limiter can read its headers
+
+    Streamed completions can be closed part way when the request is
+    cancelled; their usage arrives in the last chunk.
+    """
+    options = {"stream": True, "stream_options": {"include_usage": True}} if stream else {}
+    client = get_client()
+    if timeout is not None:  # A deadline leaves no time for the SDK's retries
+        client = client.with_options(timeout=timeout, max_retries=0)
+    return client.chat.completions.with_raw_response.create(
+        model=model or MODEL,
+        messages=api_messages,
+        max_tokens=max_tokens,
+        temperature=0.7,
+        **options
+    )
+
+
+async def download_and_save_image(image_url, description, timeout=30):
+    """Download image from DALL-E URL and save it locally"""
+    import requests
+    try:
+        # Create unique filename
+        image_id = str(uuid.uuid4())[:8]
+        safe_description = re.sub(r'[^a-zA-Z0-9_-]', '_', description[:30])
+        filename = f"dalle_{image_id}_{safe_description}.png"
+        filepath = os.path.join(TEMP_FOLDER, filename)
+
+        logger.info(f"📥 Downloading image from: {image_url}")
+        logger.info(f"💾 Saving as: {filepath}")
+
+        # Download the image
+        response = requests.get(image_url, timeout=timeout)
+        response.raise_for_status()
+
+        # Save the image
+        with open(filepath, 'wb') as f:
+            f.write(response.content)
+
+        # Create local URL
+        local_url = f"/temp_images/{filename}"
+        logger.info(f"✅ Image saved locally: {local_url}")
+
+        return {
+            "local_url": local_url,
+            "filename": filename,
+            "filepath": filepath
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Failed to download image: {str(e)}")
+        return None
+
+
+async def generate_image(description, education_context, new_variation=False, cancel=None):
+    """Generate an image using OpenAI's DALL-E API and save it locally
+
+    With a `cancel` token, DALL-E and the download only get the time left
+    before the request's deadline.
+    """
+    try:
+        class_level = education_context.get('class_level', '6')
+
+        # Reuse a previous image for the same description and class unless a new variation was asked for
+        if not new_variation:
+            cached = image_cache.get(description, class_level)
+            if cached:
+                cached_url = f"/image_cache/{cached['filename']}"
+                logger.info(f"⚡ Image cache hit for '{description}' (Class {class_level}): {cached_url}")
+                return {
+                    "image_url": cached_url,  # Original DALL-E URLs expire, so point at the cached copy
+                    "local_url": cached_url,
+                    "filename": cached['filename'],
+                    "description": description,
+                    "enhanced_prompt": cached.get('enhanced_prompt'),
+                    "cached": True
+                }
+
+        client = get_client()
+        if not client:
+            return {"error": "OpenAI API key not configured"}
+
+        # Enhance the prompt for educational content
+        enhanced_prompt = f"Educational illustration for Class {class_level} students: {description}. Make it colorful, clear, and age-appropriate for learning."
+
+        # Limit prompt length (DALL-E has a 1000 character limit)
+        if len(enhanced_prompt) > 900:
+            enhanced_prompt = enhanced_prompt[:900] + "..."
+
+        logger.info(f"🎨 Generating image with DALL-E: {enhanced_prompt}")
+
+        if cancel is not None and cancel.remaining() is not None:
+            client = client.with_options(timeout=cancel.remaining(), max_retries=0)
+        response = client.images.generate(
+            model="dall-e-3",
+            prompt=enhanced_prompt,
+            size="1024x1024",
+            quality="standard",
+            n=1,
+        )
+
+        image_url = response.data[0].url
+        logger.info(f"✅ Image generated successfully: {image_url}")
+
+        # Download and save the image locally (even if the teacher has left: it is paid for, and cached for a retry)
+        local_image_info = await download_and_save_image(image_url, description,
+                                                         cancel.remaining(30) if cancel is not None else 30)
+
+        result = {
+            "image_url": image_url,  # Keep original DALL-E URL for reference
+            "description": description,
+            "enhanced_prompt": enhanced_prompt
+        }
+
+        # Add local URL if download was successful
+        if local_image_info:
+            result["local_url"] = local_image_info["local_url"]
+            result["filename"] = local_image_info["filename"]
+            logger.info(f"🏠 Local image URL: {local_image_info['local_url']}")
+
+            try:
+                image_cache.put(description, class_level, local_image_info["filepath"], {"enhanced_prompt": enhanced_prompt})
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to cache generated image: {str(e)}")
+        else:
+            logger.warning("⚠️ Failed to save image locally, using original DALL-E URL")
+
+        return result
+
+    except Exception as e:
+        logger.error(f"DALL-E API error: {str(e)}")
+        return {"error": f"Image generation error: {str(e)}"}
+
+
+def image_folders():
+    """Generated-image folders the notes export may embed from, by URL prefix"""
+    return {'image_cache': IMAGE_CACHE_FOLDER}
+
+
+def status_extras():
+    return {"image_cache": image_cache.stats()}
+
+
+def register_routes(app):
+    @app.route('/image_cache/<filename>')
+    def cached_image_file(filename):
+        """Serve cached DALL-E images (names are content keys, so they never change)"""
+        try:
+            return send_from_directory(os.path.abspath(IMAGE_CACHE_FOLDER), filename, max_age=31536000)
+        except NotFound:
+            logger.error(f"❌ Cached image not found: {filename}")
+            return jsonify({"error": "Image not found"}), 404
+
+
+def home_page(api_status):
+    return f"""
+    <h1>🎓 AI Education Assistant Backend</h1>
+    <p>Real backend server with ChatGPT API integration!</p>
+    <h2>API Status: {api_status}</h2>
+
+    <h2>Available Endpoints:</h2>
+    <ul>
+        <li><strong>POST /api/chat</strong> - Main chat endpoint with AI responses</li>
+        <li><strong>GET /api/status</strong> - Server status</li>
+        <li><strong>GET /api/test</strong> - Test endpoint</li>
+    </ul>
+
+    <h2>AI Features:</h2>
+    <ul>
+        <li>✅ OpenAI GPT-4 with vision capabilities</li>
+        <li>✅ DALL-E 3 image generation for educational content</li>
+        <li>✅ PDF page image conversion (preserves all content including images)</li>
+        <li>✅ Educational content generation</li>
+        <li>✅ Multi-language teaching support</li>
+        <li>✅ Class-specific lesson planning</li>
+        <li>✅ Interactive activity suggestions</li>
+    </ul>
+
+    <h2>Setup Instructions:</h2>
+    <ol>
+        <li>Get your OpenAI API key from <a href="https://platform.openai.com/api-keys">platform.openai.com</a></li>
+        <li>Open the <code>.env</code> file in this directory</li>
+        <li>Replace <code>your_openai_api_key_here</code> with your actual API key</li>
+        <li>Save the file and restart this server</li>
+    </ol>
+
+    <h2>How It Works:</h2>
+    <ul>
+        <li>📝 Receives teacher questions with education context</li>
+        <li>🎨 Generates educational images when requested (e.g., "Generate an image of...")</li>
+        <li>📄 Converts PDF pages to high-quality images (preserving all visual content)</li>
+        <li>🤖 Sends context + image to GPT-4 vision model for comprehensive analysis</li>
+        <li>🎯 Returns classroom-ready teaching suggestions</li>
+    </ul>
+
+    <h2>Image Generation Usage:</h2>
+    <ul>
+        <li>🎨 Use phrases like "Generate an image of...", "Create a picture of...", "Illustrate..."</li>
+        <li>📚 Images are automatically optimized for educational use and class level</li>
+        <li>🎯 AI provides teaching guidance on how to use the generated images</li>
+    </ul>
+    """
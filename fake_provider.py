@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Fake AI Provider for local testing
+Speaks the OpenAI/Groq HTTP API the backends use (chat completions, streamed
+or not, and image generation) and enforces per-minute request and token
+limits the way the real providers do, returning the same x-ratelimit-*
+headers and 429 errors. Point a backend at it with
+OPENAI_BASE_URL=http://localhost:5100/v1 or GROQ_BASE_URL=http://localhost:5100.
+
+Completion latency can follow a distribution instead of a fixed delay:
+"0.2" / "fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.05" (mean, stddev),
+"lognormal:0.3,0.5" (median, sigma), "exp:0.2" (mean) or "script:0.1,2,0.1"
+(cycles through the listed values). --model-latency gives some models their
+own latency ("gpt-4.1-nano=0.1;gpt-4.1=lognormal:0.8,0.3"), and
+--weak-rate makes a share of answers one-line non-answers.
+
+Failures can be injected at random (--error-rate for 5xx, --429-rate) or
+scripted per request (--fail-script 200,429,200,503). With --record DIR and
+--upstream URL requests are forwarded to a real provider and the responses
+saved; --replay DIR serves those saved responses again.
+"""
+
+from flask import Flask, Response, request, jsonify
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+
+DEFAULT_PORT = 5100
+
+FILLER_TEXT = ("This is a fake response for local testing. Plants make their own food through photosynthesis, "
+               "using sunlight, water and carbon dioxide. Ask the class to observe a leaf and draw what they see. ")
+
+# Requests asking for a page description after the answer (page_descriptions.py) get this one
+PAGE_DESCRIPTION_MARKER = "===PAGE DESCRIPTION==="
+FAKE_PAGE_DESCRIPTION = {"text": "Chapter 1: Nutrition in Plants. Plants make food by photosynthesis.",
+                         "figures": ["A leaf with arrows for sunlight, water and carbon dioxide"], "tables": []}
+
+
+def format_duration(seconds):
+    """Format seconds the way providers do in reset headers (e.g. "1m2.5s")"""
+    if seconds < 1:
+        return f"{int(seconds * 1000)}ms"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes:
+        return f"{int(minutes)}m{seconds:.1f}s"
+    return f"{seconds:.2f}s"
+
+
+def count_tokens(payload):
+    """Count prompt tokens for a request (deliberately not the backend's estimator)"""
+    tokens = 0
+    for message in payload.get('messages', []):
+        content = message.get('content')
+        if isinstance(content, str):
+            tokens += int(len(content) / 3.5) + 4
+            continue
+        for part in content or []:
+            if part.get('type') == 'text':
+                tokens += int(len(part.get('text', '')) / 3.5) + 4
+            elif part.get('type') == 'image_url':
+                tokens += 85 if part['image_url'].get('detail') == 'low' else 1105
+    return tokens
+
+
+def make_latency_sampler(spec, seed=None):
+    """Turn a latency spec (seconds or "kind:params") into a function returning seconds"""
+    rng = random.Random(seed)
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, _, params = str(spec).partition(':')
+    if not params:
+        kind, params = 'fixed', kind
+    values = [float(value) for value in params.split(',')]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == 'exp':
+        return lambda: rng.expovariate(1.0 / values[0])
+    if kind == 'script':
+        script = itertools.cycle(values)
+        return lambda: next(script)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def solid_png(width, height, rgb):
+    """Encode a single-colour PNG (stands in for a generated image)"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    row = b'\x00' + bytes(rgb) * width
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height, 9))
+            + chunk(b'IEND', b''))
+
+
+class MinuteBucket:
+    """Continuously refilling per-minute budget"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.level = float(limit)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.limit, self.level + (now - self.updated_at) * self.limit / 60.0)
+        self.updated_at = now
+
+    def take(self, amount, now):
+        self._refill(now)
+        if self.level < amount:
+            return False
+        self.level -= amount
+        return True
+
+    def seconds_until(self, amount, now):
+        self._refill(now)
+        missing = min(amount, self.limit) - self.level
+        return max(0.0, missing * 60.0 / self.limit)
+
+    def headers(self, kind, now):
+        self._refill(now)
+        return {
+            f'x-ratelimit-limit-{kind}': str(self.limit),
+            f'x-ratelimit-remaining-{kind}': str(int(self.level)),
+            f'x-ratelimit-reset-{kind}': format_duration((self.limit - self.level) * 60.0 / self.limit),
+        }
+
+
+class Recordings:
+    """Captured provider responses, stored as JSON lines and keyed by request content"""
+
+    FILE = 'recordings.jsonl'
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._cursor = {}
+        os.makedirs(folder, exist_ok=True)
+        try:
+            with open(os.path.join(folder, self.FILE), 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._responses.setdefault(entry['key'], []).append(entry)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def make_key(kind, payload):
+        """Requests match when endpoint, model and input match (sampling settings are ignored)"""
+        relevant = {'kind': kind, 'model': payload.get('model'),
+                    'input': payload.get('messages') if kind == 'chat' else payload.get('prompt')}
+        return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode('utf-8')).hexdigest()[:24]
+
+    def get(self, key):
+        """Next recorded response for this key (cycling through repeats), or None"""
+        with self._lock:
+            entries = self._responses.get(key)
+            if not entries:
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = (index + 1) % len(entries)
+            return entries[index]
+
+    def add(self, key, status, body):
+        entry = {"key": key, "status": status, "body": body, "recorded_at": time.time()}
+        with self._lock:
+            self._responses.setdefault(key, []).append(entry)
+            with open(os.path.join(self.folder, self.FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+
+def create_fake_provider(requests_per_minute=60, tokens_per_minute=30000, latency=0.2, seed=None,
+                         stream_tokens_per_second=50, completion_tokens=120, image_latency=None,
+                         error_rate=0.0, rate_limit_rate=0.0, fail_script=None,
+                         record_dir=None, replay_dir=None, upstream=None, model_latency=None, weak_rate=0.0):
+    """Build the fake provider Flask app
+
+    latency / image_latency are latency specs (see make_latency_sampler).
+    stream_tokens_per_second paces streamed completions (0 = as fast as possible).
+    error_rate / rate_limit_rate inject random 5xx / 429 responses; fail_script
+    is a list of status codes applied to successive requests (200 = normal).
+    model_latency maps model names to their own latency specs; weak_rate is
+    the share of completions answered with a one-line non-answer.
+    record_dir + upstream forward requests to a real provider and save the
+    responses; replay_dir serves saved responses instead of generated ones.
+    """
+    if record_dir and not upstream:
+        raise ValueError("Recording needs an upstream provider URL")
+    app = Flask(__name__)
+    lock = threading.Lock()
+    rng = random.Random(seed)
+    sample_latency = make_latency_sampler(latency, seed)
+    sample_image_latency = make_latency_sampler(image_latency if image_latency is not None else latency, seed)
+    model_samplers = {model: make_latency_sampler(spec, seed) for model, spec in (model_latency or {}).items()}
+    script = itertools.cycle(fail_script) if fail_script else None
+    recordings = Recordings(record_dir or replay_dir) if (record_dir or replay_dir) else None
+    requests_bucket = MinuteBucket(requests_per_minute)
+    tokens_bucket = MinuteBucket(tokens_per_minute)
+    app.config['FAKE_PROVIDER_STATS'] = stats = {
+        "accepted": 0, "rate_limited": 0, "injected_errors": 0, "streamed": 0,
+        "images": 0, "replayed": 0, "recorded": 0, "weak": 0, "models": {},
+        "streams_closed_early": 0, "unsent_tokens": 0,
+    }
+
+    def limit_headers(now):
+        headers = requests_bucket.headers('requests', now)
+        headers.update(tokens_bucket.headers('tokens', now))
+        return headers
+
+    def error_response(status, message, error_type, code, headers=None):
+        response = jsonify({"error": {"message": message, "type": error_type, "code": code}})
+        response.status_code = status
+        response.headers.update(headers or {})
+        return response
+
+    def admit(needed):
+        """Apply failure injection and the rate limits; returns (error response or None, headers)"""
+        with lock:
+            now = time.monotonic()
+            scripted = next(script) if script else 200
+            if scripted == 429 or (not script and rng.random() < rate_limit_rate):
+                stats["rate_limited"] += 1
+                headers = dict(limit_headers(now), **{'retry-after': '1.000'})
+                return error_response(429, "Rate limit reached for requests (injected). Please try again in 1s.",
+                                      "requests", "rate_limit_exceeded", headers), None
+            if scripted >= 500 or (not script and rng.random() < error_rate):
+                status = scripted if scripted >= 500 else rng.choice([500, 502, 503])
+                stats["injected_errors"] += 1
+                return error_response(status, "The server had an error while processing your request (injected).",
+                                      "server_error", None), None
+            wait = max(requests_bucket.seconds_until(1, now), tokens_bucket.seconds_until(needed, now))
+            if wait > 0:
+                stats["rate_limited"] += 1
+                kind = "requests" if requests_bucket.seconds_until(1, now) > 0 else "tokens"
+                headers = dict(limit_headers(now), **{'retry-after': f"{wait:.3f}"})
+                return error_response(429, f"Rate limit reached for {kind}. Please try again in {format_duration(wait)}.",
+                                      kind, "rate_limit_exceeded", headers), None
+            requests_bucket.take(1, now)
+            tokens_bucket.take(needed, now)
+            stats["accepted"] += 1
+            return None, limit_headers(now)
+
+    def request_payload():
+        return request.get_json(force=True, silent=True) or {}
+
+    def forward(kind, payload):
+        """Send the request to the real provider and save its response (record mode)"""
+        import requests  # Only needed when recording
+        path = '/chat/completions' if kind == 'chat' else '/images/generations'
+        upstream_payload = {key: value for key, value in payload.items() if key not in ('stream', 'stream_options')}
+        response = requests.post(upstream.rstrip('/') + path, json=upstream_payload, timeout=120,
+                                 headers={'Authorization': request.headers.get('Authorization', '')})
+        body = response.json()
+        if response.status_code == 200:
+            recordings.add(Recordings.make_key(kind, payload), response.status_code, body)
+            with lock:
+                stats["recorded"] += 1
+        return response.status_code, body
+
+    def replayed(kind, payload):
+        entry = recordings.get(Recordings.make_key(kind, payload)) if replay_dir else None
+        if entry:
+            with lock:
+                stats["replayed"] += 1
+        return entry
+
+    def generated_text(max_tokens):
+        words = (FILLER_TEXT * 50).split()
+        count = min(completion_tokens, max_tokens or completion_tokens)
+        return ' '.join(words[:max(1, int(count * 0.75))])
+
+    def stream_completion(body, include_usage, groq_style):
+        """Yield a completion as chat.completion.chunk SSE events, paced in tokens per second"""
+        text = body['choices'][0]['message']['content'] or ''
+        base = {"id": body['id'], "object": "chat.completion.chunk", "created": body['created'], "model": body['model']}
+
+        def event(data):
+            return f"data: {json.dumps(data)}\n\n"
+
+        yield event(dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        pieces = re.findall(r"\S+\s*", text)
+        for sent, piece in enumerate(pieces):
+            if stream_tokens_per_second:
+                time.sleep(1.0 / stream_tokens_per_second)
+            try:
+                yield event(dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+            except GeneratorExit:  # The client closed the stream
+                with lock:
+                    stats["streams_closed_early"] += 1
+                    stats["unsent_tokens"] += len(''.join(pieces[sent:])) // 4
+                raise
+        final = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if groq_style:
+            final['x_groq'] = {"usage": body.get('usage')}
+        yield event(final)
+        if include_usage:
+            yield event(dict(base, choices=[], usage=body.get('usage')))
+        yield "data: [DONE]\n\n"
+
+    def chat_completions():
+        payload = request_payload()
+        prompt_tokens = count_tokens(payload)
+        max_tokens = payload.get('max_tokens') or payload.get('max_completion_tokens') or 0
+        rejection, headers = admit(prompt_tokens + max_tokens)
+        if rejection:
+            return rejection
+
+        model = payload.get('model', 'fake-model')
+        with lock:
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+            weak = rng.random() < weak_rate
+        delay = model_samplers[model]() if model in model_samplers else sample_latency()
+        entry = replayed('chat', payload)
+        if entry:
+            time.sleep(delay)
+            status, body = entry['status'], entry['body']
+        elif record_dir:
+            status, body = forward('chat', payload)
+        else:
+            time.sleep(delay)
+            status = 200
+            text = generated_text(max_tokens)
+            if weak:
+                text = "I'm not sure."
+                with lock:
+                    stats["weak"] += 1
+            elif any(PAGE_DESCRIPTION_MARKER in (message.get('content') or '') for message in payload.get('messages', [])
+                   if message.get('role') == 'system'):
+                text += f"\n\n{PAGE_DESCRIPTION_MARKER}\n{json.dumps(FAKE_PAGE_DESCRIPTION)}"
+            completion = len(text) // 4
+            body = {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion,
+                    "total_tokens": prompt_tokens + completion,
+                },
+            }
+
+        if status == 200 and payload.get('stream'):
+            with lock:
+                stats["streamed"] += 1
+            include_usage = (payload.get('stream_options') or {}).get('include_usage')
+            response = Response(stream_completion(body, include_usage, request.path.startswith('/openai/')),
+                                mimetype='text/event-stream')
+            response.headers['Cache-Control'] = 'no-cache'
+        else:
+            response = jsonify(body)
+            response.status_code = status
+        response.headers.update(headers)
+        return response
+
+    def render_image(image_id):
+        _, _, size = image_id.partition('_')
+        width, _, height = size.partition('x')
+        digest = hashlib.sha256(image_id.encode('utf-8')).digest()
+        return solid_png(int(width or 256), int(height or 256), digest[:3])
+
+    def image_generations():
+        payload = request_payload()
+        rejection, headers = admit(0)
+        if rejection:
+            return rejection
+
+        entry = replayed('image', payload)
+        if entry:
+            status, body = entry['status'], entry['body']
+        elif record_dir:
+            status, body = forward('image', payload)
+        else:
+            time.sleep(sample_image_latency())
+            status = 200
+            size = payload.get('size') or '1024x1024'
+            data = []
+            for _ in range(payload.get('n') or 1):
+                image_id = f"{uuid.uuid4().hex[:12]}_{size}"
+                item = {"revised_prompt": payload.get('prompt', '')}
+                if payload.get('response_format') == 'b64_json':
+                    item['b64_json'] = base64.b64encode(render_image(image_id)).decode('ascii')
+                else:
+                    item['url'] = f"{request.host_url}fake-images/{image_id}.png"
+                data.append(item)
+            body = {"created": int(time.time()), "data": data}
+        with lock:
+            stats["images"] += 1
+
+        response = jsonify(body)
+        response.status_code = status
+        response.headers.update(headers)
+        return response
+
+    # OpenAI clients use <base>/v1/..., Groq clients use <base>/openai/v1/...
+    app.add_url_rule('/v1/chat/completions', 'openai_chat', chat_completions, methods=['POST'])
+    app.add_url_rule('/openai/v1/chat/completions', 'groq_chat', chat_completions, methods=['POST'])
+    app.add_url_rule('/v1/images/generations', 'openai_images', image_generations, methods=['POST'])
+    app.add_url_rule('/openai/v1/images/generations', 'groq_images', image_generations, methods=['POST'])
+
+    @app.route('/fake-images/<image_id>.png')
+    def fake_image(image_id):
+        if not re.fullmatch(r"[0-9a-f]{12}_\d{1,4}x\d{1,4}", image_id):
+            return error_response(404, "Image not found", "invalid_request_error", None)
+        return Response(render_image(image_id), mimetype='image/png')
+
+    @app.route('/stats')
+    def provider_stats():
+        return jsonify(stats)
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake OpenAI/Groq provider with rate limits and failure injection")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--rpm', type=int, default=60, help="requests per minute")
+    parser.add_argument('--tpm', type=int, default=30000, help="tokens per minute")
+    parser.add_argument('--latency', default='0.2', help='seconds per completion, or a distribution like "lognormal:0.3,0.5"')
+    parser.add_argument('--image-latency', default=None, help="latency spec for image generation (defaults to --latency)")
+    parser.add_argument('--seed', type=int, default=None, help="seed for latency distributions and injected failures")
+    parser.add_argument('--stream-tps', type=float, default=50, help="tokens per second when streaming (0 = unthrottled)")
+    parser.add_argument('--completion-tokens', type=int, default=120, help="length of generated completions")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a random 5xx")
+    parser.add_argument('--429-rate', dest='rate_limit_rate', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--fail-script', default=None, help="status codes for successive requests, e.g. 200,429,200,503")
+    parser.add_argument('--model-latency', default=None,
+                        help='per-model latency specs, e.g. "gpt-4.1-nano=0.1;gpt-4.1=lognormal:0.8,0.3"')
+    parser.add_argument('--weak-rate', type=float, default=0.0, help="share of completions that are one-line non-answers")
+    parser.add_argument('--record', metavar='DIR', help="forward to --upstream and save responses in DIR")
+    parser.add_argument('--replay', metavar='DIR', help="serve responses saved with --record")
+    parser.add_argument('--upstream', help="real provider base URL for --record, e.g. https://api.openai.com/v1")
+    args = parser.parse_args()
+    fail_script = [int(status) for status in args.fail_script.split(',')] if args.fail_script else None
+    model_latency = dict(part.split('=', 1) for part in args.model_latency.split(';') if part) if args.model_latency else None
+
+    print("\n" + "="*60)
+    print("🧪 FAKE AI PROVIDER STARTING")
+    print("="*60)
+    print(f"📏 Limits: {args.rpm} requests/min, {args.tpm} tokens/min")
+    print(f"⏱️  Latency: {args.latency} (seconds per completion), streaming at {args.stream_tps:g} tokens/s")
+    if args.error_rate or args.rate_limit_rate or fail_script:
+        print(f"💥 Failures: {args.error_rate:.0%} 5xx, {args.rate_limit_rate:.0%} 429" + (f", script {fail_script}" if fail_script else ""))
+    if args.record:
+        print(f"⏺️  Recording {args.upstream} responses to {args.record}")
+    if args.replay:
+        print(f"▶️  Replaying responses from {args.replay}")
+    print(f"🔗 OpenAI base URL: http://localhost:{args.port}/v1")
+    print(f"🔗 Groq base URL:   http://localhost:{args.port}")
+    print("="*60 + "\n")
+
+    create_fake_provider(args.rpm, args.tpm, args.latency, args.seed,
+                         stream_tokens_per_second=args.stream_tps, completion_tokens=args.completion_tokens,
+                         image_latency=args.image_latency, error_rate=args.error_rate,
+                         rate_limit_rate=args.rate_limit_rate, fail_script=fail_script,
+                         record_dir=args.record, replay_dir=args.replay, upstream=args.upstream,
+                         model_latency=model_latency, weak_rate=args.weak_rate,
+                         ).run(host='0.0.0.0', port=args.port, threaded=True)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+File Serving
+Sends stored files (uploaded PDFs, generated images) with byte-range and
+conditional-request support, so pdf.js can fetch only the parts of a PDF it
+needs and browsers can revalidate or skip re-downloading. Content-addressed
+names never change content, so they are marked immutable. The actual byte
+transfer can be handed to a front proxy with X-Accel-Redirect (nginx) or
+X-Sendfile (Apache/lighttpd).
+"""
+
+from flask import make_response, send_file
+import mimetypes
+import os
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+IMMUTABLE_MAX_AGE = 31536000  # One year, the usual "forever"
+
+# nginx `internal` location that maps onto the backend's working directory, e.g. /protected
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
+
+def send_stored_file(folder, filename, etag=None, immutable=False, download_name=None):
+    """Send folder/filename with Range, If-None-Match/If-Modified-Since and If-Range support
+
+    etag: strong validator to use instead of Werkzeug's mtime/size tag (e.g. the content hash)
+    immutable: the name is content-addressed, so caches may keep it without revalidating
+    download_name: send as an attachment with this file name
+    """
+    # Hidden files are in-progress uploads and session state, never served
+    path = safe_join(os.path.abspath(folder), filename)
+    if path is None or filename.startswith('.') or not os.path.isfile(path):
+        raise NotFound()
+
+    if X_ACCEL_REDIRECT_PREFIX:
+        # nginx streams the file (ranges and conditionals included); we only set the headers
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX}/{os.path.basename(folder)}/{filename}"
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if etag:
+            response.set_etag(etag)
+        if download_name:
+            response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    else:
+        # send_file honours app.config['USE_X_SENDFILE'] for Apache/lighttpd offload
+        response = send_file(path, etag=etag or True, conditional=True,
+                             as_attachment=bool(download_name), download_name=download_name)
+        # Werkzeug only adds this to 206 responses, but pdf.js looks for it on the first full one
+        response.headers['Accept-Ranges'] = 'bytes'
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # Always revalidate, but a matching ETag means a 304 instead of the whole file again
+        response.cache_control.no_cache = True
+    return response
+
+
+def configure_file_serving(app):
+    """Enable X-Sendfile when USE_X_SENDFILE=1; returns the offload in use (None = Flask sends files)"""
+    app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    if X_ACCEL_REDIRECT_PREFIX:
+        return 'X-Accel-Redirect'
+    return 'X-Sendfile' if app.config['USE_X_SENDFILE'] else None
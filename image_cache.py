@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Generated Image Cache
+Keeps DALL-E images on disk keyed by normalized description + class level,
+so repeated requests ("generate an image of a cat" for Class 6) are served
+from disk instead of paying for another generation. The index is a SQLite
+file in WAL mode, so every worker process sees the same entries, sizes and
+LRU order.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+TOUCH_INTERVAL = 60  # Seconds; last_used / hits are written at most this often per image, so hits rarely write
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    entry TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS images_last_used ON images (last_used);
+"""
+
+# Words that don't change what gets drawn ("a cat" == "the cat" == "cat")
+FILLER_WORDS = {'a', 'an', 'the', 'some', 'please'}
+
+# Requests for a fresh image instead of the cached one; anchored to the start of the message, so
+# questions that merely mention a variation ("explain genetic variation") are not taken for one
+VARIATION_PATTERN = re.compile(
+    r"^\W*(?:please\s+)?(?:(?:can|could|will)\s+you\s+)?(?:please\s+)?"
+    r"(?:try\s+again\b|regenerate\b"
+    r"|(?:(?:make|draw|generate|create|give|show)\s+)?(?:me\s+)?(?:an?\s+)?"
+    r"(?:another|new|different)\s+(?:version|image|picture|variation)\b)",
+    re.IGNORECASE)
+
+
+def wants_new_variation(message):
+    """Detect requests that explicitly ask for a new variation of an image"""
+    return bool(VARIATION_PATTERN.search(message or ''))
+
+
+def normalize_description(description):
+    """Normalize an image description so equivalent requests share a cache key"""
+    text = unicodedata.normalize('NFKC', description or '').lower()
+    text = VARIATION_PATTERN.sub(' ', text)
+    words = re.findall(r"[^\W_]+", text)
+    return ' '.join(word for word in words if word not in FILLER_WORDS)
+
+
+class ImageCache:
+    """Size-bounded on-disk image cache with a SQLite index and LRU eviction, shared by all workers"""
+
+    INDEX_FILE = 'index.sqlite3'
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending_hits = {}  # key -> hits not written yet (see TOUCH_INTERVAL)
+        os.makedirs(folder, exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        """Per-thread connection, reopened after a fork (connections must not cross processes)"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(os.path.join(self.folder, self.INDEX_FILE), isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    @staticmethod
+    def make_key(description, class_level):
+        normalized = normalize_description(description)
+        return hashlib.sha256(f"{class_level}|{normalized}".encode('utf-8')).hexdigest()[:24]
+
+    def get(self, description, class_level):
+        """Return the cached entry for this description/class, or None"""
+        key = self.make_key(description, class_level)
+        db = self._db()
+        row = db.execute("SELECT filename, last_used, hits, entry FROM images WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        filename, last_used, hits, entry = row
+        if not os.path.exists(os.path.join(self.folder, filename)):
+            db.execute("DELETE FROM images WHERE key = ? AND filename = ?", (key, filename))
+            return None
+        now = time.time()
+        with self._lock:
+            pending = self._pending_hits.pop(key, 0) + 1
+            if now - last_used <= TOUCH_INTERVAL:
+                self._pending_hits[key] = pending
+                pending = 0
+        if pending:
+            db.execute("UPDATE images SET last_used = ?, hits = hits + ? WHERE key = ?", (now, pending, key))
+        entry = json.loads(entry)
+        entry.update(last_used=max(now, last_used), hits=hits + pending)
+        return entry
+
+    def put(self, description, class_level, source_path, metadata=None):
+        """Copy a generated image into the cache and return its entry"""
+        key = self.make_key(description, class_level)
+        filename = f"{key}{os.path.splitext(source_path)[1] or '.png'}"
+        target_path = os.path.join(self.folder, filename)
+        temp_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, target_path)
+
+        entry = {
+            **(metadata or {}),
+            "filename": filename,
+            "description": description,
+            "normalized": normalize_description(description),
+            "class_level": str(class_level),
+            "size": os.path.getsize(target_path),
+            "created_at": time.time(),
+            "last_used": time.time(),
+            "hits": 0,
+        }
+        db = self._db()
+        # One write transaction, so concurrent workers keep the total under max_bytes
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO images (key, filename, size, last_used, hits, entry) VALUES (?, ?, ?, ?, 0, ?)",
+                       (key, filename, entry['size'], entry['last_used'], json.dumps(entry)))
+            evicted = self._evict(db)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        for victim in evicted:
+            try:
+                os.remove(os.path.join(self.folder, victim['filename']))
+            except FileNotFoundError:
+                pass
+            logger.info(f"🗑️ Evicted cached image: {victim['description'][:40]}")
+        return dict(entry)
+
+    def _evict(self, db):
+        """Remove least recently used images from the index until the cache fits max_bytes; returns their entries"""
+        excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0] - self.max_bytes
+        victims = []
+        for key, size, entry in db.execute("SELECT key, size, entry FROM images ORDER BY last_used"):
+            if excess <= 0:
+                break
+            victims.append((key, json.loads(entry)))
+            excess -= size
+        db.executemany("DELETE FROM images WHERE key = ?", [(key,) for key, _ in victims])
+        return [entry for _, entry in victims]
+
+    def stats(self):
+        entries, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images").fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
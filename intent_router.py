@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Intent Router
+Classifies a teacher's message (image, quiz, summary, translation, ...)
+and extracts the intent's argument in a single pass over the message.
+
+Trigger phrases are compiled into a word-level trie, so matching walks each
+word of the message once and costs the same whether 10 or 10,000 trigger
+phrases are registered (unlike looping re.search over a list of patterns).
+Templates starting with "^" only match at the start of the message, where
+a phrase is a request rather than part of a question ("sketch a volcano",
+not "how do I help students sketch maps").
+"""
+
+import itertools
+import re
+from collections import namedtuple
+
+WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+TEMPLATE_TOKEN = re.compile(r"\(([^)]*)\)|\[([^\]]*)\]|(\S+)")
+
+IntentMatch = namedtuple('IntentMatch', ['intent', 'argument', 'trigger', 'start', 'end'])
+
+# Key used inside trie nodes for the intent ending at that node
+_ACCEPT = object()
+
+
+def expand_template(template):
+    """Expand "generate (a|an) [new] image" into every literal word sequence"""
+    choices = []
+    for required, optional, literal in TEMPLATE_TOKEN.findall(template.lower()):
+        if required:
+            choices.append([alt.split() for alt in required.split('|')])
+        elif optional:
+            choices.append([alt.split() for alt in optional.split('|')] + [[]])
+        else:
+            choices.append([[literal]])
+    for combination in itertools.product(*choices):
+        yield tuple(word for part in combination for word in part)
+
+
+class IntentRouter:
+    """Word-trie matcher mapping trigger phrases to intents"""
+
+    def __init__(self):
+        self._trie = {}
+        self._start_trie = {}  # "^" templates: matched at the first word only
+        self._intents = {}
+        self.pattern_count = 0
+
+    def add_intent(self, name, triggers, fillers=(), priority=0):
+        """Register an intent with trigger templates and argument filler words
+
+        `fillers` are words stripped from the start of the argument
+        ("generate an image *of* a cat" -> "a cat"). Lower priority wins
+        when two intents match the same words.
+        """
+        self._intents[name] = {"fillers": set(fillers), "priority": priority}
+        for template in triggers:
+            for words in expand_template(template):
+                node = self._trie
+                if words[0] == '^':
+                    node, words = self._start_trie, words[1:]
+                for word in words:
+                    node = node.setdefault(word, {})
+                current = node.get(_ACCEPT)
+                if current is None or priority < self._intents[current]["priority"]:
+                    node[_ACCEPT] = name
+                self.pattern_count += 1
+        return self
+
+    def classify(self, message):
+        """Return the first (then longest) intent match in the message, or None"""
+        if not message:
+            return None
+        tokens = [(match.group().lower(), match.start(), match.end()) for match in WORD.finditer(message)]
+        for i in range(len(tokens)):
+            best = self._longest(self._trie, tokens, i)
+            if i == 0:
+                anchored = self._longest(self._start_trie, tokens, i)
+                if anchored and (not best or anchored[1] > best[1]):
+                    best = anchored
+            if best:
+                intent, j = best
+                start, end = tokens[i][1], tokens[j][2]
+                return IntentMatch(intent, self._argument(message, intent, tokens, i, j),
+                                   message[start:end], start, end)
+        return None
+
+    def _longest(self, trie, tokens, i):
+        """(intent, last token index) of the longest trigger in `trie` starting at token i, or None"""
+        node = trie
+        best = None
+        for j in range(i, len(tokens)):
+            node = node.get(tokens[j][0])
+            if node is None:
+                break
+            if _ACCEPT in node:
+                best = (node[_ACCEPT], j)
+        return best
+
+    def _argument(self, message, intent, tokens, first, last):
+        """Text after the trigger minus leading filler words (or the text before it)"""
+        fillers = self._intents[intent]["fillers"]
+        k = last + 1
+        while k < len(tokens) and tokens[k][0] in fillers:
+            k += 1
+        if k < len(tokens):
+            argument = message[tokens[k][1]:]
+        else:
+            argument = message[:tokens[first][1]]
+        return argument.strip(" \t\r\n:;,.!?-'\"“”‘’")
+
+
+# Polite openings allowed before a request ("Please ...", "Can you please ...")
+REQUEST_START = "^ [please] [can you|could you|will you] [please]"
+
+
+def build_default_router():
+    """Router with the intents the education assistant understands
+
+    Every trigger is anchored to the start of the message: the same words
+    inside a question ("how do I help students summarize?") are not a
+    request, and answering them with a canned task would ignore the question.
+    """
+    router = IntentRouter()
+    router.add_intent('image', [
+        f"{REQUEST_START} (generate|create|draw|make|show me) (a|an|another|new|one more) (image|picture|drawing|illustration)",
+        f"{REQUEST_START} (illustrate|visualize|visualise|sketch)",
+    ], fillers=['of', 'about', 'showing', 'depicting', 'for', 'that', 'shows'])
+    router.add_intent('quiz', [
+        f"{REQUEST_START} (create|make|generate|prepare|write|design|give me|set) (a|an) [short|quick|small|simple|class] (quiz|test|mcq test)",
+        f"{REQUEST_START} (create|make|generate|prepare|write|give me) [some|a few|five|ten|5|10] (quiz questions|mcqs|multiple choice questions)",
+        f"{REQUEST_START} quiz (me|the class|my students)",
+    ], fillers=['on', 'about', 'for', 'of', 'covering', 'from', 'based'])
+    router.add_intent('worksheet', [
+        f"{REQUEST_START} (create|make|generate|prepare|design|write|give me) (a|an) [practice|homework|simple|printable] (worksheet|activity sheet|exercise sheet)",
+        f"{REQUEST_START} (create|make|generate|prepare|design|write|give me) [some|a few] (practice|homework) (questions|exercises|problems)",
+    ], fillers=['on', 'about', 'for', 'of', 'covering', 'from', 'based'])
+    router.add_intent('summary', [
+        f"{REQUEST_START} (summarize|summarise|sum up)",
+        f"{REQUEST_START} (give me|write|make|create|prepare) (a|the) [short|brief|quick|simple] summary",
+    ], fillers=['of', 'on', 'for', 'about'])
+    router.add_intent('vocabulary', [
+        f"{REQUEST_START} (list|give me|show me|explain|find) [the|all|some] (key|important|new|difficult|hard) (words|vocabulary|terms)",
+        f"{REQUEST_START} [give me|make|create|write] [a|the] (key|important|new) vocabulary [list]",
+        f"{REQUEST_START} [give me|make|create|write] [a|the] vocabulary list",
+    ], fillers=['on', 'in', 'from', 'of', 'for', 'used'])
+    router.add_intent('translation', [
+        f"{REQUEST_START} translate",
+        "^ (how do you say|how to say|how do i say)",
+        f"{REQUEST_START} (give me|provide|write) [a|the] translation",
+    ], fillers=['this', 'these', 'word', 'words', 'sentence', 'text', 'of', 'for'])
+    return router
+
+
+# "... into Hindi", "... in Tamil: word" -> target language
+TRANSLATION_TARGET = re.compile(r"\b(?:into|to|in)\s+([A-Za-z]+)\s*(?:$|[:\-])", re.IGNORECASE)
+
+
+def intent_prompt(match, education_context):
+    """Extra instructions appended to the user prompt for text-based intents"""
+    class_level = education_context.get('class_level', '6')
+    student_lang = education_context.get('student_language', 'english').title()
+    if match.intent == 'quiz':
+        return (f"\n\nTASK: Create a short quiz for Class {class_level} on: {match.argument or 'the current page'}.\n"
+                "- 5 to 8 questions mixing multiple choice, true/false and one short answer\n"
+                "- Number the questions and give an answer key at the end\n"
+                f"- Add the key terms in {student_lang} where it helps understanding")
+    if match.intent == 'worksheet':
+        return (f"\n\nTASK: Create a printable worksheet for Class {class_level} on: {match.argument or 'the current page'}.\n"
+                "- A title, short instructions and 3 sections of increasing difficulty\n"
+                "- Use only materials available in a low-resource classroom (paper, pencil, blackboard)\n"
+                "- Include an answer key for the teacher at the end")
+    if match.intent == 'summary':
+        return (f"\n\nTASK: Summarize {match.argument or 'the current page'} for Class {class_level}.\n"
+                "- 4 to 6 short bullet points covering the main ideas, in the order they appear\n"
+                "- One sentence the teacher can use to introduce the topic to the class")
+    if match.intent == 'vocabulary':
+        return (f"\n\nTASK: List the key vocabulary of {match.argument or 'the current page'} for Class {class_level}.\n"
+                "- 6 to 10 words or terms, each with a one-line meaning a student would understand\n"
+                f"- Give each word in {student_lang} too, with a simple example sentence")
+    if match.intent == 'translation':
+        text = match.argument or ''
+        target = TRANSLATION_TARGET.search(text)
+        language = student_lang
+        if target:
+            language = target.group(1).title()
+            text = (text[:target.start()] + text[target.end():]).strip(" :;,.-")
+        return (f"\n\nTASK: Translate the following into {language}: {text or 'the key words on the current page'}\n"
+                "- Give the translation first, then a simple pronunciation guide\n"
+                f"- Add one example sentence a Class {class_level} student would understand")
+    return ""
+
+
+# Shared router instance used by the backends
+default_router = build_default_router()
+
+
+def classify_intent(message):
+    """Classify a message with the default router"""
+    return default_router.classify(message)
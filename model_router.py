@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Model Router
+Sends each chat request to one of a provider's model tiers (fast, standard,
+strong) instead of always the same model. A request is scored from the
+length of the message, its intent, whether a page image goes with it and
+the class level; low scores go to the cheap fast tier, high ones to the
+strong tier, and image requests skip tiers without vision. When a cheaper
+tier's answer fails a quality check (empty, cut off, a refusal, too short)
+the request can be escalated to the next tier. Each tier has its own rate
+limiter, since providers count limits per model.
+
+Tiers come from a spec like "fast=gpt-4.1-nano,standard=gpt-4.1-mini,strong=gpt-4.1".
+"""
+
+from collections import namedtuple
+import re
+import threading
+from rate_limiter import ProviderRateLimiter
+
+ModelTier = namedtuple('ModelTier', ['name', 'model', 'vision', 'input_price', 'output_price'])
+
+# Known models: (vision, USD per 1M input tokens, USD per 1M output tokens)
+MODEL_INFO = {
+    'gpt-4.1-nano': (True, 0.10, 0.40),
+    'gpt-4.1-mini': (True, 0.40, 1.60),
+    'gpt-4.1': (True, 2.00, 8.00),
+    'gpt-4o-mini': (True, 0.15, 0.60),
+    'gpt-4o': (True, 2.50, 10.00),
+    'llama-3.1-8b-instant': (False, 0.05, 0.08),
+    'llama-3.3-70b-versatile': (False, 0.59, 0.79),
+    'meta-llama/llama-4-scout-17b-16e-instruct': (True, 0.11, 0.34),
+    'meta-llama/llama-4-maverick-17b-128e-instruct': (True, 0.20, 0.60),
+}
+
+# Multi-part planning requests go to the strong tier whatever their length
+PLANNING_REQUEST = re.compile(
+    r"\b(?:unit|lesson|week(?:ly)?|term|annual|year)\s+plans?\b|\b\d+[- ](?:day|week|lesson)s?\b"
+    r"|\bcurriculum\b|\brubrics?\b|\bscheme\s+of\s+work\b",
+    re.IGNORECASE)
+# Requests that need some reasoning
+REASONING_REQUEST = re.compile(
+    r"\bdifferentiat\w*|\bstep[- ]by[- ]step\b|\bcompare\b|\bwhy\b|\bin\s+detail\b|\bmisconceptions?\b",
+    re.IGNORECASE)
+SIMPLE_INTENTS = {'translation', 'vocabulary'}
+DETAILED_INTENTS = {'quiz', 'worksheet'}
+STANDARD_SCORE = 2  # Scores from here go to the standard tier
+STRONG_SCORE = 4  # ... and from here to the strong tier
+
+REFUSAL = re.compile(r"^\W*(?:i'?m sorry|i am sorry|sorry,|i cannot|i can'?t|i'?m not sure|as an ai)\b", re.IGNORECASE)
+MIN_ANSWER_WORDS = 40
+MIN_TRANSLATION_WORDS = 3
+
+
+def parse_tiers(spec):
+    """[ModelTier, ...] cheapest first from "name=model,name=model" (unknown models count as vision-capable)"""
+    tiers = []
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        name, _, model = part.partition('=')
+        if not model.strip():
+            raise ValueError(f"Model tier '{part.strip()}' needs the form name=model")
+        vision, input_price, output_price = MODEL_INFO.get(model.strip(), (True, None, None))
+        tiers.append(ModelTier(name.strip(), model.strip(), vision, input_price, output_price))
+    return tiers
+
+
+def request_score(message, intent=None, has_image=False, class_level=None):
+    """How demanding a request is: 0-1 simple, 2-3 standard, 4+ hard (see STANDARD_SCORE / STRONG_SCORE)"""
+    words = len((message or '').split())
+    score = 1 if words > 20 else 0
+    score += 1 if words > 60 else 0
+    if intent in DETAILED_INTENTS:
+        score += 1
+    elif intent in SIMPLE_INTENTS:
+        score -= 1
+    if PLANNING_REQUEST.search(message or ''):
+        score += STRONG_SCORE
+    elif REASONING_REQUEST.search(message or ''):
+        score += 1
+    if has_image:
+        score += 2  # Reading a page image well takes at least the standard model
+    try:
+        level = int(class_level)
+    except (TypeError, ValueError):
+        level = 0
+    score += (level >= 9) + (level >= 11)
+    return max(0, score)
+
+
+def weak_answer(text, finish_reason=None, intent=None):
+    """Why an answer looks too weak to send (worth escalating), or None"""
+    text = (text or '').strip()
+    if not text:
+        return "empty answer"
+    if finish_reason == 'length':
+        return "cut off at max_tokens"
+    if REFUSAL.search(text):
+        return "refusal"
+    if len(text.split()) < (MIN_TRANSLATION_WORDS if intent == 'translation' else MIN_ANSWER_WORDS):
+        return "too short"
+    return None
+
+
+class ModelRouter:
+    """Picks a tier per request, escalates weak answers and keeps per-tier numbers"""
+
+    def __init__(self, name, tiers, escalate=True, limiters=None):
+        """`limiters` maps models to existing rate limiters (the provider's own for its default model)"""
+        if not tiers:
+            raise ValueError("At least one model tier is needed")
+        self.name = name
+        self.tiers = tiers
+        self.escalate = escalate
+        self._lock = threading.Lock()
+        self._limiters = dict(limiters or {})
+        self.stats = {tier.name: {"model": tier.model, "requests": 0, "escalated": 0, "seconds": 0.0,
+                                  "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0} for tier in tiers}
+
+    def choose(self, score=None, has_image=False):
+        """Index of the tier for a request score (the middle tier if unscored), vision tiers only with an image"""
+        level = 1 if score is None else (score >= STANDARD_SCORE) + (score >= STRONG_SCORE)  # 0 fast, 1 standard, 2 strong
+        index = int(level * (len(self.tiers) - 1) / 2 + 0.5)
+        return self._usable(index, has_image)
+
+    def _usable(self, index, has_image):
+        for candidate in range(index, len(self.tiers)):
+            if self.tiers[candidate].vision or not has_image:
+                return candidate
+        for candidate in range(index - 1, -1, -1):
+            if self.tiers[candidate].vision:
+                return candidate
+        return index
+
+    def next_tier(self, index, has_image=False):
+        """Tier to escalate to after a weak answer from tier `index`, or None"""
+        if not self.escalate or index + 1 >= len(self.tiers):
+            return None
+        candidate = self._usable(index + 1, has_image)
+        return candidate if candidate > index else None
+
+    def rate_limiter(self, tier):
+        """Rate limiter for a tier's model, created on first use"""
+        with self._lock:
+            limiter = self._limiters.get(tier.model)
+            if limiter is None:
+                limiter = ProviderRateLimiter(f"{self.name} {tier.model}")
+                self._limiters[tier.model] = limiter
+            return limiter
+
+    def cost(self, tier, prompt_tokens, completion_tokens):
+        """USD cost of one call at the tier's prices (None for unknown models)"""
+        if tier.input_price is None:
+            return None
+        return (prompt_tokens * tier.input_price + completion_tokens * tier.output_price) / 1e6
+
+    def record(self, tier, seconds, prompt_tokens=0, completion_tokens=0, escalated=False):
+        """Count one call; returns its cost"""
+        cost = self.cost(tier, prompt_tokens, completion_tokens)
+        with self._lock:
+            stats = self.stats[tier.name]
+            stats["requests"] += 1
+            stats["escalated"] += int(escalated)
+            stats["seconds"] += seconds
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += cost or 0.0
+        return cost
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {key: round(value, 6) if isinstance(value, float) else value for key, value in stats.items()}
+                    for name, stats in self.stats.items()}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Notes Export
+Builds the "Download Notes" PDF on the server: canvas notes (question,
+formatted answer, generated image) are laid out as real text with
+fitz.Story instead of being screenshotted with html2canvas in the browser.
+Exports are keyed by a hash of their content and built on a background
+worker; the client polls until the PDF is ready, and exporting the same
+notes again (on the same day, which the footer shows) is served straight
+from the cache. Job status is a marker file next to the cached PDFs, so a
+poll answered by another worker process sees it too.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import hashlib
+import html
+from io import BytesIO
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger(__name__)
+
+EXPORT_VERSION = 1  # Bump when the layout changes so cached exports are rebuilt
+MAX_NOTES = 200
+MAX_NOTE_CHARS = 100000
+JOB_TIMEOUT = 10 * 60  # Seconds before a pending export whose worker died may be started again
+JOB_TTL = 24 * 60 * 60  # Failed exports are forgotten after a day
+
+PAGE_MARGIN = 48  # Points
+NOTES_CSS = """
+body { font-family: sans-serif; font-size: 11pt; line-height: 1.4; color: #333333; }
+h1 { font-size: 20pt; color: #2c3e50; text-align: center; margin-bottom: 16pt; }
+h2 { font-size: 13pt; color: #495057; margin-top: 18pt; margin-bottom: 6pt; }
+.question { background-color: #e3f2fd; padding: 6pt; margin-bottom: 6pt; }
+.answer { padding: 6pt; }
+.image-description { font-size: 9pt; color: #666666; font-style: italic; text-align: center; }
+.image { text-align: center; margin-top: 6pt; }
+.footer { font-size: 8pt; color: #6c757d; text-align: center; margin-top: 24pt; }
+"""
+
+# Answers are our own markdown-rendered HTML; drop anything that isn't layout
+UNSAFE_HTML = re.compile(r'<(script|style|iframe|object)\b.*?</\1\s*>|<(?:link|meta|base)\b[^>]*>',
+                         re.IGNORECASE | re.DOTALL)
+EXPORT_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+class ExportError(Exception):
+    """Invalid export request; carries the HTTP status to return"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def clean_answer_html(response):
+    return UNSAFE_HTML.sub('', response or '')
+
+
+class NotesExporter:
+    """Content-hash cached, worker-built PDF exports of canvas notes"""
+
+    def __init__(self, cache, image_folders):
+        self.cache = cache  # page_render.RenderCache with suffix='.pdf'
+        self.image_folders = image_folders  # URL prefix -> folder, e.g. {'temp_images': 'temp_images'}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notes-export')
+
+    def _image_path(self, image_url):
+        """Local file behind a generated-image URL of this backend, or None (remote URLs are never fetched)"""
+        if not image_url:
+            return None
+        parts = urlparse(image_url).path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] not in self.image_folders or secure_filename(parts[1]) != parts[1]:
+            return None
+        path = os.path.join(self.image_folders[parts[0]], parts[1])
+        return path if os.path.isfile(path) else None
+
+    def _normalize(self, items):
+        if not isinstance(items, list) or not items:
+            raise ExportError("No notes to export")
+        if len(items) > MAX_NOTES:
+            raise ExportError(f"Too many notes (maximum {MAX_NOTES})", 413)
+        notes = []
+        for item in items:
+            if not isinstance(item, dict):
+                raise ExportError("Each note must be an object")
+            note = {key: str(item.get(key) or '')[:MAX_NOTE_CHARS]
+                    for key in ('question', 'response', 'timestamp', 'image_description')}
+            image_path = self._image_path(item.get('image_url'))
+            note['image'] = None
+            if image_path:
+                stat = os.stat(image_path)
+                note['image'] = {"path": image_path, "name": os.path.basename(image_path),
+                                 "version": f"{stat.st_size}-{int(stat.st_mtime)}"}
+            notes.append(note)
+        return notes
+
+    def _job_path(self, export_id):
+        return os.path.join(self.cache.folder, f"{export_id}.job.json")
+
+    def _load_job(self, export_id):
+        """{"status": "pending" | "failed", "error", "started_at"} of an unfinished export, or None"""
+        try:
+            with open(self._job_path(export_id), 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        age = time.time() - job.get('started_at', 0)
+        if age > (JOB_TIMEOUT if job.get('status') == 'pending' else JOB_TTL):
+            return None
+        return job
+
+    def _save_job(self, export_id, job):
+        fd, temp_path = tempfile.mkstemp(dir=self.cache.folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(temp_path, self._job_path(export_id))
+
+    def _drop_job(self, export_id):
+        try:
+            os.remove(self._job_path(export_id))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def export_id(notes, title, day):
+        """Content hash of everything that ends up in the PDF"""
+        payload = {"version": EXPORT_VERSION, "title": title, "date": day, "notes": [
+            {**note, "image": note['image'] and [note['image']['name'], note['image']['version']]}
+            for note in notes]}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+    def submit(self, items, title='AI Education Assistant - Notes'):
+        """Start (or reuse) an export; returns its status"""
+        notes = self._normalize(items)
+        title = str(title)[:200]
+        day = date.today().isoformat()
+        export_id = self.export_id(notes, title, day)
+        with self._lock:
+            if self.cache.get(export_id):
+                return {"export_id": export_id, "status": "ready"}
+            job = self._load_job(export_id)
+            if job and job['status'] == 'pending':
+                return {"export_id": export_id, "status": "pending"}
+            self._save_job(export_id, {"status": "pending", "started_at": time.time()})
+        self._executor.submit(self._build, export_id, notes, title, day)
+        return {"export_id": export_id, "status": "pending"}
+
+    def status(self, export_id):
+        """Status of an export, or None if it is unknown"""
+        if not EXPORT_ID_PATTERN.fullmatch(export_id):
+            return None
+        if self.cache.get(export_id):
+            return {"export_id": export_id, "status": "ready"}
+        job = self._load_job(export_id)
+        if not job:
+            return None
+        job.pop('started_at', None)
+        return {"export_id": export_id, **job}
+
+    def path(self, export_id):
+        """Path of a finished export, or None"""
+        return self.cache.get(export_id) if EXPORT_ID_PATTERN.fullmatch(export_id) else None
+
+    def _build(self, export_id, notes, title, day):
+        try:
+            data = self.render(notes, title, day)
+            self.cache.put(export_id, data)
+            self._drop_job(export_id)
+            logger.info(f"📄 Exported {len(notes)} note(s) to PDF ({len(data) // 1024}KB)")
+        except Exception as e:
+            logger.error(f"❌ Notes export failed: {str(e)}")
+            self._save_job(export_id, {"status": "failed", "error": str(e), "started_at": time.time()})
+
+    @staticmethod
+    def render(notes, title, day):
+        """Lay the notes out as a vector PDF and return its bytes"""
+        import fitz  # PyMuPDF for PDF processing
+        archive = fitz.Archive()
+        parts = [f"<h1>{html.escape(title)}</h1>"]
+        for index, note in enumerate(notes, 1):
+            header = f"Note {index}" + (f" - {html.escape(note['timestamp'])}" if note['timestamp'] else '')
+            parts.append(f"<h2>{header}</h2>")
+            parts.append(f"<div class='question'><b>Q:</b> {html.escape(note['question'])}</div>")
+            parts.append(f"<div class='answer'><b>A:</b> {clean_answer_html(note['response'])}</div>")
+            if note['image']:
+                with open(note['image']['path'], 'rb') as f:
+                    archive.add((f.read(), note['image']['name']))
+                if note['image_description']:
+                    parts.append(f"<p class='image-description'><b>Generated Image:</b> "
+                                 f"{html.escape(note['image_description'])}</p>")
+                parts.append(f"<div class='image'><img src='{note['image']['name']}' width='320'/></div>")
+        parts.append(f"<p class='footer'>Generated on {day} | "
+                     f"AI Education Assistant</p>")
+
+        story = fitz.Story(''.join(parts), user_css=NOTES_CSS, archive=archive)
+        mediabox = fitz.paper_rect('a4')
+        where = mediabox + (PAGE_MARGIN, PAGE_MARGIN, -PAGE_MARGIN, -PAGE_MARGIN)
+        buffer = BytesIO()
+        writer = fitz.DocumentWriter(buffer)
+        more = True
+        while more:
+            device = writer.begin_page(mediabox)
+            more, _ = story.place(where)
+            story.draw(device)
+            writer.end_page()
+        writer.close()
+
+        # Story embeds whole fallback fonts (e.g. Devanagari); keep only the glyphs used
+        with fitz.open('pdf', buffer.getvalue()) as doc:
+            doc.subset_fonts()
+            return doc.tobytes(garbage=3, deflate=True)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Page Artifacts
+Teachers ask the same few things about most pages: a summary, the key
+vocabulary and a quick quiz. With PREGENERATE_ARTIFACTS=1 these are
+generated for every page of a document in the background once it is first
+chatted about or viewed over the chat socket (they are written for that
+class and its languages, which the upload doesn't carry) and stored in the
+document index, so a matching chat message ("summarize this page", "create
+a quiz") is answered instantly.
+
+The work runs on one low-priority thread that yields to interactive
+traffic: it waits until no /api/chat request has been running for
+IDLE_SECONDS, and its provider calls only use spare rate-limit budget
+(ProviderRateLimiter's `reserve`), never overtaking a waiting chat request.
+"""
+
+from collections import deque, namedtuple
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The request each artifact answers, phrased the way a teacher would ask it
+ARTIFACT_REQUESTS = {
+    'summary': "Summarize this page",
+    'vocabulary': "List the key vocabulary on this page",
+    'quiz': "Create a quick quiz on this page",
+}
+# Arguments that mean "the current page" ("this page", "the lesson", nothing at all)
+CURRENT_PAGE_ARGUMENT = re.compile(
+    r"(?:(?:on|of|for|from|about|in)\s+)?(?:(?:this|the|current)\s+)?(?:page|text|lesson|chapter)?",
+    re.IGNORECASE)
+
+IDLE_SECONDS = 2.0  # Chat must have been quiet this long before a background call starts
+RETRY_SECONDS = 15.0  # Wait before retrying when there is no spare budget (or the index isn't ready)
+PRIORITY = 1  # Rate limiter priority of background calls (chat uses 0, which goes first)
+QUOTA_RESERVE = 0.5  # Share of each provider limit background calls leave for chat
+MAX_WAIT = 5.0  # Seconds a background call waits for spare budget before giving the worker back
+MAX_PAGES = 30  # Pages per document that get artifacts
+MAX_ATTEMPTS = 3  # Failed generations of one artifact before it is dropped
+
+ArtifactJob = namedtuple('ArtifactJob', ['doc_id', 'page_no', 'kind', 'variant', 'path', 'education_context'])
+
+
+def artifact_kind(intent, message):
+    """Artifact a classified message asks for about the current page, or None
+
+    Only a message that is nothing but the request ("Please summarize this
+    page") gets an artifact; anything more is for the model to answer.
+    """
+    if (intent and intent.intent in ARTIFACT_REQUESTS and not message[:intent.start].strip()
+            and CURRENT_PAGE_ARGUMENT.fullmatch(intent.argument or '')):
+        return intent.intent
+    return None
+
+
+def artifact_variant(education_context):
+    """Artifacts depend on the class and languages they were written for"""
+    return '|'.join(str(education_context.get(key, '')) for key in
+                    ('class_level', 'class_strength', 'teacher_language', 'student_language'))
+
+
+class ArtifactWorker:
+    """Single background thread generating queued artifacts while chat is idle
+
+    `generate(job)` returns True when the job is done (or not needed),
+    False to retry it later (no spare budget, document not indexed yet),
+    and raises when it failed.
+    """
+
+    def __init__(self, generate, idle_seconds=IDLE_SECONDS, retry_seconds=RETRY_SECONDS):
+        self._generate = generate
+        self.idle_seconds = idle_seconds
+        self.retry_seconds = retry_seconds
+        self._condition = threading.Condition()
+        self._jobs = deque()
+        self._queued = set()
+        self._outstanding = {}  # (doc_id, variant) -> its jobs still queued, so repeat messages cost nothing
+        self._attempts = {}
+        self._active = 0  # Interactive requests in progress
+        self._last_active = 0.0
+        self._thread = None
+        self.stats = {"completed": 0, "failed": 0, "deferred": 0}
+
+    def interactive_started(self):
+        with self._condition:
+            self._active += 1
+
+    def interactive_finished(self):
+        with self._condition:
+            self._active = max(0, self._active - 1)
+            self._last_active = time.monotonic()
+            self._condition.notify_all()
+
+    def submit(self, doc_id, path, page_count, education_context, first_page=1):
+        """Queue every artifact of a document's pages, starting from the page being viewed"""
+        variant = artifact_variant(education_context)
+        with self._condition:
+            if (doc_id, variant) in self._outstanding:
+                return
+            pages = range(1, min(page_count or 0, MAX_PAGES) + 1)
+            for page_no in sorted(pages, key=lambda page: (page < first_page, page)):
+                for kind in ARTIFACT_REQUESTS:
+                    job = ArtifactJob(doc_id, page_no, kind, variant, path, dict(education_context))
+                    if job[:4] not in self._queued:
+                        self._queued.add(job[:4])
+                        self._jobs.append(job)
+                        self._outstanding[(doc_id, variant)] = self._outstanding.get((doc_id, variant), 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='page-artifacts', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _next_job(self):
+        """Wait for a job and for chat to be idle; the job stays queued until it is done"""
+        with self._condition:
+            while True:
+                if not self._jobs:
+                    self._condition.wait()
+                    continue
+                quiet = time.monotonic() - self._last_active
+                if self._active or quiet < self.idle_seconds:
+                    self._condition.wait(None if self._active else self.idle_seconds - quiet)
+                    continue
+                return self._jobs[0]
+
+    def _finish(self, job):
+        """Drop a job that is done or failed for good; its document/class can be submitted again once none are left"""
+        with self._condition:
+            if self._jobs and self._jobs[0] is job:
+                self._jobs.popleft()
+            self._queued.discard(job[:4])
+            self._attempts.pop(job[:4], None)
+            key = (job.doc_id, job.variant)
+            self._outstanding[key] = self._outstanding.get(key, 1) - 1
+            if self._outstanding[key] <= 0:
+                del self._outstanding[key]
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            try:
+                done = self._generate(job)
+            except Exception as e:
+                attempts = self._attempts.get(job[:4], 0) + 1
+                self._attempts[job[:4]] = attempts
+                logger.warning(f"⚠️ Pre-generating the {job.kind} of page {job.page_no} failed ({str(e)})")
+                if attempts >= MAX_ATTEMPTS:
+                    self.stats["failed"] += 1
+                    self._finish(job)
+                else:
+                    time.sleep(self.retry_seconds)
+                continue
+            if done:
+                self.stats["completed"] += 1
+                self._finish(job)
+            else:
+                self.stats["deferred"] += 1
+                time.sleep(self.retry_seconds)
+
+    def snapshot(self):
+        with self._condition:
+            return {"queued": len(self._jobs), "interactive": self._active, **self.stats}
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Page Descriptions
+The first chat message about a page sends its image; the model is asked to
+append a compact structured description of the page (text, figures,
+tables) after its answer. The description is split off the answer, stored
+in the document index, and later questions about the same page send it as
+text instead of the image, unless the teacher asks to look at the page
+again (or selects a region / asks about a figure, which sends a crop).
+"""
+
+import json
+import re
+
+DESCRIPTION_MARKER = "===PAGE DESCRIPTION==="
+DESCRIPTION_TOKENS = 500  # Extra completion tokens allowed for the description
+MAX_DESCRIPTION_ITEMS = 12  # Figures/tables kept per page
+MAX_DESCRIPTION_CHARS = 4000  # Stored description text, so follow-up prompts stay small
+
+DESCRIPTION_INSTRUCTION = f"""
+PAGE DESCRIPTION:
+After your answer, add a line containing only {DESCRIPTION_MARKER} followed by one line of JSON describing the attached page for later questions (the teacher does not see it):
+{{"text": "the page's headings and key sentences, condensed", "figures": ["what each figure or diagram shows, with its labels"], "tables": ["each table's columns and main rows"]}}
+Keep it under 250 words and use empty lists when there are no figures or tables.
+"""
+
+# Follow-ups asking for the page image itself rather than the stored description
+LOOK_AGAIN = re.compile(
+    r"\b(?:look|check|see|read)\s+(?:at\s+)?(?:the\s+|this\s+)?(?:page|image|picture|scan)\s+again\b"
+    r"|\b(?:look|check)\s+(?:again|closer|more\s+closely|carefully)\b"
+    r"|\b(?:re-?send|show\s+you)\s+(?:the\s+|this\s+)?(?:page|image)\b|\bzoom\s+in\b",
+    re.IGNORECASE)
+
+
+def wants_page_image(message):
+    """Detect follow-ups that ask the model to look at the page image again"""
+    return bool(LOOK_AGAIN.search(message or ''))
+
+
+def split_description(text):
+    """(answer, description dict or None) from a response that may end with a page description"""
+    if not text or DESCRIPTION_MARKER not in text:
+        return text, None
+    answer, _, tail = text.partition(DESCRIPTION_MARKER)
+    return answer.rstrip(), parse_description(tail)
+
+
+def parse_description(value):
+    """Normalized {"text", "figures", "tables"} from the model's JSON (code fences tolerated), or None"""
+    start, end = value.find('{'), value.rfind('}')
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(value[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    def items(key):
+        values = data.get(key) or []
+        if isinstance(values, str):
+            values = [values]
+        return [str(item).strip() for item in values if str(item).strip()][:MAX_DESCRIPTION_ITEMS]
+
+    description = {"text": str(data.get('text') or '').strip(), "figures": items('figures'), "tables": items('tables')}
+    if not any(description.values()):
+        return None
+    return description
+
+
+def format_description(description):
+    """Description as the plain text sent with follow-up questions"""
+    lines = []
+    if description.get('text'):
+        lines.append(f"Text: {description['text']}")
+    for key, label in (('figures', 'Figures'), ('tables', 'Tables')):
+        if description.get(key):
+            lines.append(f"{label}:")
+            lines.extend(f"- {item}" for item in description[key])
+    return '\n'.join(lines)[:MAX_DESCRIPTION_CHARS]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Page Regions
+Finds the part of a PDF page a question is about, so only that part is
+rendered and sent as an image (with the page's text sent as plain text)
+instead of the whole 200 DPI page. The region is either the teacher's
+selection in the viewer, given as fractions of the page, or the page's
+figures: embedded images and clusters of vector drawings found by
+PyMuPDF, merged into one box.
+"""
+
+import re
+
+# Questions about a figure already on the page ("this diagram", "the map above", "fig. 3.2") rather than the
+# whole page; a bare mention ("what is a map?", "draw an image of ...") is not one
+FIGURE_NOUNS = r"(?:diagram|figure|graph|chart|map|picture|illustration|drawing|image|photo|table|flowchart)s?"
+FIGURE_QUESTION = re.compile(
+    r"\b(?:this|that|these|those|the)\s+(?:(?:above|below|following|given|first|second|last)\s+)?"
+    rf"{FIGURE_NOUNS}\b(?!\s+of\s+contents)"
+    r"|\b(?:fig\.?|figure|table|diagram|map|chart|graph)\s*\d+(?:\.\d+)*\b",
+    re.IGNORECASE)
+
+MIN_REGION = 0.02  # Smallest selection side, as a fraction of the page
+MIN_FIGURE_AREA = 0.01  # Images/drawings smaller than this share of the page are decoration, not figures
+MAX_FIGURE_COVERAGE = 0.6  # If the figures cover more of the page than this, send the whole page
+FIGURE_MARGIN = 6  # Points added around detected figures (labels sit right next to them)
+
+
+def asks_about_figure(message):
+    return bool(FIGURE_QUESTION.search(message or ''))
+
+
+def parse_region(value):
+    """(x0, y0, x1, y1) fractions of the page from "x0,y0,x1,y1"; None if empty
+
+    Raises ValueError for anything that isn't a box inside the page.
+    """
+    if not value:
+        return None
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("region needs four numbers: x0,y0,x1,y1")
+    x0, y0, x1, y1 = parts
+    if not (0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1):
+        raise ValueError("region must be fractions of the page with x0 < x1 and y0 < y1")
+    if x1 - x0 < MIN_REGION or y1 - y0 < MIN_REGION:
+        raise ValueError("region is too small")
+    return x0, y0, x1, y1
+
+
+def region_rect(page, region):
+    """Page rectangle of a fractional region"""
+    import fitz  # PyMuPDF for PDF processing
+    rect = page.rect
+    x0, y0, x1, y1 = region
+    return fitz.Rect(rect.x0 + x0 * rect.width, rect.y0 + y0 * rect.height,
+                     rect.x0 + x1 * rect.width, rect.y0 + y1 * rect.height)
+
+
+def figure_rect(page):
+    """Box around the page's figures, or None if it has none (or they fill most of the page)"""
+    import fitz  # PyMuPDF for PDF processing
+    rect = page.rect
+    page_area = (rect.width * rect.height) or 1.0
+    boxes = [fitz.Rect(info['bbox']) for info in page.get_image_info()]
+    boxes += page.cluster_drawings()
+    figures = fitz.Rect()
+    for box in boxes:
+        box &= rect
+        if not box.is_empty and box.width * box.height >= MIN_FIGURE_AREA * page_area:
+            figures |= box
+    if figures.is_empty or figures.width * figures.height > MAX_FIGURE_COVERAGE * page_area:
+        return None
+    return (figures + (-FIGURE_MARGIN, -FIGURE_MARGIN, FIGURE_MARGIN, FIGURE_MARGIN)) & rect
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Page Rendering
+Server-side rendering of PDF pages into WebP tiles for the viewer, so
+low-end tablets download only the pixels they display instead of parsing
+the whole PDF with pdf.js. Tiles are TILE_SIZE squares of the page at a
+quantized zoom level; rendered tiles are kept in a size-bounded on-disk
+cache keyed by document hash, page, zoom and tile position, which never
+changes for a given document. Also builds the page image sent with chat
+messages: rendered at a DPI chosen from the page's size and small-text
+size within a pixel budget (oversized pages are split into a few tiles),
+encoded straight from the pixmap by MuPDF (Pillow only for WebP) and
+wrapped into a base64 data URL without intermediate copies. PyMuPDF and
+Pillow are imported on first render, not at startup.
+"""
+
+import binascii
+from collections import namedtuple
+from io import BytesIO
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 512  # Pixels per tile side
+ZOOM_STEP = 0.25  # Zoom levels match the viewer's zoom buttons
+MIN_ZOOM = 0.25
+MAX_ZOOM = 4.0
+WEBP_QUALITY = 80
+RENDER_VERSION = 1  # Bump when rendering changes so cached tiles (and ETags) change too
+PAGE_IMAGE_FORMATS = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+JPEG_QUALITY = 85
+BASE64_CHUNK = 3 * 64 * 1024  # Bytes encoded per step; a multiple of 3 so the pieces join without padding
+
+# Chat page images: OpenAI scales "high" detail images down to 768px on the short side, so a page sent
+# bigger than about 768x1024 only costs upload and encoding time
+PAGE_PIXEL_BUDGET = 768 * 1024  # Pixels per image sent; also caps the memory of one render (3 bytes/pixel)
+MAX_PAGE_TILES = 4  # Images per page at most; beyond that the DPI goes down instead
+TEXT_PIXELS = 12  # Height in pixels the page's small text gets (a 10pt font -> 86 DPI)
+MIN_PAGE_DPI = 72
+MAX_PAGE_DPI = 200
+FONT_PERCENTILE = 0.05  # Share of the smallest characters (footnotes, superscripts) not worth extra DPI
+TILE_OVERLAP = 12  # Points shared by neighbouring tiles, so a line cut by a tile edge is whole in one of them
+CACHE_RESCAN_SECONDS = 30  # How stale a RenderCache's view of other workers' files may get before eviction
+
+PageImage = namedtuple('PageImage', ['data_url', 'width', 'height', 'mime', 'size'])
+RenderPlan = namedtuple('RenderPlan', ['dpi', 'tiles'])  # tiles: page rectangles, one image each
+
+
+def pixmap_to_webp(pix, quality=WEBP_QUALITY):
+    """Encode a PyMuPDF pixmap as WebP (MuPDF itself can't write WebP)"""
+    from PIL import Image
+    mode = 'RGBA' if pix.alpha else 'RGB'
+    image = Image.frombytes(mode, (pix.width, pix.height), pix.samples_mv)  # samples_mv: no copy of the pixels
+    buffer = BytesIO()
+    image.save(buffer, format='WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def encode_pixmap(pix, image_format='png'):
+    """Encode a pixmap in the target format straight from MuPDF's buffer (no PIL decode/re-encode)"""
+    if image_format == 'png':
+        return pix.tobytes('png')
+    if image_format == 'jpeg':
+        return pix.tobytes('jpeg', jpg_quality=JPEG_QUALITY)
+    if image_format == 'webp':
+        return pixmap_to_webp(pix)
+    raise ValueError(f"Unsupported page image format: {image_format}")
+
+
+def data_url(data, mime):
+    """base64 data URL of data, written into one preallocated buffer
+
+    Encoding in chunks keeps the temporaries small; the only full-size copy
+    is the final bytes -> str conversion.
+    """
+    prefix = f"data:{mime};base64,".encode('ascii')
+    buffer = bytearray(len(prefix) + (len(data) + 2) // 3 * 4)
+    buffer[:len(prefix)] = prefix
+    position = len(prefix)
+    view = memoryview(data)
+    for start in range(0, len(view), BASE64_CHUNK):
+        chunk = binascii.b2a_base64(view[start:start + BASE64_CHUNK], newline=False)
+        buffer[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    return buffer.decode('ascii')
+
+
+def page_image(pix, image_format='png'):
+    """PageImage (data URL plus dimensions) of a rendered page pixmap"""
+    return encoded_page_image(encode_pixmap(pix, image_format), PAGE_IMAGE_FORMATS[image_format], pix.width, pix.height)
+
+
+def encoded_page_image(encoded, mime, width, height):
+    """PageImage of an already encoded page image (e.g. one from the shared cache)"""
+    return PageImage(data_url(encoded, mime), width, height, mime, len(encoded))
+
+
+def small_font_size(spans):
+    """Font size reached by all but the smallest FONT_PERCENTILE of characters; spans are (size, chars) pairs"""
+    sizes = sorted((size, chars) for size, chars in spans if chars > 0 and size > 0)
+    threshold = sum(chars for _, chars in sizes) * FONT_PERCENTILE
+    seen = 0
+    for size, chars in sizes:
+        seen += chars
+        if seen > threshold:
+            return round(size, 2)
+    return None
+
+
+def page_font_size(page):
+    """small_font_size of a page's text (for pages the document index hasn't measured)"""
+    import fitz  # PyMuPDF for PDF processing
+    return small_font_size((span['size'], len(span['text'].strip()))
+                           for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)['blocks']
+                           for line in block.get('lines', ()) for span in line['spans'])
+
+
+def _tile_layout(width, height, pixel_budget):
+    """Columns and rows splitting width x height pixels into tiles of at most pixel_budget"""
+    cols = rows = 1
+    while (width / cols) * (height / rows) > pixel_budget:
+        if width / cols >= height / rows:
+            cols += 1
+        else:
+            rows += 1
+    return cols, rows
+
+
+def plan_page_render(rect, font_size=None, detail=False, pixel_budget=PAGE_PIXEL_BUDGET, max_tiles=MAX_PAGE_TILES):
+    """DPI and tiles for sending rect (a page, or a crop of one) to a vision model
+
+    Text pages get the DPI their small text needs (TEXT_PIXELS tall); pages
+    without text, and crops (detail=True), get as much as fits pixel_budget.
+    Pages needing more than pixel_budget are tiled, with up to max_tiles
+    tiles before the DPI is lowered to fit.
+    """
+    import fitz  # PyMuPDF for PDF processing
+    area = (rect.width * rect.height) or 1.0
+    fit_dpi = 72 * math.sqrt(pixel_budget / area)
+    dpi = TEXT_PIXELS * 72 / font_size if font_size else fit_dpi
+    if detail:
+        dpi = max(dpi, fit_dpi)
+    dpi = min(MAX_PAGE_DPI, max(MIN_PAGE_DPI, dpi))
+    while True:
+        cols, rows = _tile_layout(rect.width * dpi / 72, rect.height * dpi / 72, pixel_budget)
+        if cols * rows <= max_tiles:
+            break
+        dpi *= 0.9
+    if cols * rows == 1:
+        return RenderPlan(round(dpi, 1), [fitz.Rect(rect)])
+    # The overlap comes out of the budget: tiles are computed on the page shrunk by it
+    step_x, step_y = (rect.width - TILE_OVERLAP) / cols, (rect.height - TILE_OVERLAP) / rows
+    while (step_x + TILE_OVERLAP) * (step_y + TILE_OVERLAP) * (dpi / 72) ** 2 > pixel_budget:
+        dpi *= 0.98
+    tiles = [fitz.Rect(rect.x0 + col * step_x, rect.y0 + row * step_y,
+                       rect.x0 + (col + 1) * step_x + TILE_OVERLAP, rect.y0 + (row + 1) * step_y + TILE_OVERLAP)
+             for row in range(rows) for col in range(cols)]
+    return RenderPlan(round(dpi, 1), tiles)
+
+
+def quantize_zoom(zoom):
+    """Snap a requested zoom to the nearest cached zoom level"""
+    zoom = min(MAX_ZOOM, max(MIN_ZOOM, zoom))
+    return round(zoom / ZOOM_STEP) * ZOOM_STEP
+
+
+def tile_grid(width, height, zoom):
+    """Columns and rows of tiles covering a page of width x height points at zoom"""
+    return math.ceil(width * zoom / TILE_SIZE), math.ceil(height * zoom / TILE_SIZE)
+
+
+def tile_key(doc_id, page_no, zoom, x, y):
+    """Cache key and strong ETag of one tile"""
+    return f"{doc_id}_p{page_no}_z{int(zoom * 100)}_{x}_{y}_v{RENDER_VERSION}"
+
+
+def render_tile(doc, page_no, zoom, x, y):
+    """Render one tile (1-based page) of an open document as WebP bytes; None if it is outside the page"""
+    import fitz  # PyMuPDF for PDF processing
+    if not 1 <= page_no <= doc.page_count:
+        return None
+    page = doc[page_no - 1]
+    cols, rows = tile_grid(page.rect.width, page.rect.height, zoom)
+    if not (0 <= x < cols and 0 <= y < rows):
+        return None
+    # Tile edges in page coordinates; the last column/row is clipped to the page
+    step = TILE_SIZE / zoom
+    clip = fitz.Rect(x * step, y * step, (x + 1) * step, (y + 1) * step) & page.rect
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+    return pixmap_to_webp(pix)
+
+
+class RenderCache:
+    """Size-bounded on-disk cache of rendered files with LRU eviction by access time
+
+    The folder is shared by every worker process: each keeps an index of it
+    (key -> [size, last_used]) that it checks the folder behind on a miss,
+    and rescans when it looks full or is over CACHE_RESCAN_SECONDS old, so
+    files other workers wrote are found and count against max_bytes.
+    """
+
+    def __init__(self, folder, max_bytes, suffix='.webp'):
+        self.folder = os.path.abspath(folder)  # Flask's send_file resolves relative paths against the app root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._entries = {}
+        self._scanned_at = 0
+        self._scan()  # Rebuilt from the folder so the cache survives restarts
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}{self.suffix}")
+
+    def _scan(self):
+        """Rebuild the index from the folder, as every worker has written it"""
+        entries = {}
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith(self.suffix) and entry.is_file():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # Evicted by another worker meanwhile
+                    continue
+                entries[entry.name[:-len(self.suffix)]] = [stat.st_size, stat.st_mtime]
+        self._entries = entries
+        self._scanned_at = time.time()
+
+    def get(self, key):
+        """Path of a cached file, or None"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.utime(path)  # Also finds files another worker rendered after this one's last scan
+            except FileNotFoundError:
+                self._entries.pop(key, None)
+                return None
+            entry = self._entries.get(key)
+            if entry:
+                entry[1] = time.time()
+            else:
+                self._entries[key] = [os.path.getsize(path), time.time()]
+            return path
+
+    def put(self, key, data):
+        """Store a rendered file and return its path"""
+        path = self._path(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.folder, suffix='.tmp')  # Unique across threads and workers
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._entries[key] = [len(data), os.path.getmtime(path)]
+            self._evict()
+        return path
+
+    def _evict(self):
+        """Remove least recently used files until the cache fits max_bytes"""
+        total = sum(size for size, _ in self._entries.values())
+        if total > self.max_bytes or time.time() - self._scanned_at > CACHE_RESCAN_SECONDS:
+            self._scan()  # The budget is for the whole folder, not just what this worker wrote
+            total = sum(size for size, _ in self._entries.values())
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(size for size, _ in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
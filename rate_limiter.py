@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Provider Rate Limiter
+Paces OpenAI/Groq requests using the x-ratelimit-* response headers so we
+stay under the provider's request (RPM/RPD) and token (TPM) budgets instead
+of finding out about them as 429 errors.
+"""
+
+import base64
+import itertools
+import logging
+import re
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Matches provider reset durations such as "1s", "6m0s", "20ms", "2m59.56s", "1h2m"
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+
+# Rough characters-per-token ratio for English/Indic prompts
+CHARS_PER_TOKEN = 4
+# Per-message overhead added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+# Used when an image is attached but its size cannot be read
+DEFAULT_IMAGE_TOKENS = 1105
+# base64 characters decoded to find a JPEG's SOF marker (quantization/Huffman tables come first)
+JPEG_HEADER_CHARS = 4096
+
+
+def parse_reset_duration(value):
+    """Parse a reset header ("6m0s", "20ms", "1.5") into seconds, or None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def png_dimensions(image_base64):
+    """Read width/height from the IHDR chunk of a base64 PNG without decoding it"""
+    try:
+        header = base64.b64decode(image_base64[:32])
+        if header[:8] != b'\x89PNG\r\n\x1a\n':
+            return None
+        return struct.unpack('>II', header[16:24])
+    except Exception:
+        return None
+
+
+def jpeg_dimensions(image_base64):
+    """Read width/height from the first SOF marker of a base64 JPEG, decoding only its header"""
+    try:
+        header = base64.b64decode(image_base64[:JPEG_HEADER_CHARS])
+        if header[:2] != b'\xff\xd8':
+            return None
+        position = 2
+        while position + 9 <= len(header):
+            marker, length = header[position + 1], struct.unpack('>H', header[position + 2:position + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', header[position + 5:position + 9])
+                return width, height
+            position += 2 + length
+        return None
+    except Exception:
+        return None
+
+
+def data_url_dimensions(url):
+    """Image width/height of a PNG or JPEG data URL, or None"""
+    for mime, reader in (('image/png', png_dimensions), ('image/jpeg', jpeg_dimensions)):
+        prefix = f"data:{mime};base64,"
+        if url.startswith(prefix):
+            return reader(url[len(prefix):len(prefix) + JPEG_HEADER_CHARS])
+    return None
+
+
+def estimate_image_tokens(width, height, detail="high"):
+    """Estimate vision tokens using OpenAI's 512px tile accounting"""
+    if detail == "low":
+        return 85
+    # Fit inside 2048x2048, then scale the shortest side down to 768
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = -(-int(width) // 512) * -(-int(height) // 512)
+    return 170 * tiles + 85
+
+
+def estimate_request_tokens(api_messages):
+    """Estimate the prompt tokens of a chat completion request (text + images)"""
+    total = 0
+    for message in api_messages:
+        total += MESSAGE_OVERHEAD_TOKENS
+        content = message.get('content')
+        if isinstance(content, str):
+            total += len(content) // CHARS_PER_TOKEN + 1
+            continue
+        for part in content or []:
+            if part.get('type') == 'text':
+                total += len(part.get('text', '')) // CHARS_PER_TOKEN + 1
+            elif part.get('type') == 'image_url':
+                image_url = part.get('image_url', {})
+                url = image_url.get('url', '')
+                size = data_url_dimensions(url)
+                if size:
+                    total += estimate_image_tokens(*size, detail=image_url.get('detail', 'high'))
+                else:
+                    total += DEFAULT_IMAGE_TOKENS
+    return total
+
+
+class _Budget:
+    """A token bucket refilled at the rate implied by the provider's reset header"""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.remaining = None
+        self.rate = None  # units per second
+        self.updated_at = time.monotonic()
+        self.reset_at = None
+
+    def available(self, now):
+        if self.remaining is None:
+            return float('inf')
+        value = self.remaining
+        if self.rate:
+            value = self.remaining + (now - self.updated_at) * self.rate
+        elif self.reset_at is not None and now >= self.reset_at:
+            value = self.limit if self.limit is not None else float('inf')
+        if self.limit is not None:
+            value = min(value, self.limit)
+        return value
+
+    def time_until(self, amount, now):
+        """Seconds until `amount` units are available (0 if they already are)"""
+        if self.limit is not None:
+            # A request larger than the whole budget only needs a full bucket
+            amount = min(amount, self.limit)
+        available = self.available(now)
+        if available >= amount:
+            return 0.0
+        if self.rate:
+            return (amount - available) / self.rate
+        if self.reset_at is not None:
+            return max(0.0, self.reset_at - now)
+        return 1.0
+
+    def consume(self, amount, now):
+        available = self.available(now)
+        if available == float('inf'):
+            return
+        self.remaining = available - amount
+        self.updated_at = now
+        if not self.rate and (self.reset_at is None or now >= self.reset_at):
+            # Without a refill rate, assume a one-minute window until headers arrive
+            self.reset_at = now + 60.0
+
+    def update(self, limit, remaining, reset_seconds, now):
+        if limit is not None:
+            self.limit = limit
+        if remaining is None:
+            return
+        self.remaining = remaining
+        self.updated_at = now
+        self.reset_at = now + reset_seconds if reset_seconds is not None else None
+        self.rate = None
+        if self.limit is not None and reset_seconds and self.limit > remaining:
+            self.rate = (self.limit - remaining) / reset_seconds
+        elif self.limit is not None:
+            # Bucket is full (or reset unknown): assume a per-minute window
+            self.rate = self.limit / 60.0
+
+    def throttle(self, retry_after, now):
+        """Empty the bucket until the provider's retry-after has passed"""
+        self.remaining = 0
+        if self.limit:
+            # Start refilling (at the per-minute rate) only once retry-after has passed
+            self.updated_at = now + retry_after
+            self.rate = self.limit / 60.0
+        else:
+            self.updated_at = now
+            self.rate = None
+            self.reset_at = now + retry_after
+
+    def snapshot(self, now):
+        available = self.available(now)
+        return {
+            "limit": self.limit,
+            "available": None if available == float('inf') else int(available),
+        }
+
+
+class Reservation:
+    """Budget granted by ProviderRateLimiter.acquire() for one request"""
+
+    def __init__(self, order, prompt_tokens, tokens, granted_at):
+        self.order = order
+        self.prompt_tokens = prompt_tokens
+        self.tokens = tokens
+        self.granted_at = granted_at
+
+
+class ProviderRateLimiter:
+    """Tracks request/token budgets for one provider and paces callers
+
+    Callers reserve budget with acquire() before sending, then hand the
+    response headers back with update_from_headers() (or the exception to
+    record_error()). Waiting callers are served by priority (lower first)
+    and arrival order, but a request that fits the current budget may
+    overtake a larger one that doesn't, unless the larger one has already
+    waited longer than `max_bypass_seconds`. Background requests pass a
+    `reserve`: they only run on spare budget, leaving that share of each
+    limit free, and never overtake another waiting request.
+    """
+
+    # Reservations never reported back are forgotten after this many seconds
+    RESERVATION_TTL = 120.0
+
+    def __init__(self, name, requests_per_minute=None, tokens_per_minute=None, max_bypass_seconds=10.0):
+        self.name = name
+        self.max_bypass_seconds = max_bypass_seconds
+        self._requests = _Budget(requests_per_minute)
+        self._tokens = _Budget(tokens_per_minute)
+        now = time.monotonic()
+        if requests_per_minute:
+            self._requests.update(requests_per_minute, requests_per_minute, None, now)
+        if tokens_per_minute:
+            self._tokens.update(tokens_per_minute, tokens_per_minute, None, now)
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._grant_order = itertools.count()
+        self._outstanding = {}
+        # Ratio of provider-counted to locally estimated prompt tokens, learned from usage
+        self.token_scale = 1.0
+        self.stats = {"granted": 0, "delayed": 0, "timed_out": 0, "throttled": 0, "calibrated": 0, "spare": 0,
+                      "wait_seconds": 0.0}
+
+    def _budget_known(self):
+        return self._requests.remaining is not None or self._tokens.remaining is not None
+
+    def _wait_time(self, tokens, now, reserve=0.0):
+        if not self._budget_known() and self._outstanding:
+            # Send a single probe request until the provider tells us its limits
+            return 0.5
+        return max(self._requests.time_until(1 + reserve * (self._requests.limit or 0), now),
+                   self._tokens.time_until(tokens + reserve * (self._tokens.limit or 0), now))
+
+    def _next_grant(self, now):
+        """Pick the waiter that may proceed now, or None"""
+        for index, (priority, seq, enqueued_at, tokens, reserve) in enumerate(sorted(self._waiters)):
+            if reserve and index:
+                return None  # Spare-budget requests wait until nobody else is waiting
+            if self._wait_time(tokens, now, reserve) == 0:
+                return seq
+            if now - enqueued_at >= self.max_bypass_seconds:
+                # Don't let smaller requests starve one that has waited this long
+                return None
+        return None
+
+    def _expire_reservations(self, now):
+        for order, reservation in list(self._outstanding.items()):
+            if now - reservation.granted_at > self.RESERVATION_TTL:
+                del self._outstanding[order]
+
+    def acquire(self, prompt_tokens, max_tokens=0, priority=0, timeout=None, reserve=0.0):
+        """Block until the request fits the budget; returns a Reservation, or None on timeout
+
+        Providers count max_tokens of output against TPM up front, so it is
+        reserved together with the (calibrated) prompt estimate. With a
+        reserve (0-1) the request also waits until that share of each limit
+        would still be left after it.
+        """
+        estimated_tokens = int(prompt_tokens * self.token_scale) + (max_tokens or 0)
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with self._condition:
+            seq = next(self._sequence)
+            entry = (priority, seq, start, estimated_tokens, reserve)
+            self._waiters.append(entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire_reservations(now)
+                    if self._next_grant(now) == seq:
+                        self._requests.consume(1, now)
+                        self._tokens.consume(estimated_tokens, now)
+                        reservation = Reservation(next(self._grant_order), prompt_tokens, estimated_tokens, now)
+                        self._outstanding[reservation.order] = reservation
+                        waited = now - start
+                        self.stats["granted"] += 1
+                        if reserve:
+                            self.stats["spare"] += 1
+                        if waited > 0.001:
+                            self.stats["delayed"] += 1
+                            self.stats["wait_seconds"] += waited
+                            logger.info(f"⏳ {self.name}: paced request by {waited:.2f}s to stay under rate limits")
+                        return reservation
+                    wait = max(0.01, self._wait_time(estimated_tokens, now, reserve))
+                    if deadline is not None:
+                        if now >= deadline:
+                            self.stats["timed_out"] += 1
+                            logger.warning(f"⚠️ {self.name}: gave up waiting for rate limit budget after {now - start:.1f}s")
+                            return None
+                        wait = min(wait, deadline - now)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                self._condition.notify_all()
+
+    def _apply_headers(self, headers, now):
+        local_requests = self._requests.available(now)
+        local_tokens = self._tokens.available(now)
+        self._requests.update(
+            _header_int(headers, 'x-ratelimit-limit-requests'),
+            _header_int(headers, 'x-ratelimit-remaining-requests'),
+            parse_reset_duration(headers.get('x-ratelimit-reset-requests')),
+            now)
+        self._tokens.update(
+            _header_int(headers, 'x-ratelimit-limit-tokens'),
+            _header_int(headers, 'x-ratelimit-remaining-tokens'),
+            parse_reset_duration(headers.get('x-ratelimit-reset-tokens')),
+            now)
+        # Other in-flight requests may not have reached the provider when these
+        # headers were produced, so keep them reserved (double counting is safe)
+        pending = list(self._outstanding.values())
+        self._requests.consume(len(pending), now)
+        self._tokens.consume(sum(r.tokens for r in pending), now)
+        # Responses can arrive out of order; never let stale headers raise the budget
+        for budget, local in ((self._requests, local_requests), (self._tokens, local_tokens)):
+            if local < budget.available(now):
+                budget.remaining = local
+                budget.updated_at = now
+
+    @property
+    def token_limit(self):
+        """Tokens per minute the provider allows, once known"""
+        return self._tokens.limit
+
+    def update_from_headers(self, headers, reservation=None):
+        """Refresh budgets from the x-ratelimit-* headers of a response"""
+        now = time.monotonic()
+        with self._condition:
+            if reservation:
+                self._outstanding.pop(reservation.order, None)
+            if headers:
+                self._apply_headers(headers, now)
+            self._condition.notify_all()
+
+    def record_usage(self, reservation, prompt_tokens):
+        """Calibrate future estimates against the prompt tokens the provider billed"""
+        if not reservation or not prompt_tokens or not reservation.prompt_tokens:
+            return
+        ratio = min(3.0, max(0.5, prompt_tokens / reservation.prompt_tokens))
+        with self._condition:
+            if self.stats["calibrated"]:
+                self.token_scale = 0.8 * self.token_scale + 0.2 * ratio
+            else:
+                self.token_scale = ratio
+            self.stats["calibrated"] += 1
+
+    def record_error(self, error, reservation=None):
+        """Release a failed request's reservation; a 429 empties the budget until retry-after"""
+        now = time.monotonic()
+        response = getattr(error, 'response', None)
+        with self._condition:
+            if reservation:
+                self._outstanding.pop(reservation.order, None)
+            if getattr(error, 'status_code', None) == 429 and response is not None:
+                self._apply_headers(response.headers, now)
+                retry_after = parse_reset_duration(response.headers.get('retry-after'))
+                self.stats["throttled"] += 1
+                if retry_after:
+                    self._requests.throttle(retry_after, now)
+                    self._tokens.throttle(retry_after, now)
+                logger.warning(f"🚦 {self.name}: provider returned 429, retry after {retry_after}s")
+            self._condition.notify_all()
+
+    def snapshot(self):
+        """Current budgets and counters for /api/status"""
+        now = time.monotonic()
+        with self._condition:
+            return {
+                "requests": self._requests.snapshot(now),
+                "tokens": self._tokens.snapshot(now),
+                "waiting": len(self._waiters),
+                "in_flight": len(self._outstanding),
+                "token_scale": round(self.token_scale, 3),
+                **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()},
+            }
@@ -12,6 +12,10 @@ class EducationAssistantUI {
         this.setupEventListeners();
         this.chatHistory = [];
         this.uploadedFilesList = [];
+        this.uploadRefs = []; // Per uploaded file: promise of its file_ref from the chunked upload
+        this.MAX_UPLOAD_SIZE = 512 * 1024 * 1024; // Large textbooks go through /api/uploads
+        this.MAX_INLINE_SIZE = 10 * 1024 * 1024; // Backend MAX_FILE_SIZE: larger PDFs can only be sent by file_ref
+        this.CHUNK_RETRIES = 5;
         this.currentPdfData = [];
         this.currentPdfIndex = 0;
         this.currentPage = 1;
@@ -21,9 +25,20 @@ class EducationAssistantUI {
         this.minZoom = 0.5;
         this.maxZoom = 3.0;
         this.zoomStep = 0.25;
+        this.serverView = null; // Page currently drawn from server tiles (see renderServerPage)
+        this.selectedRegion = null; // {pdfIndex, page, box: [x0, y0, x1, y1] as fractions of the page}
         // Set to false to use real backend, true for simulation
         this.useSimulation = false;
         this.sendingMessage = false; // Prevent multiple simultaneous requests
+        // Chat over one WebSocket when the backend offers it (streamed answers); POST /api/chat otherwise
+        this.chatSocket = null;
+        this.socketRequests = new Map(); // Message id -> {resolve, text, image, div}
+        this.socketFailures = 0;
+        this.socketMessageCount = 0;
+        this.lastPageEvent = null;
+        if (!this.useSimulation) {
+            this.connectChatSocket();
+        }
         
         this.persistentLog('Education Assistant UI initialized successfully');
     }
@@ -97,6 +112,8 @@ class EducationAssistantUI {
         this.zoomInBtn = document.getElementById('zoomIn');
         this.zoomOutBtn = document.getElementById('zoomOut');
         this.fitToWidthBtn = document.getElementById('fitToWidth');
+        this.selectRegionBtn = document.getElementById('selectRegion');
+        this.regionSelection = document.getElementById('regionSelection');
         this.zoomInfo = document.getElementById('zoomInfo');
         
         // Canvas elements
@@ -235,6 +252,16 @@ class EducationAssistantUI {
             e.preventDefault();
             this.fitToWidth();
         });
+        // Select a part of the page (a diagram, a table) to ask about
+        this.selectRegionBtn.addEventListener('click', (e) => {
+            e.preventDefault();
+            this.toggleRegionSelection();
+        });
+        this.pdfCanvas.addEventListener('pointerdown', (e) => this.startRegion(e));
+        this.pdfCanvas.addEventListener('pointermove', (e) => this.moveRegion(e));
+        this.pdfCanvas.addEventListener('pointerup', (e) => this.endRegion(e));
+        // Server-rendered pages load the tiles scrolled into view
+        this.pdfCanvas.parentElement.parentElement.addEventListener('scroll', () => this.drawVisibleTiles());
 
         // Canvas functionality
         this.downloadCanvasBtn.addEventListener('click', (e) => {
@@ -458,10 +485,7 @@ class EducationAssistantUI {
                 this.hideLoading();
             } else {
                 this.persistentLog('Using real backend');
-                const payload = this.buildPayload(message);
-                this.persistentLog('Payload built successfully');
-                
-                const response = await this.sendToBackend(payload);
+                const response = await this.sendChatMessage(message);
                 this.persistentLog('Backend response received');
                 
                 this.handleBackendResponse(response, message);
@@ -483,49 +507,107 @@ class EducationAssistantUI {
         }
     }
 
-    buildPayload(message) {
+    // The chat socket carries the message once every PDF is uploaded; a form POST otherwise.
+    // A PDF the backend no longer has (it was restarted and cleaned up uploads/) is uploaded again and the message resent.
+    async sendChatMessage(message) {
+        for (let attempt = 0; ; attempt++) {
+            let response = await this.sendOverSocket(message);
+            if (!response) {
+                const payload = await this.buildPayload(message);
+                this.persistentLog('Payload built successfully');
+                response = await this.sendToBackend(payload);
+            }
+            const index = response.file_ref ? await this.uploadIndex(response.file_ref) : -1;
+            if (index < 0 || attempt > 0) {
+                return response;
+            }
+            this.persistentLog(`Backend lost ${response.file_ref}, uploading it again`);
+            await this.fileRef(index, true);
+            this.lastPageEvent = null; // The socket session still has the old file_ref
+        }
+    }
+
+    async buildPayload(message) {
         const formData = new FormData();
         
         // Add message
         formData.append('message', message);
         
-        // Add uploaded files
+        // Add uploaded files: a reference once the chunked upload finished, the file itself otherwise
         console.log('Building payload with files:', this.uploadedFilesList.length);
-        this.uploadedFilesList.forEach((file, index) => {
-            console.log(`Adding file ${index}:`, file.name, file.size);
-            formData.append(`file_${index}`, file);
-        });
-        
-        // Add current PDF page
-        formData.append('current_page', this.currentPage.toString());
-        formData.append('total_pages', this.totalPages.toString());
-        formData.append('current_pdf_index', this.currentPdfIndex.toString());
-        
-        // Add dropdown values - use mobile values if available, desktop otherwise
-        const teacherLang = (this.mobileTeacherLanguage?.value) || this.teacherLanguage.value;
-        const studentLang = (this.mobileStudentLanguage?.value) || this.studentLanguage.value;
-        const classLvl = (this.mobileClassLevel?.value) || this.classLevel.value;
-        const classStr = (this.mobileClassStrength?.value) || this.classStrength.value;
+        for (const [index, file] of this.uploadedFilesList.entries()) {
+            const fileRef = await this.fileRef(index);
+            if (fileRef) {
+                console.log(`Adding file ref ${index}:`, fileRef);
+                formData.append(`file_ref_${index}`, fileRef);
+            } else {
+                console.log(`Adding file ${index}:`, file.name, file.size);
+                formData.append(`file_${index}`, file);
+            }
+        }
         
-        formData.append('teacher_language', teacherLang);
-        formData.append('student_language', studentLang);
-        formData.append('class_level', classLvl);
-        formData.append('class_strength', classStr);
-
-        console.log('Payload being sent:', {
-            message: message,
-            fileCount: this.uploadedFilesList.length,
-            currentPage: this.currentPage,
-            totalPages: this.totalPages,
-            teacherLanguage: teacherLang,
-            studentLanguage: studentLang,
-            classLevel: classLvl,
-            classStrength: classStr
-        });
+        // Add current PDF page, the selected region and the dropdown values
+        const fields = this.contextFields();
+        for (const [key, value] of Object.entries(fields)) {
+            formData.append(key, value);
+        }
+
+        console.log('Payload being sent:', { message: message, fileCount: this.uploadedFilesList.length, ...fields });
 
         return formData;
     }
 
+    // Page in view and classroom settings, sent with every chat message (form or socket)
+    contextFields(withRegion = true) {
+        const fields = {
+            current_page: this.currentPage.toString(),
+            total_pages: this.totalPages.toString(),
+            current_pdf_index: this.currentPdfIndex.toString(),
+            // Use mobile values if available, desktop otherwise
+            teacher_language: (this.mobileTeacherLanguage?.value) || this.teacherLanguage.value,
+            student_language: (this.mobileStudentLanguage?.value) || this.studentLanguage.value,
+            class_level: (this.mobileClassLevel?.value) || this.classLevel.value,
+            class_strength: (this.mobileClassStrength?.value) || this.classStrength.value
+        };
+
+        // Only the selected part of the page is sent as an image (with the page text)
+        if (withRegion && this.selectedRegion && this.selectedRegion.page === this.currentPage
+                && this.selectedRegion.pdfIndex === this.currentPdfIndex) {
+            fields.region = this.selectedRegion.box.map(v => v.toFixed(4)).join(',');
+        }
+        return fields;
+    }
+
+    // file_ref of an uploaded PDF, uploading it again when asked to or when it is too large to send inline.
+    // null means the PDF is sent with the message itself; throws if a large PDF can't be uploaded.
+    async fileRef(index, refresh = false) {
+        const file = this.uploadedFilesList[index];
+        let fileRef = await this.uploadRefs[index];
+        if (refresh || (!fileRef && file.size > this.MAX_INLINE_SIZE)) {
+            this.uploadRefs[index] = this.uploadFileChunked(file);
+            fileRef = await this.uploadRefs[index];
+            if (!fileRef && file.size > this.MAX_INLINE_SIZE) {
+                throw new Error(`Upload of "${file.name}" failed again`);
+            }
+        }
+        return fileRef;
+    }
+
+    // Index of the uploaded PDF with this file_ref, or -1
+    async uploadIndex(fileRef) {
+        const refs = await Promise.all(this.uploadRefs.map(ref => Promise.resolve(ref).catch(() => null)));
+        return refs.indexOf(fileRef);
+    }
+
+    // file_ref_N of every uploaded PDF, or null while one of them has no finished chunked upload
+    async uploadedFileRefs() {
+        const refs = await Promise.all(this.uploadRefs.map(ref => Promise.resolve(ref).catch(() => null)));
+        if (refs.some(ref => !ref)) {
+            return null;
+        }
+        return Object.fromEntries(refs.map((ref, index) => [`file_ref_${index}`, ref]));
+    }
+
     addMessage(content, sender, timestamp = null, imageUrl = null, originalQuestion = null, isHtml = false, plainText = null, imageData = null) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -780,6 +862,15 @@ class EducationAssistantUI {
         // Show loading notification
         this.showNotification('Generating formatted PDF...', 'info');
 
+        try {
+            // The backend lays out a text PDF without blocking the tab; render in the browser only if it can't
+            await this.downloadServerPdf();
+            return;
+        } catch (error) {
+            console.warn('Server-side PDF export failed, building it in the browser:', error);
+            this.persistentLog(`Server PDF export failed: ${error.message}`, 'error');
+        }
+
         try {
             // Try HTML2Canvas + jsPDF approach for formatted output
             await this.downloadFormattedPdf();
@@ -793,6 +884,47 @@ class EducationAssistantUI {
         }
     }
 
+    // Ask the backend to build the notes PDF (cached by content), poll until it is ready, then download it
+    async downloadServerPdf() {
+        const items = this.canvasItems.map(item => ({
+            question: item.question,
+            response: item.response,
+            timestamp: item.timestamp,
+            image_url: item.imageUrl,
+            image_description: item.imageData && item.imageData.description
+        }));
+        let response = await fetch(`${this.BACKEND_URL}/api/exports`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ items: items })
+        });
+        if (!response.ok) {
+            throw new Error(`export request failed (${response.status})`);
+        }
+        let exportJob = await response.json();
+        for (let attempt = 0; exportJob.status === 'pending'; attempt++) {
+            if (attempt >= 120) {
+                throw new Error('export timed out');
+            }
+            await new Promise(resolve => setTimeout(resolve, 500));
+            response = await fetch(`${this.BACKEND_URL}/api/exports/${exportJob.export_id}`);
+            if (!response.ok) {
+                throw new Error(`export status failed (${response.status})`);
+            }
+            exportJob = await response.json();
+        }
+        if (exportJob.status !== 'ready') {
+            throw new Error(exportJob.error || 'export failed');
+        }
+
+        const link = document.createElement('a');
+        link.href = `${this.BACKEND_URL}/api/exports/${exportJob.export_id}/download`;
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+        this.showNotification('PDF downloaded successfully!', 'success');
+    }
+
     async downloadFormattedPdf() {
         console.log('=== FORMATTED PDF GENERATION START ===');
         
@@ -1258,18 +1390,19 @@ class EducationAssistantUI {
                     continue;
                 }
 
-                // Check file size (limit to 10MB)
-                const maxSize = 10 * 1024 * 1024;
-                if (file.size > maxSize) {
-                    this.showNotification(`File "${file.name}" is too large. Maximum size is 10MB.`, 'error');
+                // Check file size (limit to 512MB)
+                if (file.size > this.MAX_UPLOAD_SIZE) {
+                    this.showNotification(`File "${file.name}" is too large. Maximum size is 512MB.`, 'error');
                     continue;
                 }
 
                 this.uploadedFilesList.push(file);
+                const uploadRef = this.uploadFileChunked(file);
+                this.uploadRefs.push(uploadRef);
                 this.persistentLog(`File added to uploadedFilesList: ${file.name}`);
                 
                 // Load PDF preview now that backend connectivity is fixed
-                await this.loadPdfPreview(file);
+                await this.loadPdfPreview(file, uploadRef);
                 this.persistentLog('PDF preview loaded successfully');
                 
                 this.showNotification(`Successfully uploaded: ${file.name}`, 'success');
@@ -1284,16 +1417,126 @@ class EducationAssistantUI {
         this.persistentLog('PDF selector and preview updated successfully');
     }
 
-    async loadPdfPreview(file) {
+    // Upload a PDF in checksummed chunks, resuming an earlier interrupted upload of the same file.
+    // Resolves to the file_ref to send with chat messages, or null if the upload failed
+    // (a PDF up to MAX_INLINE_SIZE is then sent with each message; a larger one is uploaded again).
+    async uploadFileChunked(file) {
+        const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+        try {
+            let upload = null;
+            const savedId = localStorage.getItem(resumeKey);
+            if (savedId) {
+                const response = await fetch(`${this.BACKEND_URL}/api/uploads/${savedId}`);
+                if (response.ok) {
+                    upload = await response.json();
+                    this.persistentLog(`Resuming upload of ${file.name}: ${upload.missing.length} of ${upload.total_chunks} chunks left`);
+                }
+            }
+            if (!upload) {
+                const response = await fetch(`${this.BACKEND_URL}/api/uploads`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ filename: file.name, size: file.size })
+                });
+                if (!response.ok) {
+                    throw new Error(await response.text());
+                }
+                upload = await response.json();
+                localStorage.setItem(resumeKey, upload.upload_id);
+            }
+
+            for (const index of upload.missing) {
+                await this.uploadChunk(file, upload, index);
+            }
+
+            const response = await fetch(`${this.BACKEND_URL}/api/uploads/${upload.upload_id}/complete`, { method: 'POST' });
+            if (!response.ok) {
+                throw new Error(await response.text());
+            }
+            const result = await response.json();
+            localStorage.removeItem(resumeKey);
+            this.persistentLog(`Chunked upload finished: ${file.name} -> ${result.file_ref}`);
+            return result.file_ref;
+        } catch (error) {
+            this.persistentLog(`Chunked upload failed for ${file.name}: ${error.message}`, 'error');
+            if (file.size <= this.MAX_INLINE_SIZE) {
+                this.showNotification(`Upload of "${file.name}" did not finish. It will be sent with your next message instead.`, 'warning');
+            } else {
+                this.showNotification(`Upload of "${file.name}" did not finish. It will be tried again with your next message.`, 'warning');
+            }
+            return null;
+        }
+    }
+
+    async uploadChunk(file, upload, index) {
+        const start = index * upload.chunk_size;
+        const buffer = await file.slice(start, Math.min(start + upload.chunk_size, file.size)).arrayBuffer();
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        if (window.crypto?.subtle) {
+            const digest = await crypto.subtle.digest('SHA-256', buffer);
+            headers['X-Chunk-SHA256'] = Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+        } else {
+            // No crypto.subtle on plain-http LAN origins: a CRC32 still catches corrupted chunks
+            headers['X-Chunk-CRC32'] = this.crc32(new Uint8Array(buffer)).toString(16).padStart(8, '0');
+        }
+
+        for (let attempt = 1; ; attempt++) {
+            let response = null;
+            try {
+                response = await fetch(`${this.BACKEND_URL}/api/uploads/${upload.upload_id}/chunks/${index}`, {
+                    method: 'PUT',
+                    headers: headers,
+                    body: buffer
+                });
+                if (response.ok) {
+                    return;
+                }
+            } catch (error) {
+                // Connection dropped: retry this chunk below
+            }
+            // Retry dropped connections, checksum mismatches and server errors with backoff
+            const retryable = !response || response.status === 422 || response.status >= 500;
+            if (!retryable || attempt >= this.CHUNK_RETRIES) {
+                throw new Error(`Chunk ${index} failed${response ? `: ${response.status} ${await response.text()}` : ''}`);
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** (attempt - 1)));
+        }
+    }
+
+    crc32(bytes) {
+        if (!this.crcTable) {
+            this.crcTable = new Uint32Array(256);
+            for (let n = 0; n < 256; n++) {
+                let c = n;
+                for (let k = 0; k < 8; k++) {
+                    c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+                }
+                this.crcTable[n] = c;
+            }
+        }
+        let crc = 0xFFFFFFFF;
+        for (let i = 0; i < bytes.length; i++) {
+            crc = this.crcTable[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+        }
+        return (crc ^ 0xFFFFFFFF) >>> 0;
+    }
+
+    async loadPdfPreview(file, uploadRef) {
         try {
-            const arrayBuffer = await file.arrayBuffer();
-            const pdf = await pdfjsLib.getDocument(arrayBuffer).promise;
+            // Let pdf.js read the file by URL instead of copying the whole PDF into an ArrayBuffer first
+            const url = URL.createObjectURL(file);
+            const pdf = await pdfjsLib.getDocument({ url: url, disableAutoFetch: true }).promise;
             
-            this.currentPdfData.push({
+            const pdfData = {
                 file: file,
                 pdf: pdf,
-                name: file.name
-            });
+                name: file.name,
+                serverDoc: null
+            };
+            this.currentPdfData.push(pdfData);
+            if (uploadRef) {
+                this.attachServerPages(pdfData, uploadRef);
+            }
             
         } catch (error) {
             console.error('Error loading PDF:', error);
@@ -1301,6 +1544,32 @@ class EducationAssistantUI {
         }
     }
 
+    // Once the backend has indexed the uploaded PDF, draw its pages from cached WebP tiles instead of pdf.js
+    async attachServerPages(pdfData, uploadRef) {
+        const fileRef = await uploadRef;
+        if (!fileRef) return;
+        const docId = fileRef.split('_')[0];
+        try {
+            for (let attempt = 0; attempt < 120; attempt++) {
+                const response = await fetch(`${this.BACKEND_URL}/api/docs/${docId}`);
+                if (!response.ok) return;
+                const doc = await response.json();
+                if (doc.status === 'ready') {
+                    pdfData.serverDoc = doc;
+                    this.persistentLog(`Server-side pages ready for ${pdfData.name}`);
+                    if (this.currentPdfData[this.currentPdfIndex] === pdfData) {
+                        this.renderPdfPage();
+                    }
+                    return;
+                }
+                if (doc.status === 'failed') return;
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+        } catch (error) {
+            console.warn('Server-side pages unavailable, rendering with pdf.js:', error);
+        }
+    }
+
     updatePdfSelector() {
         this.pdfSelector.innerHTML = '';
         this.currentPdfData.forEach((pdfData, index) => {
@@ -1347,13 +1616,26 @@ class EducationAssistantUI {
         
         this.prevPageBtn.disabled = this.currentPage <= 1;
         this.nextPageBtn.disabled = this.currentPage >= this.totalPages;
+        this.sendPageEvent();
+        if (this.selectedRegion && (this.selectedRegion.page !== this.currentPage
+                || this.selectedRegion.pdfIndex !== this.currentPdfIndex)) {
+            this.clearRegion();
+        }
 
         try {
+            if (pdfData.serverDoc) {
+                await this.renderServerPage(pdfData.serverDoc);
+                this.updateZoomControls();
+                return;
+            }
+            this.serverView = null;
+            
             const page = await pdfData.pdf.getPage(this.currentPage);
             const viewport = page.getViewport({ scale: this.currentZoom });
             
             this.pdfCanvas.width = viewport.width;
             this.pdfCanvas.height = viewport.height;
+            this.pdfCanvas.style.width = '';
             
             const renderContext = {
                 canvasContext: this.pdfCanvas.getContext('2d'),
@@ -1367,6 +1649,73 @@ class EducationAssistantUI {
         }
     }
 
+    // Draw a page from server tiles: the indexed thumbnail at once, then the tiles in view at this zoom
+    async renderServerPage(doc) {
+        const pageInfo = doc.pages[this.currentPage - 1];
+        const zoom = Math.round(this.currentZoom * 4) / 4; // Tiles are cached in 0.25 zoom steps
+        const width = Math.ceil(pageInfo.width * zoom);
+        const height = Math.ceil(pageInfo.height * zoom);
+        const pageUrl = `${this.BACKEND_URL}/api/docs/${doc.doc_id}/pages/${this.currentPage}`;
+        const view = {
+            pageUrl: pageUrl,
+            zoom: zoom,
+            tileSize: doc.tile_size,
+            columns: Math.ceil(width / doc.tile_size),
+            rows: Math.ceil(height / doc.tile_size),
+            drawn: new Set()
+        };
+        this.serverView = view;
+
+        this.pdfCanvas.width = width;
+        this.pdfCanvas.height = height;
+        this.pdfCanvas.style.width = `${Math.round(pageInfo.width * this.currentZoom)}px`;
+        const thumbnail = await this.loadImage(pageUrl).catch(() => null);
+        if (thumbnail && this.serverView === view) {
+            this.pdfCanvas.getContext('2d').drawImage(thumbnail, 0, 0, width, height);
+        }
+        await this.drawVisibleTiles();
+    }
+
+    // Fetch only the tiles that intersect the visible part of the viewer (called again on scroll)
+    async drawVisibleTiles() {
+        const view = this.serverView;
+        if (!view) return;
+        const viewer = this.pdfCanvas.parentElement.parentElement.getBoundingClientRect();
+        const canvas = this.pdfCanvas.getBoundingClientRect();
+        const scale = this.pdfCanvas.width / canvas.width; // Canvas pixels per CSS pixel
+        const left = Math.max(0, viewer.left - canvas.left) * scale;
+        const top = Math.max(0, viewer.top - canvas.top) * scale;
+        const right = Math.min(canvas.width, viewer.right - canvas.left) * scale;
+        const bottom = Math.min(canvas.height, viewer.bottom - canvas.top) * scale;
+
+        const context = this.pdfCanvas.getContext('2d');
+        const tiles = [];
+        for (let y = Math.floor(top / view.tileSize); y < Math.min(view.rows, Math.ceil(bottom / view.tileSize)); y++) {
+            for (let x = Math.floor(left / view.tileSize); x < Math.min(view.columns, Math.ceil(right / view.tileSize)); x++) {
+                if (view.drawn.has(`${x},${y}`)) continue;
+                view.drawn.add(`${x},${y}`);
+                tiles.push(this.loadImage(`${view.pageUrl}?zoom=${view.zoom}&x=${x}&y=${y}`)
+                    .then(tile => {
+                        if (this.serverView === view) {
+                            context.drawImage(tile, x * view.tileSize, y * view.tileSize);
+                        }
+                    })
+                    .catch(() => view.drawn.delete(`${x},${y}`)));
+            }
+        }
+        await Promise.all(tiles);
+    }
+
+    loadImage(url) {
+        return new Promise((resolve, reject) => {
+            const image = new Image();
+            image.crossOrigin = 'anonymous';
+            image.onload = () => resolve(image);
+            image.onerror = reject;
+            image.src = url;
+        });
+    }
+
     zoomIn() {
         if (this.currentZoom < this.maxZoom) {
             this.currentZoom = Math.min(this.currentZoom + this.zoomStep, this.maxZoom);
@@ -1409,6 +1758,80 @@ class EducationAssistantUI {
         this.zoomOutBtn.disabled = this.currentZoom <= this.minZoom;
     }
 
+    // Region selection: drag on the page to choose what the next questions are about; click the button again to clear
+    toggleRegionSelection() {
+        const container = this.pdfCanvas.parentElement;
+        if (this.selectedRegion || container.classList.contains('selecting')) {
+            this.clearRegion();
+            return;
+        }
+        container.classList.add('selecting');
+        this.selectRegionBtn.classList.add('active');
+        this.showNotification('Drag over the part of the page you want to ask about', 'info');
+    }
+
+    regionPoint(e) {
+        const rect = this.pdfCanvas.getBoundingClientRect();
+        return [
+            Math.min(1, Math.max(0, (e.clientX - rect.left) / rect.width)),
+            Math.min(1, Math.max(0, (e.clientY - rect.top) / rect.height))
+        ];
+    }
+
+    startRegion(e) {
+        if (!this.pdfCanvas.parentElement.classList.contains('selecting')) return;
+        e.preventDefault();
+        this.pdfCanvas.setPointerCapture(e.pointerId);
+        this.regionStart = this.regionPoint(e);
+        this.drawRegion([...this.regionStart, ...this.regionStart]);
+    }
+
+    moveRegion(e) {
+        if (!this.regionStart) return;
+        this.drawRegion([...this.regionStart, ...this.regionPoint(e)]);
+    }
+
+    endRegion(e) {
+        if (!this.regionStart) return;
+        const [ax, ay] = this.regionStart;
+        const [bx, by] = this.regionPoint(e);
+        this.regionStart = null;
+        const box = [Math.min(ax, bx), Math.min(ay, by), Math.max(ax, bx), Math.max(ay, by)];
+        if (box[2] - box[0] < 0.02 || box[3] - box[1] < 0.02) {
+            this.drawRegion(null);
+            return;
+        }
+        this.selectedRegion = { pdfIndex: this.currentPdfIndex, page: this.currentPage, box };
+        this.pdfCanvas.parentElement.classList.remove('selecting');
+        this.drawRegion(box);
+        this.showNotification('Your next questions will be about the selected area', 'info');
+    }
+
+    drawRegion(box) {
+        if (!box) {
+            this.regionSelection.style.display = 'none';
+            return;
+        }
+        const [x0, y0, x1, y1] = [Math.min(box[0], box[2]), Math.min(box[1], box[3]),
+                                  Math.max(box[0], box[2]), Math.max(box[1], box[3])];
+        // The canvas sits at the container's top-left, so fractions of the canvas are fractions of the container
+        Object.assign(this.regionSelection.style, {
+            display: 'block',
+            left: `${x0 * 100}%`,
+            top: `${y0 * 100}%`,
+            width: `${(x1 - x0) * 100}%`,
+            height: `${(y1 - y0) * 100}%`
+        });
+    }
+
+    clearRegion() {
+        this.selectedRegion = null;
+        this.regionStart = null;
+        this.pdfCanvas.parentElement.classList.remove('selecting');
+        this.selectRegionBtn.classList.remove('active');
+        this.drawRegion(null);
+    }
+
     previousPage() {
         if (this.currentPage > 1) {
             this.currentPage--;
@@ -1454,6 +1877,106 @@ class EducationAssistantUI {
         this.addMessage(response, 'bot', null, imageUrl, userMessage);
     }
 
+    // Chat socket: reconnects after drops, and gives up on backends without one (POST is used then)
+    connectChatSocket() {
+        if (typeof WebSocket === 'undefined' || this.socketFailures >= 3) {
+            return;
+        }
+        const socket = new WebSocket(`${this.BACKEND_URL.replace(/^http/, 'ws')}/api/chat/socket`);
+        socket.onmessage = (event) => this.handleSocketMessage(socket, JSON.parse(event.data));
+        socket.onclose = () => {
+            if (this.chatSocket === socket) {
+                this.chatSocket = null;
+                this.persistentLog('Chat socket closed');
+            }
+            // Messages still waiting for an answer are sent again as a POST
+            for (const pending of this.socketRequests.values()) {
+                if (pending.div) {
+                    pending.div.remove();
+                }
+                pending.resolve(null);
+            }
+            this.socketRequests.clear();
+            this.socketFailures = socket.ready ? 0 : this.socketFailures + 1;
+            setTimeout(() => this.connectChatSocket(), Math.min(30000, 1000 * 2 ** this.socketFailures));
+        };
+    }
+
+    handleSocketMessage(socket, data) {
+        const pending = this.socketRequests.get(data.id);
+        if (data.type === 'ready') {
+            socket.ready = true;
+            this.chatSocket = socket;
+            this.lastPageEvent = null;
+            this.persistentLog('Chat socket connected');
+            this.sendPageEvent();
+        } else if (data.type === 'partial' && pending) {
+            pending.text = data.reset ? '' : pending.text + data.text;
+            this.showStreamingAnswer(pending);
+        } else if (data.type === 'image' && pending) {
+            pending.image = data.generated_image;
+            this.showStreamingAnswer(pending);
+        } else if (data.type === 'response' && pending) {
+            this.socketRequests.delete(data.id);
+            if (pending.div) {
+                pending.div.remove(); // Replaced by the formatted answer
+            }
+            pending.resolve(data.status === 200 ? data.response : { ...data.response, error: data.response.error || `HTTP error! status: ${data.status}` });
+        } else if (data.type === 'error') {
+            this.persistentLog(`Chat socket error: ${data.error}`, 'error');
+        }
+    }
+
+    // Resolves to the response, or null when the message has to go as a POST instead
+    async sendOverSocket(message) {
+        const fileRefs = await this.uploadedFileRefs();
+        const socket = this.chatSocket;
+        if (!fileRefs || !socket || socket.readyState !== WebSocket.OPEN) {
+            return null;
+        }
+        const id = `m${++this.socketMessageCount}`;
+        this.persistentLog(`Sending message ${id} over the chat socket`);
+        return new Promise((resolve) => {
+            this.socketRequests.set(id, { resolve, text: '', image: null, div: null });
+            socket.send(JSON.stringify({ type: 'chat', id, message, ...fileRefs, ...this.contextFields() }));
+        });
+    }
+
+    // Tell the backend which page is in view, so it is ready before the teacher asks about it
+    async sendPageEvent() {
+        const fileRefs = await this.uploadedFileRefs();
+        const socket = this.chatSocket;
+        if (!fileRefs || !socket || socket.readyState !== WebSocket.OPEN) {
+            return;
+        }
+        const event = JSON.stringify({ type: 'page', ...fileRefs, ...this.contextFields(false) });
+        if (event !== this.lastPageEvent) {
+            this.lastPageEvent = event;
+            socket.send(event);
+        }
+    }
+
+    // The answer as it is written, with a generated image as soon as it is ready
+    showStreamingAnswer(pending) {
+        if (!pending.div) {
+            this.hideLoading();
+            this.sendButton.disabled = true; // Until the answer is complete
+            pending.div = document.createElement('div');
+            pending.div.className = 'message bot-message';
+            pending.div.innerHTML = '<div class="message-avatar"><i class="fas fa-robot"></i></div><div class="message-content"><p></p></div>';
+            this.chatMessages.appendChild(pending.div);
+        }
+        pending.div.querySelector('p').textContent = pending.text;
+        if (pending.image && !pending.div.querySelector('img')) {
+            const img = document.createElement('img');
+            img.src = pending.image.local_url || pending.image.image_url;
+            img.alt = `Generated: ${pending.image.description}`;
+            img.style.cssText = 'max-width: 100%; height: auto; border-radius: 8px; box-shadow: 0 2px 12px rgba(0,0,0,0.15);';
+            pending.div.querySelector('.message-content').appendChild(img);
+        }
+        this.scrollToBottom();
+    }
+
     async sendToBackend(formData) {
         try {
             this.persistentLog('=== BACKEND REQUEST START ===');
@@ -1482,6 +2005,18 @@ class EducationAssistantUI {
             if (!response.ok) {
                 const errorText = await response.text();
                 this.persistentLog(`Response error: ${errorText}`, 'error');
+                if (response.status === 404) {
+                    // {error, file_ref}: an uploaded PDF the backend no longer has (see sendChatMessage)
+                    let error = null;
+                    try {
+                        error = JSON.parse(errorText);
+                    } catch (parseError) {
+                        // Not a JSON error from the chat endpoint
+                    }
+                    if (error?.file_ref) {
+                        return error;
+                    }
+                }
                 throw new Error(`HTTP error! status: ${response.status} - ${errorText}`);
             }
 
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Server-Timing
+Per-stage timings for a request, reported in the standard Server-Timing
+response header (visible in the browser dev tools and read by
+benchmarks/bench_chat_pipeline.py), e.g.
+
+    Server-Timing: upload;dur=3.1, render;dur=182.4, encode;dur=41.0, ai;dur=950.2, total;dur=1180.3
+"""
+
+import time
+
+
+class ServerTiming:
+    """Records the time spent in consecutive stages of a request"""
+
+    def __init__(self):
+        self.started_at = self._last = time.perf_counter()
+        self.stages = {}
+
+    def mark(self, stage):
+        """Close the current stage: everything since the previous mark is billed to `stage`"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def header(self):
+        total = (time.perf_counter() - self.started_at) * 1000
+        parts = [f"{stage};dur={duration:.1f}" for stage, duration in self.stages.items()]
+        return ', '.join(parts + [f"total;dur={total:.1f}"])
+
+
+def parse_server_timing(value):
+    """Parse a Server-Timing header into {stage: milliseconds}"""
+    timings = {}
+    for part in (value or '').split(','):
+        name, _, params = part.strip().partition(';')
+        for param in params.split(';'):
+            key, _, duration = param.strip().partition('=')
+            if key == 'dur' and name:
+                timings[name] = timings.get(name, 0.0) + float(duration)
+    return timings
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Shared Cache
+Node-local cache that every backend worker process reads and writes, so
+page images and AI responses are computed once per machine instead of once
+per worker. Entries are bytes (plus a small JSON `meta` dict) under a
+namespace and key, optionally with a TTL, and the store is kept under a
+size limit by evicting the least recently used entries. SQLiteCache (one
+WAL-mode file, atomic upserts, size tracked by triggers) is the shared
+store; MemoryCache has the same interface for a single process. New
+backends register in CACHE_BACKENDS.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = 256 * 1024 * 1024
+TOUCH_INTERVAL = 60  # Seconds; last_used is refreshed at most this often so reads rarely write
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'meta'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    meta TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage (id, entries, bytes) VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE usage SET entries = entries + 1, bytes = bytes + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE usage SET bytes = bytes - OLD.size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE usage SET entries = entries - 1, bytes = bytes - OLD.size;
+END;
+"""
+
+
+class CacheStore(ABC):
+    """Interface of a cache backend"""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, namespace, key):
+        """CacheEntry(value, meta) or None if missing or expired"""
+
+    @abstractmethod
+    def put(self, namespace, key, value, meta=None, ttl=None):
+        """Store bytes atomically (replacing any previous value); False if larger than the whole cache"""
+
+    @abstractmethod
+    def delete(self, namespace, key):
+        """Remove one entry (nothing happens if it is missing)"""
+
+    @abstractmethod
+    def clear(self, namespace=None):
+        """Remove every entry, or those of one namespace"""
+
+    @abstractmethod
+    def usage(self):
+        """(entries, bytes) currently stored"""
+
+    def get_json(self, namespace, key):
+        entry = self.get(namespace, key)
+        return json.loads(entry.value) if entry else None
+
+    def put_json(self, namespace, key, data, ttl=None):
+        return self.put(namespace, key, json.dumps(data, ensure_ascii=False).encode('utf-8'), ttl=ttl)
+
+    def _count(self, entry):
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def stats(self):
+        entries, size = self.usage()
+        return {
+            "backend": type(self).__name__,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,  # This worker's lookups
+            "misses": self.misses,
+        }
+
+
+class MemoryCache(CacheStore):
+    """In-process LRU cache (one worker only)"""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        super().__init__(max_bytes)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (namespace, key) -> (value, meta, expires_at), least recently used first
+        self._bytes = 0
+
+    def get(self, namespace, key):
+        with self._lock:
+            item = self._entries.get((namespace, key))
+            if item and item[2] is not None and item[2] <= time.time():
+                self._remove((namespace, key))
+                item = None
+            if item:
+                self._entries.move_to_end((namespace, key))
+            return self._count(CacheEntry(item[0], item[1]) if item else None)
+
+    def put(self, namespace, key, value, meta=None, ttl=None):
+        if len(value) > self.max_bytes:
+            return False
+        with self._lock:
+            self._remove((namespace, key))
+            self._entries[(namespace, key)] = (bytes(value), meta, time.time() + ttl if ttl else None)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def _remove(self, item_key):
+        item = self._entries.pop(item_key, None)
+        if item:
+            self._bytes -= len(item[0])
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._remove((namespace, key))
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for item_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                self._remove(item_key)
+
+    def usage(self):
+        with self._lock:
+            return len(self._entries), self._bytes
+
+
+class SQLiteCache(CacheStore):
+    """Cache in one SQLite file in WAL mode, shared by every process that opens it"""
+
+    def __init__(self, path, max_bytes=MAX_BYTES):
+        super().__init__(max_bytes)
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        """Per-thread connection, reopened after a fork (connections must not cross processes)"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def get(self, namespace, key):
+        db = self._db()
+        row = db.execute("SELECT value, meta, last_used, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                         (namespace, key)).fetchone()
+        now = time.time()
+        if row and row[3] is not None and row[3] <= now:
+            db.execute("DELETE FROM entries WHERE namespace = ? AND key = ? AND expires_at <= ?", (namespace, key, now))
+            row = None
+        if row and now - row[2] > TOUCH_INTERVAL:
+            db.execute("UPDATE entries SET last_used = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        return self._count(CacheEntry(row[0], json.loads(row[1]) if row[1] else None) if row else None)
+
+    def put(self, namespace, key, value, meta=None, ttl=None):
+        if len(value) > self.max_bytes:
+            return False
+        now = time.time()
+        db = self._db()
+        # One write transaction: other workers see the old value or the new one, and the size limit holds
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("""INSERT INTO entries (namespace, key, value, meta, size, created_at, last_used, expires_at)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                          ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, meta = excluded.meta,
+                          size = excluded.size, created_at = excluded.created_at, last_used = excluded.last_used,
+                          expires_at = excluded.expires_at""",
+                       (namespace, key, value, json.dumps(meta) if meta else None, len(value), now, now,
+                        now + ttl if ttl else None))
+            self._evict(db, now)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+    def _evict(self, db, now):
+        """Drop expired entries, then least recently used ones, until the cache fits max_bytes"""
+        if db.execute("SELECT bytes FROM usage").fetchone()[0] <= self.max_bytes:
+            return
+        db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        excess = db.execute("SELECT bytes FROM usage").fetchone()[0] - self.max_bytes
+        victims = []
+        for namespace, key, size in db.execute("SELECT namespace, key, size FROM entries ORDER BY last_used"):
+            if excess <= 0:
+                break
+            victims.append((namespace, key))
+            excess -= size
+        db.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+
+    def delete(self, namespace, key):
+        self._db().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace=None):
+        if namespace is None:
+            self._db().execute("DELETE FROM entries")
+        else:
+            self._db().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def usage(self):
+        return tuple(self._db().execute("SELECT entries, bytes FROM usage").fetchone())
+
+
+CACHE_BACKENDS = {
+    'sqlite': lambda path, max_bytes: SQLiteCache(path, max_bytes),
+    'memory': lambda path, max_bytes: MemoryCache(max_bytes),
+}
+
+
+def open_cache(backend, path, max_bytes=MAX_BYTES):
+    """Create the configured cache backend; falls back to MemoryCache if the shared store can't be opened"""
+    factory = CACHE_BACKENDS.get(backend)
+    if factory is None:
+        raise ValueError(f"Unknown cache backend: {backend} (choose from {', '.join(CACHE_BACKENDS)})")
+    try:
+        return factory(path, max_bytes)
+    except Exception as e:
+        logger.warning(f"⚠️ Shared cache unavailable ({str(e)}), using a per-worker memory cache")
+        return MemoryCache(max_bytes)
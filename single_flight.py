@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Single Flight
+Deduplicates identical work that is already in progress. When thirty
+teachers click the same suggested prompt on the same page within seconds,
+the first request (the leader) renders the page and calls the model; the
+others wait for it and get its result (or its exception) instead of
+repeating the work. Nothing is kept once the leader finishes, so this works
+whether or not the shared cache is enabled; the cache is what makes later
+requests cheap, single flight is what makes simultaneous ones cheap.
+
+Work is coalesced within one process; across workers the shared cache
+picks up the result as soon as the leader stores it. Shared work is only
+cancelled once every request waiting for it has been (CancelGroup).
+"""
+
+import logging
+import threading
+from cancellation import CancelGroup, CancelToken, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """One execution in progress and the requests waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.cancel = None
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run `fn()` once per key at a time; concurrent callers with the same key share the outcome"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {}
+
+    def do(self, kind, key, fn, cancel=None):
+        """(result of fn(), shared) where `shared` is True when another request did the work
+
+        `kind` groups keys in the stats ("render", "completion"); a None key
+        is never coalesced. With a `cancel` token, fn is called with the
+        token of everyone sharing the work, and a waiter whose own request is
+        cancelled stops waiting.
+        """
+        if key is None or not self.enabled:
+            return (fn() if cancel is None else fn(cancel)), False
+        while True:
+            with self._lock:
+                stats = self.stats.setdefault(kind, {"leaders": 0, "coalesced": 0, "in_flight": 0})
+                call = self._calls.get((kind, key))
+                leader = call is None
+                if leader:
+                    call = self._calls[(kind, key)] = _Call()
+                    call.cancel = CancelGroup(cancel) if cancel is not None else None
+                    stats["leaders"] += 1
+                    stats["in_flight"] += 1
+                else:
+                    call.waiters += 1
+                    stats["coalesced"] += 1
+                    if call.cancel is not None:
+                        call.cancel.add(cancel if cancel is not None else CancelToken())  # Never cancelled
+            if leader:
+                return self._lead(kind, key, call, fn, stats)
+            try:
+                return self._wait(call, cancel)
+            except RequestCancelled:
+                if cancel is None or cancel.cancelled():
+                    raise
+                # Everyone else gave up on the shared work just as this request joined: do it again
+
+    def _lead(self, kind, key, call, fn, stats):
+        try:
+            call.result = fn() if call.cancel is None else fn(call.cancel)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[(kind, key)]
+                stats["in_flight"] -= 1
+            call.done.set()
+            if call.waiters:
+                logger.info(f"🤝 {call.waiters} identical {kind} request(s) shared one result")
+        return call.result, False
+
+    def _wait(self, call, cancel=None):
+        while not call.done.wait(None if cancel is None else 0.25):
+            cancel.check()
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def snapshot(self):
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self.stats.items()}
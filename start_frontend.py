@@ -1,19 +1,143 @@
 #!/usr/bin/env python3
 """
 Simple HTTP Server to serve the frontend files
-Run this to serve the HTML files on port 5598
+Run this to serve the HTML files on port 5599
+
+    python start_frontend.py                # development: files re-read on change, always revalidated
+    python start_frontend.py --production   # fingerprinted assets, immutable caching, precompressed
+
+Requests are handled on their own threads, so one slow client doesn't block
+everyone else. Assets carry strong ETags and Last-Modified, and gzip (and
+brotli, if the `brotli` package is installed) variants are built at startup.
 """
 
+import argparse
+import email.utils
+import functools
+import gzip
+import hashlib
 import http.server
-import socketserver
 import os
+import re
 import sys
+import threading
+
+try:
+    import brotli  # Optional: pip install brotli
+except ImportError:
+    brotli = None
 
-# Change to the directory containing the HTML files
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_DIR = os.path.dirname(os.path.abspath(__file__))
 
 PORT = 5599
 
+# Files the frontend consists of; everything else is 404 in production mode
+ASSET_FILES = ['index.html', 'script.js', 'styles.css']
+CONTENT_TYPES = {'.html': 'text/html; charset=utf-8', '.js': 'text/javascript; charset=utf-8',
+                 '.css': 'text/css; charset=utf-8'}
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'  # For ?v=<hash> fingerprinted URLs
+REVALIDATE_CACHE = 'no-cache'  # Cache, but check the ETag every time
+
+# src="script.js" / href="styles.css" references rewritten to fingerprinted URLs
+ASSET_REFERENCE = re.compile(r'''((?:src|href)=["'])([\w.-]+\.(?:js|css))(["'])''')
+
+
+class Asset:
+    """One static file with its validators and precompressed variants"""
+
+    def __init__(self, name, body, mtime):
+        self.name = name
+        self.mtime = mtime
+        self.content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.last_modified = email.utils.formatdate(mtime, usegmt=True)
+        # Each encoding is a different representation, so each gets its own strong ETag
+        self.variants = {'identity': body}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.variants['gzip'] = compressed
+        if brotli:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.variants['br'] = compressed
+
+    def etag(self, encoding):
+        return f'"{self.digest}"' if encoding == 'identity' else f'"{self.digest}-{encoding}"'
+
+    def choose_encoding(self, accept_encoding):
+        """Best available encoding the client accepts (brotli over gzip)"""
+        accepted = {}
+        for part in (accept_encoding or '').split(','):
+            coding, _, params = part.strip().partition(';')
+            quality = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return 'identity'
+
+
+class StaticAssets:
+    """Loads ASSET_FILES into memory and rebuilds them when a file changes on disk"""
+
+    def __init__(self, directory, production=False):
+        self.directory = directory
+        self.production = production
+        self._lock = threading.Lock()
+        self._mtimes = {}
+        self.assets = {}
+        self.refresh()
+
+    def _current_mtimes(self):
+        mtimes = {}
+        for name in ASSET_FILES:
+            try:
+                mtimes[name] = os.stat(os.path.join(self.directory, name)).st_mtime
+            except FileNotFoundError:
+                pass
+        return mtimes
+
+    def refresh(self):
+        """Rebuild all assets if any file changed (a few stat calls when nothing did)"""
+        mtimes = self._current_mtimes()
+        if mtimes == self._mtimes:
+            return
+        with self._lock:
+            if mtimes == self._mtimes:
+                return
+            bodies = {}
+            for name in mtimes:
+                with open(os.path.join(self.directory, name), 'rb') as f:
+                    bodies[name] = f.read()
+            assets = {name: Asset(name, body, mtimes[name]) for name, body in bodies.items() if not name.endswith('.html')}
+            for name, body in bodies.items():
+                if name.endswith('.html'):
+                    if self.production:
+                        body = self._fingerprint_references(body, assets)
+                    assets[name] = Asset(name, body, mtimes[name])
+            self.assets = assets
+            self._mtimes = mtimes
+
+    @staticmethod
+    def _fingerprint_references(html, assets):
+        """Point script/style references at ?v=<content hash> so they can be cached forever"""
+        def replace(match):
+            asset = assets.get(match.group(2))
+            if not asset:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}?v={asset.digest}{match.group(3)}"
+        return ASSET_REFERENCE.sub(replace, html.decode('utf-8')).encode('utf-8')
+
+    def get(self, name):
+        self.refresh()
+        return self.assets.get(name)
+
+
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
         # Add CORS headers
@@ -21,23 +145,114 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
-    
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.end_headers()
 
-def start_server():
-    with socketserver.TCPServer(("", PORT), MyHTTPRequestHandler) as httpd:
+
+class StaticAssetHandler(MyHTTPRequestHandler):
+    """Serves StaticAssets with validators, compression and cache headers"""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so browsers reuse connections
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        path, _, query = self.path.partition('?')
+        name = path.lstrip('/') or 'index.html'
+        assets = self.server.assets
+        asset = assets.get(name)
+        if asset is None:
+            if assets.production:
+                self.send_error(404, "File not found")
+                return
+            # Development: anything else in the folder (test pages, images) is served as before
+            return super().do_GET() if send_body else super().do_HEAD()
+
+        encoding = asset.choose_encoding(self.headers.get('Accept-Encoding'))
+        etag = asset.etag(encoding)
+        fingerprinted = assets.production and f"v={asset.digest}" in query.split('&')
+
+        if self._not_modified(asset, etag):
+            self.send_response(304)
+            self._send_cache_headers(asset, etag, fingerprinted)
+            self.end_headers()
+            return
+
+        body = asset.variants[encoding]
+        self.send_response(200)
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self._send_cache_headers(asset, etag, fingerprinted)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _not_modified(self, asset, etag):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            # If-None-Match uses weak comparison, so W/"x" matches "x"
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(asset.mtime) <= since
+        return False
+
+    def _send_cache_headers(self, asset, etag, fingerprinted):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        self.send_header('Cache-Control', IMMUTABLE_CACHE if fingerprinted else REVALIDATE_CACHE)
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def log_message(self, format, *args):
+        if not self.server.assets.production:
+            super().log_message(format, *args)
+
+
+class FrontendServer(http.server.ThreadingHTTPServer):
+    """One thread per connection, so slow clients don't hold up the others"""
+    daemon_threads = True
+    request_queue_size = 128  # Browsers open several connections at once; the default backlog of 5 drops them
+
+
+def make_server(port=PORT, production=False, directory=FRONTEND_DIR, host=""):
+    """Threaded frontend server serving StaticAssets from `directory`"""
+    handler = functools.partial(StaticAssetHandler, directory=directory)
+    server = FrontendServer((host, port), handler)
+    server.assets = StaticAssets(directory, production)
+    return server
+
+
+def start_server(production=False):
+    with make_server(PORT, production) as httpd:
+        assets = httpd.assets
         print(f"\n{'='*60}")
         print(f"🌐 FRONTEND SERVER STARTING")
         print(f"{'='*60}")
-        print(f"Server running on port {PORT}")
+        print(f"Server running on port {PORT} ({'production' if production else 'development'} mode)")
         print(f"📱 Main app: http://localhost:{PORT}/")
         print(f"🧪 Simple test: http://localhost:{PORT}/test_simple.html")
         print(f"🔗 Backend: http://localhost:5000/")
+        for name, asset in assets.assets.items():
+            sizes = ', '.join(f"{encoding} {len(body) // 1024}KB" for encoding, body in asset.variants.items())
+            print(f"📦 {name}: {sizes}")
+        if not brotli:
+            print("💡 Install 'brotli' for brotli-compressed assets")
         print(f"{'='*60}\n")
         print("Press Ctrl+C to stop the server")
-        
+
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
@@ -45,4 +260,10 @@ def start_server():
             sys.exit(0)
 
 if __name__ == "__main__":
-    start_server()
+    parser = argparse.ArgumentParser(description="Serve the Education Assistant frontend")
+    parser.add_argument('--production', action='store_true',
+                        help="fingerprint assets, cache them immutably and serve only the app files")
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+    PORT = args.port
+    start_server(args.production)
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import os
+import time
+import zlib
+
+import pytest
+
+from chunked_upload import ChunkedUploadStore, UploadError
+
+CHUNK = 1024
+
+
+@pytest.fixture
+def pdf():
+    return b'%PDF-1.4\n' + os.urandom(5 * CHUNK) + b'\n%%EOF'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkedUploadStore(str(tmp_path), 10 * 1024 * 1024, chunk_size=CHUNK)
+
+
+def chunk(data, index):
+    return data[index * CHUNK:(index + 1) * CHUNK]
+
+
+def send(store, upload, data, index, body=None, **checks):
+    body = chunk(data, index) if body is None else body
+    return store.write_chunk(upload['upload_id'], index, io.BytesIO(body), len(chunk(data, index)), **checks)
+
+
+def test_resumed_upload_only_needs_the_missing_chunks(store, pdf):
+    upload = store.create('book.pdf', len(pdf))
+    for index in (0, 2, 4):
+        send(store, upload, pdf, index, expected_sha256=hashlib.sha256(chunk(pdf, index)).hexdigest())
+    # A new store over the same folder (a restarted backend) knows what arrived
+    resumed = ChunkedUploadStore(store.folder, store.max_size, chunk_size=CHUNK).status(upload['upload_id'])
+    assert resumed['missing'] == [1, 3, 5]
+    for index in resumed['missing']:
+        send(store, upload, pdf, index)
+    result = store.complete(upload['upload_id'])
+    assert result['sha256'] == hashlib.sha256(pdf).hexdigest()
+    with open(os.path.join(store.folder, result['file_ref']), 'rb') as f:
+        assert f.read() == pdf
+
+
+@pytest.mark.parametrize("checks", [{'expected_sha256': '0' * 64}, {'expected_crc32': 'deadbeef'}])
+def test_checksum_mismatch_is_rejected_and_the_chunk_stays_missing(store, pdf, checks):
+    upload = store.create('book.pdf', len(pdf))
+    with pytest.raises(UploadError) as error:
+        send(store, upload, pdf, 1, **checks)
+    assert error.value.status == 422
+    assert 1 in store.status(upload['upload_id'])['missing']
+    send(store, upload, pdf, 1, expected_crc32=f"{zlib.crc32(chunk(pdf, 1)):08x}")
+    assert 1 not in store.status(upload['upload_id'])['missing']
+
+
+def test_bad_resend_of_a_received_chunk_marks_it_missing_again(store, pdf):
+    upload = store.create('book.pdf', len(pdf))
+    for index in range(upload['total_chunks']):
+        send(store, upload, pdf, index)
+    with pytest.raises(UploadError):
+        send(store, upload, pdf, 2, body=b'x' * CHUNK, expected_sha256=hashlib.sha256(chunk(pdf, 2)).hexdigest())
+    assert store.status(upload['upload_id'])['missing'] == [2]
+    with pytest.raises(UploadError) as error:
+        store.complete(upload['upload_id'])
+    assert error.value.status == 409
+    send(store, upload, pdf, 2)
+    assert store.complete(upload['upload_id'])['sha256'] == hashlib.sha256(pdf).hexdigest()
+
+
+def test_complete_rechecks_chunks_changed_on_disk(store, pdf):
+    upload = store.create('book.pdf', len(pdf))
+    for index in range(upload['total_chunks']):
+        send(store, upload, pdf, index)
+    with open(store._part_path(upload['upload_id']), 'r+b') as f:
+        f.seek(3 * CHUNK)
+        f.write(b'corrupt')
+    with pytest.raises(UploadError) as error:
+        store.complete(upload['upload_id'])
+    assert error.value.status == 409
+    assert store.status(upload['upload_id'])['missing'] == [3]
+
+
+def test_chunks_are_refused_while_the_upload_is_being_completed(store, pdf):
+    upload = store.create('book.pdf', len(pdf))
+    session = store._load(upload['upload_id'])
+    session['completing_at'] = time.time()
+    store._save(session)
+    with pytest.raises(UploadError) as error:
+        send(store, upload, pdf, 0)
+    assert error.value.status == 409
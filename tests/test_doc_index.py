@@ -0,0 +1,50 @@
+import os
+import time
+
+import pytest
+
+from doc_index import DocumentIndex, doc_id_for
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DocumentIndex(str(tmp_path))
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_forked_child_opens_its_own_connection(index):
+    parent_db = index._db()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # Child: report whether it got a new connection that works
+        try:
+            db = index._db()
+            ok = db is not parent_db and db.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 0
+            os.write(write, b'1' if ok else b'0')
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b'1'
+    assert index._db() is parent_db
+
+
+def test_lease_keeps_other_workers_off_until_it_expires(tmp_path, monkeypatch):
+    monkeypatch.setattr(DocumentIndex, '_build', lambda self, doc_id, path: None)  # Hold the lease, index nothing
+    pdf = tmp_path / 'book.pdf'
+    pdf.write_bytes(b'%PDF-1.7')
+    sha256 = 'ab' * 32
+    first, second = DocumentIndex(str(tmp_path / 'index')), DocumentIndex(str(tmp_path / 'index'))
+
+    def owner():
+        return first._db().execute("SELECT owner FROM documents").fetchone()['owner']
+
+    first.index_document(sha256, str(pdf))
+    assert owner() == first.owner
+    second.index_document(sha256, str(pdf))
+    assert owner() == first.owner  # The lease still runs
+    assert first._renew(first._db(), doc_id_for(sha256))
+
+    first._db().execute("UPDATE documents SET lease_until = ?", (time.time() - 1,))  # First worker stalled
+    second.index_document(sha256, str(pdf))
+    assert owner() == second.owner
+    assert not first._renew(first._db(), doc_id_for(sha256))  # It stops indexing on its next page
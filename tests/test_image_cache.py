@@ -0,0 +1,31 @@
+import pytest
+
+from image_cache import normalize_description, wants_new_variation
+
+
+@pytest.mark.parametrize('message', [
+    "Another version",
+    "try again",
+    "Please regenerate",
+    "Can you make a new image?",
+    "give me a different variation",
+    "Could you draw another picture of the heart",
+])
+def test_variation_requests(message):
+    assert wants_new_variation(message)
+
+
+@pytest.mark.parametrize('message', [
+    "Can you explain genetic variation on this page?",
+    "What causes variation in species?",
+    "Read the paragraph once more and summarize it",
+    "Why does the new version of the map look different?",
+    "Explain the image on this page",
+])
+def test_questions_are_not_variation_requests(message):
+    assert not wants_new_variation(message)
+
+
+def test_descriptions_drop_only_a_leading_variation_request():
+    assert normalize_description("genetic variation in peas") == "genetic variation in peas"
+    assert normalize_description("Another version: a cat") == normalize_description("the cat")
@@ -0,0 +1,49 @@
+import pytest
+
+from intent_router import IntentRouter, classify_intent
+
+
+@pytest.mark.parametrize("message, intent, argument", [
+    ("Generate an image of a cat", 'image', "a cat"),
+    ("Please sketch a volcano", 'image', "a volcano"),
+    ("Summarize this page", 'summary', "this page"),
+    ("Can you please make a quick quiz on plants", 'quiz', "plants"),
+    ("Quiz my students on fractions", 'quiz', "fractions"),
+    ("List the key vocabulary on this page", 'vocabulary', "this page"),
+    ("Create a worksheet about the water cycle", 'worksheet', "the water cycle"),
+    ("Translate photosynthesis into Tamil", 'translation', "photosynthesis into Tamil"),
+    ("How do you say tree in Hindi", 'translation', "tree in Hindi"),
+])
+def test_requests_at_the_start_are_classified(message, intent, argument):
+    match = classify_intent(message)
+    assert (match.intent, match.argument) == (intent, argument)
+
+
+@pytest.mark.parametrize("message", [
+    "Why do students struggle to summarize the lesson?",
+    "Should I quiz my students on this page?",
+    "What games help with key vocabulary?",
+    "please explain how to make a quiz more fun",
+    "How do I help students visualize fractions?",
+    "how do I translate this idea into a lesson",
+    "How do I make a picture book with my class?",
+])
+def test_trigger_words_inside_questions_are_not_requests(message):
+    assert classify_intent(message) is None
+
+
+def test_unanchored_templates_match_anywhere():
+    router = IntentRouter().add_intent('greeting', ["(hello|hi) there"])
+    assert router.classify("well, hello there").intent == 'greeting'
+    assert router.classify("say hello there").argument == "say"
+
+
+def test_anchored_templates_only_match_the_first_word():
+    router = IntentRouter().add_intent('summary', ["^ [please] summarize"], fillers=['the'])
+    assert router.classify("Please summarize the chapter").argument == "chapter"
+    assert router.classify("I said summarize the chapter") is None
+
+
+def test_longest_trigger_wins():
+    router = IntentRouter().add_intent('short', ["make a"]).add_intent('long', ["make a quiz"])
+    assert router.classify("make a quiz on plants").intent == 'long'
@@ -0,0 +1,43 @@
+import threading
+
+from notes_export import NotesExporter
+from page_render import RenderCache
+
+NOTES = [{"question": "What is osmosis?", "response": "<p>Water moving across a membrane.</p>"}]
+
+
+def exporter(folder):
+    return NotesExporter(RenderCache(folder, 1024 * 1024, suffix='.pdf'), {})
+
+
+def test_job_status_is_shared_between_workers(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def render(notes, title, day):
+        release.wait(5)
+        return b'%PDF-1.7 test'
+
+    monkeypatch.setattr(NotesExporter, 'render', staticmethod(render))
+    ours, theirs = exporter(str(tmp_path)), exporter(str(tmp_path))
+    export_id = ours.submit(NOTES)['export_id']
+    assert theirs.status(export_id)['status'] == 'pending'
+    assert theirs.submit(NOTES) == {"export_id": export_id, "status": "pending"}  # Not built twice
+    release.set()
+    ours._executor.shutdown(wait=True)
+    assert theirs.status(export_id)['status'] == 'ready'
+    assert theirs.path(export_id)
+
+
+def test_failures_are_shared_between_workers(tmp_path, monkeypatch):
+    def render(notes, title, day):
+        raise RuntimeError("no fonts")
+
+    monkeypatch.setattr(NotesExporter, 'render', staticmethod(render))
+    ours, theirs = exporter(str(tmp_path)), exporter(str(tmp_path))
+    export_id = ours.submit(NOTES)['export_id']
+    ours._executor.shutdown(wait=True)
+    assert theirs.status(export_id) == {"export_id": export_id, "status": "failed", "error": "no fonts"}
+
+
+def test_export_id_includes_the_date_printed_in_the_footer():
+    assert NotesExporter.export_id([], 'Notes', '2026-10-19') != NotesExporter.export_id([], 'Notes', '2026-10-20')
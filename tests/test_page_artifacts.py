@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+import page_artifacts
+from intent_router import classify_intent
+from page_artifacts import ArtifactWorker, artifact_kind
+
+
+@pytest.mark.parametrize("message, kind", [
+    ("Summarize this page", 'summary'),
+    ("Please summarize the lesson.", 'summary'),
+    ("List the key vocabulary on this page", 'vocabulary'),
+    ("Create a quick quiz on this page", 'quiz'),
+    ("Why do students struggle to summarize the lesson?", None),
+    ("Summarize photosynthesis", None),
+    ("Create a quiz on this page with two hard questions about rivers", None),
+])
+def test_only_bare_requests_about_the_page_get_artifacts(message, kind):
+    assert artifact_kind(classify_intent(message), message) == kind
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_document_is_queued_again_after_its_jobs_are_dropped(monkeypatch):
+    monkeypatch.setattr(page_artifacts, 'MAX_ATTEMPTS', 2)
+    calls = []
+    lock = threading.Lock()
+
+    def generate(job):
+        with lock:
+            calls.append(job[:4])
+        raise RuntimeError("provider down")
+
+    worker = ArtifactWorker(generate, idle_seconds=0, retry_seconds=0)
+    worker.submit('doc', 'doc.pdf', 1, {'class_level': '6'})
+    assert wait_for(lambda: worker.snapshot()['failed'] == len(page_artifacts.ARTIFACT_REQUESTS))
+    first_round = len(calls)
+    worker.submit('doc', 'doc.pdf', 1, {'class_level': '6'})
+    assert wait_for(lambda: len(calls) == 2 * first_round)
+
+
+def test_repeat_submissions_while_queued_cost_nothing():
+    release = threading.Event()
+    worker = ArtifactWorker(lambda job: release.wait() or True, idle_seconds=0, retry_seconds=0)
+    worker.submit('doc', 'doc.pdf', 2, {'class_level': '6'})
+    worker.submit('doc', 'doc.pdf', 2, {'class_level': '6'})
+    assert worker.snapshot()['queued'] == 2 * len(page_artifacts.ARTIFACT_REQUESTS)
+    release.set()
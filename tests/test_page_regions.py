@@ -0,0 +1,27 @@
+import pytest
+
+from page_regions import asks_about_figure
+
+
+@pytest.mark.parametrize('message', [
+    "Explain this diagram",
+    "What does the graph show?",
+    "Label the parts in the figure",
+    "What is shown in the map above?",
+    "Explain the following table",
+    "Describe fig. 3.2",
+    "What does Figure 4 tell us?",
+])
+def test_figure_questions(message):
+    assert asks_about_figure(message)
+
+
+@pytest.mark.parametrize('message', [
+    "Generate an image of a volcano",
+    "What is a map?",
+    "Draw a picture of the water cycle",
+    "Summarize this page",
+    "Where is the table of contents?",
+])
+def test_other_messages_are_not_figure_questions(message):
+    assert not asks_about_figure(message)
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from rate_limiter import ProviderRateLimiter, parse_reset_duration
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ("1s", 1.0),
+    ("6m0s", 360.0),
+    ("20ms", 0.02),
+    ("2m59.56s", 179.56),
+    ("1h2m", 3720.0),
+    ("1.5", 1.5),
+])
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize('value', ["", None, "soon"])
+def test_unparseable_reset_duration(value):
+    assert parse_reset_duration(value) is None
+
+
+def headers(remaining_tokens, limit_tokens=1000):
+    return {
+        'x-ratelimit-limit-requests': '100', 'x-ratelimit-remaining-requests': '99', 'x-ratelimit-reset-requests': '1s',
+        'x-ratelimit-limit-tokens': str(limit_tokens), 'x-ratelimit-remaining-tokens': str(remaining_tokens),
+        'x-ratelimit-reset-tokens': '1m',
+    }
+
+
+def test_headers_set_the_budgets():
+    limiter = ProviderRateLimiter('test')
+    limiter.update_from_headers(headers(400))
+    snapshot = limiter.snapshot()
+    assert snapshot['requests']['limit'] == 100
+    assert snapshot['tokens']['limit'] == 1000
+    assert 400 <= snapshot['tokens']['available'] < 410
+
+
+def test_unparseable_headers_are_ignored():
+    limiter = ProviderRateLimiter('test', tokens_per_minute=1000)
+    limiter.update_from_headers({'x-ratelimit-remaining-tokens': 'lots', 'x-ratelimit-reset-tokens': '??'})
+    assert limiter.snapshot()['tokens']['available'] == 1000
+
+
+def test_stale_headers_never_raise_the_budget():
+    limiter = ProviderRateLimiter('test')
+    limiter.update_from_headers(headers(100))
+    limiter.update_from_headers(headers(900))  # Produced before the first response
+    assert limiter.snapshot()['tokens']['available'] < 200
+
+
+def test_requests_wait_for_budget():
+    limiter = ProviderRateLimiter('test')
+    limiter.update_from_headers(headers(50))
+    assert limiter.acquire(200, timeout=0) is None
+    assert limiter.acquire(10, timeout=0) is not None
+
+
+def test_reserve_leaves_spare_budget_for_interactive_requests():
+    limiter = ProviderRateLimiter('test')
+    limiter.update_from_headers(headers(400))
+    assert limiter.acquire(10, reserve=0.5, timeout=0) is None  # Would leave less than half of the 1000
+    assert limiter.acquire(10, timeout=0) is not None
+    limiter = ProviderRateLimiter('test')
+    limiter.update_from_headers(headers(900))
+    assert limiter.acquire(10, reserve=0.5, timeout=0) is not None
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    limiter = ProviderRateLimiter('test', requests_per_minute=60, tokens_per_minute=1000)
+    now = time.monotonic()
+    limiter._waiters = [(1, 0, now, 10, 0.0), (0, 2, now, 10, 0.0), (0, 1, now, 10, 0.0)]
+    assert limiter._next_grant(now) == 1
+
+
+def test_spare_budget_requests_never_overtake_others():
+    limiter = ProviderRateLimiter('test')
+    limiter.update_from_headers(headers(900))
+    now = time.monotonic()
+    limiter._waiters = [(0, 0, now, 950, 0.0), (1, 1, now, 10, 0.5)]  # The first doesn't fit yet
+    assert limiter._next_grant(now) is None
+    limiter._waiters = [(0, 0, now, 950, 0.0), (0, 1, now, 10, 0.0)]  # A small interactive one may overtake
+    assert limiter._next_grant(now) == 1
+
+
+def test_long_waiters_are_not_overtaken():
+    limiter = ProviderRateLimiter('test', requests_per_minute=60, tokens_per_minute=1000, max_bypass_seconds=10)
+    limiter.update_from_headers(headers(100))
+    now = time.monotonic()
+    limiter._waiters = [(0, 0, now - 11, 500, 0.0), (0, 1, now, 10, 0.0)]
+    assert limiter._next_grant(now) is None
@@ -0,0 +1,37 @@
+import os
+
+import page_render
+from page_render import RenderCache
+
+
+def test_get_finds_files_another_worker_rendered(tmp_path):
+    ours = RenderCache(str(tmp_path), 1024)
+    theirs = RenderCache(str(tmp_path), 1024)
+    path = theirs.put('tile', b'x' * 10)
+    assert ours.get('tile') == path
+    assert ours.stats()['bytes'] == 10
+
+
+def test_get_drops_files_another_worker_evicted(tmp_path):
+    cache = RenderCache(str(tmp_path), 1024)
+    os.remove(cache.put('tile', b'x' * 10))
+    assert cache.get('tile') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_eviction_counts_every_workers_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_render, 'CACHE_RESCAN_SECONDS', 0)  # As if the last scan were stale
+    ours = RenderCache(str(tmp_path), 100)
+    theirs = RenderCache(str(tmp_path), 100)
+    old = theirs.put('old', b'x' * 60)
+    os.utime(old, (1, 1))  # Least recently used
+    ours.put('new', b'x' * 60)
+    assert not os.path.exists(old)
+    assert ours.get('new')
+
+
+def test_put_leaves_no_temp_files(tmp_path):
+    cache = RenderCache(str(tmp_path), 1024)
+    cache.put('tile', b'data')
+    cache.put('tile', b'data')
+    assert os.listdir(tmp_path) == ['tile.webp']
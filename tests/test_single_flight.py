@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_waiters_share_the_leaders_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return 'answer'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('completion', 'key', work)))
+    leader.start()
+    wait_for(lambda: calls)
+    waiter = threading.Thread(target=lambda: results.append(flight.do('completion', 'key', work)))
+    waiter.start()
+    wait_for(lambda: flight.snapshot()['completion']['coalesced'] == 1)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+    assert sorted(results) == [('answer', False), ('answer', True)]
+    assert len(calls) == 1
+
+
+def test_leader_failure_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        raise ValueError("provider down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('completion', 'key', work)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: flight.snapshot()['completion']['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert [str(e) for e in errors] == ["provider down"] * 3
+    assert flight.snapshot()['completion']['in_flight'] == 0
+
+
+def test_failures_are_not_remembered():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("render failed")
+
+    with pytest.raises(ValueError):
+        flight.do('render', 'key', fail)
+    assert flight.do('render', 'key', lambda: 'ok') == ('ok', False)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Token Budget
+Counts a chat request's tokens locally before it is sent, the way the
+provider will, and makes oversized requests fit a budget instead of letting
+the provider reject them after a full round trip. Text is counted with
+tiktoken when it is installed (`pip install tiktoken`) and from its length
+otherwise; page images with the provider's accounting for the model
+(OpenAI's 512px tiles or 32px patches, Llama 4's 336px tiles on Groq).
+
+fit_request() gives the answer the max_tokens its intent needs and then,
+while the prompt plus max_tokens is over budget, trims the page text or
+description sent along, re-renders the page as one smaller image, sends
+images at low detail (OpenAI tile models only) and finally lowers
+max_tokens. TokenAccuracy compares every prediction with the usage the
+provider reports.
+"""
+
+from collections import namedtuple
+import logging
+import math
+import threading
+from rate_limiter import CHARS_PER_TOKEN, DEFAULT_IMAGE_TOKENS, MESSAGE_OVERHEAD_TOKENS, data_url_dimensions, estimate_image_tokens
+
+logger = logging.getLogger(__name__)
+
+# Answer length each intent needs; other requests keep the default
+INTENT_MAX_TOKENS = {'translation': 300, 'vocabulary': 600, 'summary': 700, 'image': 800, 'quiz': 1200, 'worksheet': 1500}
+MIN_MAX_TOKENS = 300  # max_tokens is not lowered below this to fit a budget
+MIN_CONTEXT_CHARS = 1000  # Page text / description kept when trimming
+RENDER_SCALES = (1.0, 0.5, 0.25)  # Shares of the page pixel budget tried for the single smaller image
+
+# gpt-4.1-mini/nano count 32px patches (at most 1536) times a per-model factor; other OpenAI models 512px tiles
+PATCH_MODELS = {'gpt-4.1-mini': 1.62, 'gpt-4.1-nano': 2.46, 'o4-mini': 1.72}
+PATCH_SIZE = 32
+MAX_PATCHES = 1536
+# Llama 4 splits images into 336px tiles of 144 tokens each, plus a global view
+LLAMA_TILE_SIZE = 336
+LLAMA_TILE_TOKENS = 144
+LLAMA_MAX_TILES = 16
+
+BudgetPlan = namedtuple('BudgetPlan', ['messages', 'images', 'max_tokens', 'image_detail', 'prompt_tokens', 'fits', 'steps'])
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(name):
+    """tiktoken encoding (loaded on first use), or None without tiktoken"""
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                import tiktoken
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:  # Not installed, or its BPE file can't be downloaded
+                logger.info(f"📏 Counting text tokens by length ({name} tokenizer unavailable: {str(e)})")
+                _encodings[name] = None
+        return _encodings[name]
+
+
+def response_tokens(intent, default):
+    """max_tokens for an answer to this intent"""
+    return INTENT_MAX_TOKENS.get(intent, default)
+
+
+def patch_image_tokens(width, height, factor):
+    """OpenAI patch accounting: 32px patches, scaled down to fit 1536 of them"""
+    patches = math.ceil(width / PATCH_SIZE) * math.ceil(height / PATCH_SIZE)
+    if patches > MAX_PATCHES:
+        scale = math.sqrt(PATCH_SIZE * PATCH_SIZE * MAX_PATCHES / (width * height))
+        scale *= min(math.floor(width * scale / PATCH_SIZE) / (width * scale / PATCH_SIZE),
+                     math.floor(height * scale / PATCH_SIZE) / (height * scale / PATCH_SIZE))
+        patches = min(MAX_PATCHES, math.ceil(width * scale / PATCH_SIZE) * math.ceil(height * scale / PATCH_SIZE))
+    return math.ceil(patches * factor)
+
+
+def llama_image_tokens(width, height):
+    """Llama 4 accounting: 336px tiles (at most 16) plus a global tile when there is more than one"""
+    tiles = min(LLAMA_MAX_TILES, math.ceil(width / LLAMA_TILE_SIZE) * math.ceil(height / LLAMA_TILE_SIZE))
+    return LLAMA_TILE_TOKENS * (tiles + (1 if tiles > 1 else 0))
+
+
+class TokenCounter:
+    """Prompt tokens of chat requests for one model ('openai' or 'llama' accounting)"""
+
+    def __init__(self, accounting, model):
+        self.accounting = accounting
+        self.model = model
+        self.encoding_name = 'o200k_base' if accounting == 'openai' else 'cl100k_base'  # cl100k is close to Llama 3's
+
+    @property
+    def low_detail(self):
+        """Whether `"detail": "low"` makes images cheaper for this model"""
+        return self.accounting == 'openai' and self.model not in PATCH_MODELS
+
+    def text_tokens(self, text):
+        encoding = _encoding(self.encoding_name)
+        if encoding is None:
+            return len(text) // CHARS_PER_TOKEN + 1
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def image_tokens(self, width, height, detail=None):
+        if self.accounting == 'llama':
+            return llama_image_tokens(width, height)
+        if self.model in PATCH_MODELS:
+            return patch_image_tokens(width, height, PATCH_MODELS[self.model])
+        return estimate_image_tokens(width, height, detail or 'high')
+
+    def request_tokens(self, api_messages):
+        """Prompt tokens of a chat completion request (text + images)"""
+        total = 0
+        for message in api_messages:
+            total += MESSAGE_OVERHEAD_TOKENS
+            content = message.get('content')
+            if isinstance(content, str):
+                total += self.text_tokens(content)
+                continue
+            for part in content or []:
+                if part.get('type') == 'text':
+                    total += self.text_tokens(part.get('text', ''))
+                elif part.get('type') == 'image_url':
+                    size = data_url_dimensions(part.get('image_url', {}).get('url', ''))
+                    total += self.image_tokens(*size, part['image_url'].get('detail')) if size else DEFAULT_IMAGE_TOKENS
+        return total
+
+
+_counters = {}
+
+
+def token_counter(accounting, model):
+    """Shared TokenCounter for a model"""
+    counter = _counters.get((accounting, model))
+    if counter is None:
+        counter = _counters[(accounting, model)] = TokenCounter(accounting, model)
+    return counter
+
+
+def fit_request(counter, messages, images, max_tokens, budget, build_messages, context=(), rerender=None):
+    """BudgetPlan for sending messages + images with max_tokens within `budget` tokens
+
+    build_messages(messages, images, detail) returns the provider's message
+    list; `context` are texts inside messages['user'] that may be shortened;
+    rerender(scale, messages) returns (images, messages) with the page as one
+    image at `scale` of the pixel budget. `steps` says what was given up.
+    """
+    detail = None
+    steps = []
+
+    def count():
+        return counter.request_tokens(build_messages(messages, images, detail))
+
+    prompt_tokens = count()
+    for text in context:
+        excess = prompt_tokens + max_tokens - budget
+        if excess <= 0:
+            break
+        keep = max(MIN_CONTEXT_CHARS, len(text) - excess * CHARS_PER_TOKEN)
+        if keep < len(text):
+            messages = dict(messages, user=messages['user'].replace(text, text[:keep].rsplit(' ', 1)[0] + ' [...]', 1))
+            prompt_tokens = count()
+            steps.append(f"page context cut to {keep} characters")
+
+    for scale in RENDER_SCALES if images and rerender else ():
+        if prompt_tokens + max_tokens <= budget:
+            break
+        if scale == 1.0 and len(images) == 1:
+            continue  # Already one image at the full pixel budget
+        smaller, smaller_messages = rerender(scale, messages)
+        if not smaller:
+            break
+        images, messages = smaller, smaller_messages
+        prompt_tokens = count()
+        steps.append(f"page sent as one image at {scale:.0%} of the pixel budget")
+
+    if images and counter.low_detail and prompt_tokens + max_tokens > budget:
+        detail = 'low'
+        prompt_tokens = count()
+        steps.append("images at low detail")
+
+    if prompt_tokens + max_tokens > budget and max_tokens > MIN_MAX_TOKENS:
+        max_tokens = max(MIN_MAX_TOKENS, budget - prompt_tokens)
+        steps.append(f"max_tokens lowered to {max_tokens}")
+
+    return BudgetPlan(messages, images, max_tokens, detail, prompt_tokens, prompt_tokens + max_tokens <= budget, steps)
+
+
+class TokenAccuracy:
+    """Predicted vs reported prompt tokens, and how much of max_tokens answers use, for /api/status"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "error_sum": 0.0, "abs_error_sum": 0.0, "completion_share_sum": 0.0, "cut_off": 0}
+
+    def record(self, model, predicted, actual, completion_tokens, max_tokens):
+        if not actual:
+            return
+        error = (predicted - actual) / actual
+        logger.info(f"📏 {model}: predicted {predicted} prompt tokens, provider counted {actual} ({error:+.1%}); "
+                    f"answer used {completion_tokens} of {max_tokens}")
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["error_sum"] += error
+            self.stats["abs_error_sum"] += abs(error)
+            self.stats["completion_share_sum"] += completion_tokens / max_tokens if max_tokens else 0.0
+            self.stats["cut_off"] += int(bool(max_tokens) and completion_tokens >= max_tokens)
+
+    def snapshot(self):
+        with self._lock:
+            requests = self.stats["requests"] or 1
+            return {
+                "requests": self.stats["requests"],
+                "mean_error_pct": round(100 * self.stats["error_sum"] / requests, 1),
+                "mean_abs_error_pct": round(100 * self.stats["abs_error_sum"] / requests, 1),
+                "mean_max_tokens_used_pct": round(100 * self.stats["completion_share_sum"] / requests, 1),
+                "cut_off": self.stats["cut_off"],
+                "text_counter": "tiktoken" if any(_encodings.values()) else "characters",
+            }
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Streaming Upload Handling
+Streams multipart file uploads straight into the upload folder in fixed-size
+chunks while the request is parsed, hashing the bytes and probing the PDF
+page count on the fly, and rejecting files as soon as they exceed the size
+limit. Nothing is buffered in memory and nothing is copied a second time.
+"""
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Partial files of uploads being streamed (hidden, renamed to their stored name once complete)
+INCOMING_PREFIX = '.incoming_'
+INCOMING_SUFFIX = '.part'
+INCOMING_PATTERN = f"{INCOMING_PREFIX}*{INCOMING_SUFFIX}"
+
+# Longest PDF token the probe has to see across a chunk boundary
+PROBE_OVERLAP = 64
+
+PAGE_OBJECT = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+PAGE_TREE_COUNT = re.compile(rb"/Type\s*/Pages\b[^>]{0,200}?/Count\s+(\d+)|/Count\s+(\d+)[^>]{0,200}?/Type\s*/Pages\b")
+LINEARIZED_PAGES = re.compile(rb"/Linearized\b[^>]*?/N\s+(\d+)")
+
+
+class PdfPageProbe:
+    """Estimates a PDF's page count from the raw bytes as they stream past
+
+    Uses the /N entry of linearized PDFs when present, otherwise the largest
+    page-tree /Count or the number of /Type /Page objects. PDFs that keep
+    their page objects in compressed object streams yield None.
+    """
+
+    def __init__(self):
+        self._tail = b''
+        self._page_objects = 0
+        self._tree_count = 0
+        self._linearized = None
+        self._seen = 0
+
+    def feed(self, data):
+        buffer = self._tail + data
+        if self._seen < 2048 and self._linearized is None:
+            match = LINEARIZED_PAGES.search(buffer)
+            if match:
+                self._linearized = int(match.group(1))
+        # Each match is counted once: when its end first falls inside the new data
+        boundary = len(self._tail) - 1
+        limit = len(buffer) - 1
+        for match in PAGE_OBJECT.finditer(buffer):
+            if boundary < match.end() <= limit:
+                self._page_objects += 1
+        for match in PAGE_TREE_COUNT.finditer(buffer):
+            self._tree_count = max(self._tree_count, int(match.group(1) or match.group(2)))
+        self._tail = buffer[-PROBE_OVERLAP:]
+        self._seen += len(data)
+
+    def finish(self):
+        # Matches ending on the very last byte were held back by feed()
+        for match in PAGE_OBJECT.finditer(self._tail):
+            if match.end() == len(self._tail):
+                self._page_objects += 1
+        self._tail = b''
+
+    @property
+    def page_count(self):
+        return self._linearized or self._tree_count or self._page_objects or None
+
+
+class StreamedUpload:
+    """Writable upload container that lands directly in the upload folder"""
+
+    def __init__(self, folder, filename=None, max_size=None):
+        os.makedirs(folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix=INCOMING_PREFIX, suffix=INCOMING_SUFFIX, dir=folder)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._probe = PdfPageProbe()
+        self.filename = filename
+        self.max_size = max_size
+        self.size = 0
+        self.finalized = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            self.discard()
+            limit_mb = self.max_size // (1024 * 1024)
+            raise RequestEntityTooLarge(f"File {self.filename} is too large. Maximum size is {limit_mb}MB.")
+        self._hash.update(data)
+        self._probe.feed(data)
+        return self._file.write(data)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def __getattr__(self, name):
+        # read/readline/tell/flush/... go to the underlying file
+        return getattr(self._file, name)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def page_count(self):
+        self._probe.finish()
+        return self._probe.page_count
+
+    def discard(self):
+        """Close and delete the partial file (no-op once finalized)"""
+        if self.finalized:
+            return
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class StreamingUploadRequest(Request):
+    """Flask request class whose file uploads stream into StreamedUpload containers
+
+    Reads UPLOAD_FOLDER and MAX_FILE_SIZE from the app config. Uploads that
+    were never finalized are deleted when the request closes.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        stream = StreamedUpload(config['UPLOAD_FOLDER'], filename, config.get('MAX_FILE_SIZE'))
+        if not hasattr(self, '_upload_streams'):
+            self._upload_streams = []
+        self._upload_streams.append(stream)
+        return stream
+
+    def close(self):
+        for stream in getattr(self, '_upload_streams', []):
+            stream.discard()
+        super().close()
+
+
+def stored_name(digest, filename):
+    """Content-addressed name for a stored upload"""
+    return f"{digest[:16]}_{secure_filename(filename)}"
+
+
+def stored_digest(name):
+    """Hash prefix of a content-addressed upload name, or None for other names"""
+    match = re.match(r'([0-9a-f]{16})_', name)
+    return match.group(1) if match else None
+
+
+def finalize_upload(file_storage, folder):
+    """Move a streamed upload to its content-addressed name and describe it
+
+    Files are named "<first 16 hex of sha256>_<secure name>", so re-uploading
+    the same PDF reuses the stored copy instead of writing it again.
+    """
+    stream = file_storage.stream
+    if not isinstance(stream, StreamedUpload):
+        # Not parsed through StreamingUploadRequest: stream it across in chunks
+        copy = StreamedUpload(folder, file_storage.filename, current_app.config.get('MAX_FILE_SIZE'))
+        for chunk in iter(lambda: stream.read(64 * 1024), b''):
+            copy.write(chunk)
+        stream = copy
+
+    stream.flush()
+    digest = stream.sha256
+    saved_as = stored_name(digest, file_storage.filename)
+    path = os.path.join(folder, saved_as)
+    reused = os.path.exists(path)
+    if reused:
+        stream.discard()
+    else:
+        stream._file.close()
+        os.replace(stream.path, path)
+    stream.finalized = True
+
+    logger.info(f"💾 {'Reused' if reused else 'Stored'} upload {saved_as} ({stream.size} bytes, sha256 {digest[:12]}…)")
+    return {
+        "saved_as": saved_as,
+        "path": path,
+        "size": stream.size,
+        "sha256": digest,
+        "page_count": stream.page_count,
+        "reused": reused,
+    }